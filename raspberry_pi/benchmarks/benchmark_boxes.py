@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark utils/boxes.py so với torchvision.ops (nếu có cài torch/torchvision)
+Box ngẫu nhiên dạng cụm quanh vài tâm giống output của detector trước NMS
+Chạy: cd raspberry_pi && python benchmarks/benchmark_boxes.py --counts 100 1000 5000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Thêm đường dẫn raspberry_pi để import
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils.boxes import iou_matrix, nms, batched_nms, soft_nms
+
+def make_boxes(count, num_classes, seed=0):
+    """count box quanh count/20 tâm trong frame 640x640, score và class ngẫu nhiên"""
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(50, 590, size=(max(1, count // 20), 2))
+    cxcy = centers[rng.integers(0, len(centers), count)] + rng.normal(0, 8, size=(count, 2))
+    wh = rng.uniform(20, 120, size=(count, 2))
+    boxes = np.concatenate([cxcy - wh / 2, cxcy + wh / 2], axis=1).astype(np.float32)
+    scores = rng.uniform(0.25, 1, size=count).astype(np.float32)
+    classes = rng.integers(0, num_classes, size=count)
+    return boxes, scores, classes
+
+def timeit(func, runs):
+    """Thời gian trung bình (ms) sau một lần chạy warmup"""
+    result = func()
+    start_time = time.perf_counter()
+    for _ in range(runs):
+        func()
+    return (time.perf_counter() - start_time) / runs * 1000, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark box utilities NumPy vs torchvision")
+    parser.add_argument("--counts", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--classes", type=int, default=4)
+    parser.add_argument("--iou", type=float, default=0.7)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON")
+    args = parser.parse_args()
+
+    try:
+        import torch
+        import torchvision.ops as ops
+        torch.set_num_threads(1)
+    except ImportError:
+        torch = None
+        print("⚠️ Không có torch/torchvision, chỉ đo phiên bản NumPy")
+
+    results = []
+    for count in args.counts:
+        boxes, scores, classes = make_boxes(count, args.classes)
+        numpy_ops = {
+            "iou_matrix": lambda: iou_matrix(boxes, boxes),
+            "nms": lambda: nms(boxes, scores, args.iou),
+            "batched_nms": lambda: batched_nms(boxes, scores, classes, args.iou),
+            "soft_nms": lambda: soft_nms(boxes, scores),
+        }
+        torch_ops = {}
+        if torch is not None:
+            t_boxes, t_scores, t_classes = torch.from_numpy(boxes), torch.from_numpy(scores), torch.from_numpy(classes)
+            torch_ops = {
+                "iou_matrix": lambda: ops.box_iou(t_boxes, t_boxes).numpy(),
+                "nms": lambda: ops.nms(t_boxes, t_scores, args.iou).numpy(),
+                "batched_nms": lambda: ops.batched_nms(t_boxes, t_scores, t_classes, args.iou).numpy(),
+            }
+
+        for name, func in numpy_ops.items():
+            # iou_matrix (N, N) quá lớn với N nhiều -> bớt số lần chạy
+            runs = max(1, args.runs // 10) if name == "iou_matrix" and count > 2000 else args.runs
+            numpy_ms, numpy_result = timeit(func, runs)
+            result = {"op": name, "count": count, "numpy_ms": numpy_ms}
+            if name in torch_ops:
+                torch_ms, torch_result = timeit(torch_ops[name], runs)
+                result["torchvision_ms"] = torch_ms
+                if name == "iou_matrix":
+                    result["max_diff"] = float(np.abs(numpy_result - torch_result).max())
+                else:
+                    result["same_keep"] = bool(np.array_equal(np.sort(numpy_result), np.sort(torch_result)))
+            results.append(result)
+
+            line = f"📊 N={count:<5} {name:>12}: numpy {numpy_ms:8.2f}ms"
+            if "torchvision_ms" in result:
+                parity = result.get("same_keep", result.get("max_diff"))
+                line += f" | torchvision {result['torchvision_ms']:8.2f}ms | khớp: {parity}"
+            print(line)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Đã ghi kết quả: {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Benchmark offline các backend detector (không cần camera/màn hình)
+Phát lại ảnh test hoặc video qua từng backend, mỗi backend chạy trong process riêng
+để đo peak RSS; so sánh detection với backend chuẩn (backend đầu tiên)
+Chạy: cd raspberry_pi && python benchmarks/benchmark_detectors.py --backends ncnn ncnn-int8 --threads 1 2 4
+"""
+
+import argparse
+import concurrent.futures
+import glob
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# Thêm đường dẫn raspberry_pi để import
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from configs.settings import CAMERA_WIDTH, CAMERA_HEIGHT, CLASS_NAMES, MODEL_PATH, NCNN_THREADS
+from modules.yolo_detector import YOLODetector
+from utils.postprocess import Detections
+from benchmark_precision import compare
+
+DEFAULT_IMAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..",
+                              "test_model", "image_test", "*.jpg")
+PT_MODEL_PATH = "../../weights/best.pt"
+
+# Tên backend -> (backend của YOLODetector, model path, precision)
+BACKENDS = {
+    "pt": ("ultralytics", PT_MODEL_PATH, "fp32"),
+    "ultralytics-ncnn": ("ultralytics", MODEL_PATH, "fp32"),
+    "ncnn": ("ncnn", MODEL_PATH, "fp32"),
+    "ncnn-fp16": ("ncnn", MODEL_PATH, "fp16"),
+    "ncnn-int8": ("ncnn", MODEL_PATH, "int8"),
+}
+
+def load_frames(images, video, max_frames):
+    """Đọc frame từ video (nếu có) hoặc ảnh test, resize về kích thước camera"""
+    frames = []
+    if video:
+        cap = cv2.VideoCapture(video)
+        while len(frames) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(cv2.resize(frame, (CAMERA_WIDTH, CAMERA_HEIGHT)))
+        cap.release()
+        return frames
+    for path in sorted(glob.glob(images))[:max_frames]:
+        image = cv2.imread(path)
+        if image is not None:
+            frames.append(cv2.resize(image, (CAMERA_WIDTH, CAMERA_HEIGHT)))
+    return frames
+
+def peak_rss_mb():
+    """Peak RSS của process hiện tại (ru_maxrss tính bằng KB trên Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def latency_stats(latencies):
+    """Mean/p50/p95/p99 (ms)"""
+    latencies = np.array(latencies)
+    return {
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+def bench_backend(name, images, video, max_frames, threads_list, warmup, runs):
+    """Chạy trong process con: benchmark một backend ở từng số thread"""
+    backend, model_path, precision = BACKENDS[name]
+    frames = load_frames(images, video, max_frames)
+    frames_rss = peak_rss_mb()
+
+    results = []
+    detections = None
+    for num_threads in threads_list:
+        detector = YOLODetector(backend, num_threads=num_threads, precision=precision, model_path=model_path)
+        start_load = time.time()
+        # Warmup đo riêng bên dưới, load_time chỉ tính load model
+        if not detector.load_model(warmup=0):
+            return {"backend": name, "error": "load failed"}
+        load_time = (time.time() - start_load) * 1000
+
+        warmup_latencies = []
+        for i in range(warmup):
+            start_inference = time.time()
+            detector.detect(frames[i % len(frames)])
+            warmup_latencies.append((time.time() - start_inference) * 1000)
+
+        latencies = []
+        frame_detections = []
+        start_time = time.time()
+        for _ in range(runs):
+            for frame in frames:
+                start_inference = time.time()
+                result = detector.detect(frame)
+                latencies.append((time.time() - start_inference) * 1000)
+                if len(frame_detections) < len(frames):
+                    frame_detections.append(result.data)
+        elapsed = time.time() - start_time
+
+        result = {
+            "threads": num_threads,
+            "load_time_ms": load_time,
+            "warmup_ms": warmup_latencies,
+            "fps": len(latencies) / elapsed,
+        }
+        result.update(latency_stats(latencies))
+        results.append(result)
+        if detections is None:
+            detections = frame_detections
+        del detector
+
+    return {
+        "backend": name,
+        "precision": precision,
+        "model_path": model_path,
+        "num_frames": len(frames),
+        "frames_rss_mb": frames_rss,
+        "peak_rss_mb": peak_rss_mb(),
+        "results": results,
+        "detections": detections,
+    }
+
+def git_commit():
+    """Commit hiện tại để so sánh kết quả giữa các lần chạy"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline các backend detector")
+    parser.add_argument("--backends", nargs="+", default=["ncnn"], choices=list(BACKENDS),
+                        help="Backend đầu tiên là chuẩn để so sánh detection")
+    parser.add_argument("--images", default=DEFAULT_IMAGES)
+    parser.add_argument("--video", help="File video thay cho ảnh test")
+    parser.add_argument("--frames", type=int, default=200, help="Số frame tối đa đọc từ nguồn")
+    parser.add_argument("--threads", type=int, nargs="+", default=[NCNN_THREADS])
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--runs", type=int, default=5, help="Số lần lặp lại toàn bộ frame")
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU để coi là cùng một detection")
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON")
+    args = parser.parse_args()
+
+    if not load_frames(args.images, args.video, 1):
+        print(f"❌ Không đọc được frame từ: {args.video or args.images}")
+        return
+
+    # spawn: process con sạch, peak RSS không bị tính lẫn torch/model của backend trước
+    context = multiprocessing.get_context("spawn")
+    reports = []
+    reference = None
+    reference_name = None
+    for name in args.backends:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            report = executor.submit(bench_backend, name, args.images, args.video, args.frames,
+                                     args.threads, args.warmup, args.runs).result()
+        if "error" in report:
+            print(f"❌ {name}: {report['error']}")
+            continue
+
+        detections = {i: Detections(data, CLASS_NAMES) for i, data in enumerate(report.pop("detections"))}
+        if reference is None:
+            reference, reference_name = detections, name
+        report["reference"] = reference_name
+        report["parity"] = compare(reference, detections, args.iou)
+        reports.append(report)
+
+        print(f"\n📊 {name} ({report['num_frames']} frames, peak RSS {report['peak_rss_mb']:.0f}MB)")
+        for result in report["results"]:
+            print(f"  threads={result['threads']}: {result['fps']:.1f} FPS, "
+                  f"p50 {result['p50_ms']:.1f}ms, p95 {result['p95_ms']:.1f}ms, p99 {result['p99_ms']:.1f}ms, "
+                  f"load {result['load_time_ms']:.0f}ms, "
+                  f"warmup {', '.join(f'{t:.0f}' for t in result['warmup_ms'])}ms")
+        parity = report["parity"]
+        print(f"  parity vs {reference_name}: recall {parity['recall_vs_reference']:.2f}, "
+              f"precision {parity['precision_vs_reference']:.2f}, IoU {parity['mean_iou']:.3f}, "
+              f"Δconf {parity['mean_conf_diff']:.3f}")
+
+    if args.json:
+        output = {
+            "commit": git_commit(),
+            "timestamp": time.time(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "source": args.video or args.images,
+            "args": vars(args),
+            "backends": reports,
+        }
+        with open(args.json, "w") as f:
+            json.dump(output, f, indent=2)
+        print(f"💾 Đã ghi kết quả: {args.json}")
+
+if __name__ == "__main__":
+    main()
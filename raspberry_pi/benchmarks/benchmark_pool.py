@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark throughput của InferencePool theo số worker K
+Chạy: cd raspberry_pi && python benchmarks/benchmark_pool.py --workers 1 2 3 4
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import threading
+import time
+
+import cv2
+
+# Thêm đường dẫn raspberry_pi để import
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from configs.settings import CAMERA_WIDTH, CAMERA_HEIGHT, INFERENCE_WORKER_THREADS
+from modules.inference_pool import InferencePool
+from modules.yolo_detector import YOLODetector
+
+DEFAULT_IMAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..",
+                              "test_model", "image_test", "*.jpg")
+
+def load_frames(pattern):
+    """Đọc ảnh test và resize về kích thước camera"""
+    frames = []
+    for path in sorted(glob.glob(pattern)):
+        image = cv2.imread(path)
+        if image is not None:
+            frames.append(cv2.resize(image, (CAMERA_WIDTH, CAMERA_HEIGHT)))
+    return frames
+
+def bench_single(frames, num_frames):
+    """Baseline: YOLODetector.detect tuần tự trong một process"""
+    detector = YOLODetector()
+    if not detector.load_model():
+        return None
+
+    start_time = time.time()
+    for i in range(num_frames):
+        detector.detect(frames[i % len(frames)])
+    elapsed = time.time() - start_time
+    return {"mode": "single", "workers": 1, "fps": num_frames / elapsed}
+
+def bench_pool(frames, num_frames, num_workers, num_threads):
+    """Throughput của pool với num_workers process"""
+    pool = InferencePool(num_workers=num_workers, num_threads=num_threads)
+    if not pool.start():
+        return None
+
+    # Warmup mỗi worker một frame
+    for i in range(num_workers):
+        pool.submit(-1 - i, frames[0])
+    for _ in range(num_workers):
+        pool.get_result(timeout=30)
+
+    def submit_all():
+        for i in range(num_frames):
+            pool.submit(i, frames[i % len(frames)])
+
+    start_time = time.time()
+    submitter = threading.Thread(target=submit_all)
+    submitter.start()
+
+    received = 0
+    in_order = True
+    while received < num_frames:
+        result = pool.get_result(timeout=30)
+        if result is None:
+            break
+        in_order = in_order and result[0] == received
+        received += 1
+    elapsed = time.time() - start_time
+    submitter.join()
+
+    stats = pool.get_stats()
+    pool.stop()
+    return {
+        "mode": "pool",
+        "workers": num_workers,
+        "threads_per_worker": num_threads,
+        "fps": received / elapsed,
+        "avg_inference_time_ms": stats["avg_inference_time_ms"],
+        "worker_completed": stats["worker_completed"],
+        "in_order": in_order
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark InferencePool throughput theo K")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 3, 4])
+    parser.add_argument("--threads", type=int, default=INFERENCE_WORKER_THREADS,
+                        help="ncnn threads cho mỗi worker")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--images", default=DEFAULT_IMAGES)
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON")
+    args = parser.parse_args()
+
+    frames = load_frames(args.images)
+    if not frames:
+        print(f"❌ Không tìm thấy ảnh: {args.images}")
+        return
+
+    results = []
+    baseline = bench_single(frames, args.frames)
+    if baseline:
+        results.append(baseline)
+        print(f"📊 single process: {baseline['fps']:.1f} FPS")
+
+    for num_workers in args.workers:
+        result = bench_pool(frames, args.frames, num_workers, args.threads)
+        if result is None:
+            print(f"❌ Pool K={num_workers} không khởi động được")
+            continue
+        results.append(result)
+        print(f"📊 pool K={num_workers}: {result['fps']:.1f} FPS, "
+              f"inference {result['avg_inference_time_ms']:.1f}ms, "
+              f"phân bố {result['worker_completed']}, đúng thứ tự: {result['in_order']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Đã ghi kết quả: {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+So sánh độ chính xác / latency của model NCNN FP32, FP16 và INT8
+Không có nhãn cho ảnh test nên FP32 được dùng làm chuẩn: detection của FP16/INT8 được
+match với FP32 theo IoU (recall/precision so với FP32, IoU trung bình, lệch confidence)
+Chạy: cd raspberry_pi && python benchmarks/benchmark_precision.py --precisions fp32 fp16 int8
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# Thêm đường dẫn raspberry_pi để import
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from modules.yolo_detector import YOLODetector
+from modules.tracker import greedy_match
+from utils.boxes import iou_matrix
+
+DEFAULT_IMAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..",
+                              "test_model", "image_test", "*.jpg")
+
+def load_images(pattern):
+    """Đọc ảnh test (giữ kích thước gốc)"""
+    images = []
+    for path in sorted(glob.glob(pattern)):
+        image = cv2.imread(path)
+        if image is not None:
+            images.append((os.path.basename(path), image))
+    return images
+
+def run_precision(precision, images, runs):
+    """Detect toàn bộ ảnh với một precision: latency + detections của từng ảnh"""
+    detector = YOLODetector("ncnn", precision=precision)
+    if not detector.load_model():
+        return None
+
+    latencies = []
+    detections = {}
+    for name, image in images:
+        for _ in range(runs):
+            start_inference = time.time()
+            result = detector.detect(image)
+            latencies.append((time.time() - start_inference) * 1000)
+        detections[name] = result
+    latencies = np.array(latencies)
+    return {
+        "precision": precision,
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "detections": detections
+    }
+
+def compare(reference, candidate, iou_threshold):
+    """Match detection của candidate với reference (cùng class, IoU >= ngưỡng)"""
+    matched = total_ref = total_cand = 0
+    ious, conf_diffs = [], []
+    for name, ref in reference.items():
+        cand = candidate[name]
+        total_ref += len(ref)
+        total_cand += len(cand)
+        if len(ref) == 0 or len(cand) == 0:
+            continue
+        iou = iou_matrix(ref.xyxy, cand.xyxy) * (ref.cls[:, None] == cand.cls[None, :])
+        rows, cols = greedy_match(iou, iou_threshold)
+        matched += len(rows)
+        ious.extend(iou[rows, cols].tolist())
+        conf_diffs.extend(np.abs(ref.conf[rows] - cand.conf[cols]).tolist())
+    return {
+        "recall_vs_reference": matched / total_ref if total_ref else 1.0,
+        "precision_vs_reference": matched / total_cand if total_cand else 1.0,
+        "mean_iou": float(np.mean(ious)) if ious else 0.0,
+        "mean_conf_diff": float(np.mean(conf_diffs)) if conf_diffs else 0.0,
+        "num_detections": total_cand
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Báo cáo accuracy vs latency theo precision NCNN")
+    parser.add_argument("--precisions", nargs="+", default=["fp32", "fp16", "int8"])
+    parser.add_argument("--images", default=DEFAULT_IMAGES)
+    parser.add_argument("--runs", type=int, default=20, help="Số lần detect mỗi ảnh")
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU để coi là cùng một detection")
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON")
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+    if not images:
+        print(f"❌ Không tìm thấy ảnh: {args.images}")
+        return
+
+    precisions = ["fp32"] + [p for p in args.precisions if p != "fp32"]
+    results = []
+    reference = None
+    for precision in precisions:
+        result = run_precision(precision, images, args.runs)
+        if result is None:
+            print(f"❌ Không load được model {precision}")
+            continue
+        if precision == "fp32":
+            reference = result["detections"]
+        if reference is None:
+            print("❌ Cần model FP32 làm chuẩn")
+            return
+        result.update(compare(reference, result.pop("detections"), args.iou))
+        results.append(result)
+
+    print(f"\n📊 {len(images)} ảnh, {args.runs} lần/ảnh, chuẩn: FP32")
+    print(f"{'precision':>9} {'mean':>8} {'p50':>8} {'p95':>8} {'speedup':>8} "
+          f"{'recall':>7} {'prec':>7} {'IoU':>6} {'Δconf':>6}")
+    for result in results:
+        speedup = results[0]["mean_ms"] / result["mean_ms"]
+        print(f"{result['precision']:>9} {result['mean_ms']:7.1f}ms {result['p50_ms']:7.1f}ms "
+              f"{result['p95_ms']:7.1f}ms {speedup:7.2f}x {result['recall_vs_reference']:7.2f} "
+              f"{result['precision_vs_reference']:7.2f} {result['mean_iou']:6.3f} {result['mean_conf_diff']:6.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Đã ghi kết quả: {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark preprocess: cách cũ (copyMakeBorder + astype + transpose) so với Preprocessor
+(buffer cấp phát sẵn) và cv2.dnn.blobFromImage
+Bộ nhớ cấp phát mỗi frame đo bằng tracemalloc (NumPy báo cáo các mảng nó cấp phát)
+Chạy: cd raspberry_pi && python benchmarks/benchmark_preprocess.py --sizes 320 640
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+# Thêm đường dẫn raspberry_pi để import
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from configs.settings import CAMERA_WIDTH, CAMERA_HEIGHT
+from modules.preprocess import Preprocessor, letterbox_params, PAD_COLOR
+
+DEFAULT_IMAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..",
+                              "test_model", "image_test", "*.jpg")
+
+def legacy_preprocess(frame, input_size):
+    """Preprocess trước đây của NCNNBackend: mỗi bước cấp phát một mảng mới"""
+    height, width = frame.shape[:2]
+    scale, new_w, new_h, left, top = letterbox_params(width, height, input_size)
+    right, bottom = input_size - new_w - left, input_size - new_h - top
+    if (new_w, new_h) != (width, height):
+        frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    canvas = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=PAD_COLOR)
+    blob = canvas[:, :, ::-1].transpose(2, 0, 1).astype(np.float32) / 255.0
+    return np.ascontiguousarray(blob), (scale, left, top, width, height)
+
+def dnn_preprocess(frame, input_size):
+    """Letterbox bằng copyMakeBorder rồi cv2.dnn.blobFromImage (swapRB + scale + CHW trong một lệnh)"""
+    height, width = frame.shape[:2]
+    scale, new_w, new_h, left, top = letterbox_params(width, height, input_size)
+    right, bottom = input_size - new_w - left, input_size - new_h - top
+    if (new_w, new_h) != (width, height):
+        frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    canvas = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=PAD_COLOR)
+    blob = cv2.dnn.blobFromImage(canvas, 1 / 255, swapRB=True)[0]
+    return blob, (scale, left, top, width, height)
+
+def load_frames(pattern, width, height):
+    """Đọc ảnh test và resize về kích thước frame cần đo"""
+    frames = []
+    for path in sorted(glob.glob(pattern)):
+        image = cv2.imread(path)
+        if image is not None:
+            frames.append(cv2.resize(image, (width, height)))
+    return frames
+
+def bench(name, func, frames, input_size, runs):
+    """Thời gian trung bình và bộ nhớ cấp phát (peak) mỗi frame"""
+    for frame in frames:
+        func(frame, input_size)
+
+    start_time = time.perf_counter()
+    for _ in range(runs):
+        for frame in frames:
+            func(frame, input_size)
+    elapsed = (time.perf_counter() - start_time) / (runs * len(frames))
+
+    peaks = []
+    tracemalloc.start()
+    for frame in frames:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        func(frame, input_size)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    return {"method": name, "input_size": input_size, "time_ms": elapsed * 1000,
+            "alloc_kb_per_frame": float(np.mean(peaks)) / 1024}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark preprocess (thời gian + cấp phát mỗi frame)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[320, 640])
+    parser.add_argument("--frame-size", type=int, nargs=2, default=[CAMERA_WIDTH, CAMERA_HEIGHT],
+                        metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--images", default=DEFAULT_IMAGES)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON")
+    args = parser.parse_args()
+
+    frames = load_frames(args.images, *args.frame_size)
+    if not frames:
+        print(f"❌ Không tìm thấy ảnh: {args.images}")
+        return
+
+    preprocessor = Preprocessor()
+    methods = [("legacy", legacy_preprocess), ("blobFromImage", dnn_preprocess), ("preallocated", preprocessor)]
+
+    results = []
+    for input_size in args.sizes:
+        # Kết quả phải giống hệt cách cũ
+        reference = legacy_preprocess(frames[0], input_size)
+        for name, func in methods:
+            blob, meta = func(frames[0], input_size)
+            diff = float(np.abs(blob - reference[0]).max())
+            result = bench(name, func, frames, input_size, args.runs)
+            result["max_diff"] = diff
+            results.append(result)
+            print(f"📊 {input_size} {name:>13}: {result['time_ms']:.2f}ms, "
+                  f"cấp phát {result['alloc_kb_per_frame']:.0f}KB/frame, lệch {diff:.1e}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Đã ghi kết quả: {args.json}")
+
+if __name__ == "__main__":
+    main()
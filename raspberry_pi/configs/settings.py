@@ -6,23 +6,144 @@ Cấu hình cho hệ thống Raspberry Pi 5
 CAMERA_WIDTH = 640
 CAMERA_HEIGHT = 480
 CAMERA_FPS = 30
+CAMERA_BUFFER_SIZE = 4  # số slot trong ring buffer frame
+# Nguồn frame: "device" (camera V4L2), "picamera2" (camera CSI qua libcamera), "video" (file),
+# "images" (thư mục ảnh), "synthetic" (frame tổng hợp)
+# Các nguồn replay resize về CAMERA_WIDTH x CAMERA_HEIGHT, frame id = vị trí frame trong nguồn
+CAMERA_SOURCE = "device"
+CAMERA_DEVICE = 0
+# Pixel format: "auto" thử lần lượt (device: MJPG, YUYV; picamera2: RGB888, YUV420, XBGR8888) hoặc chỉ định
+CAMERA_FORMAT = "auto"
+CAMERA_LORES_ENABLED = True  # picamera2: lores stream YUV420 (rộng MOTION_WIDTH) cho motion gate
+CAMERA_SOURCE_PATH = ""  # file video hoặc thư mục ảnh
+CAMERA_PACING = "realtime"  # "realtime" (giữ fps của nguồn) hoặc "fast" (nhanh nhất pipeline xử lý được, không bỏ frame)
+CAMERA_LOOP = False  # phát lại từ đầu khi hết file/thư mục, False = dừng hệ thống khi hết
+DISPLAY_ENABLED = True  # False: không mở cửa sổ (chạy headless / benchmark)
 
 # Model settings
 MODEL_PATH = "../../weights/best_ncnn_model"
+DETECTOR_BACKEND = "ncnn"  # "ncnn" (ncnn.Net trực tiếp, không cần torch) hoặc "ultralytics"
+MODEL_INPUT_SIZE = 640  # theo imgsz trong metadata.yaml
 CONFIDENCE_THRESHOLD = 0.25
-DETECTION_INTERVAL = 0.1  # seconds
+NMS_IOU_THRESHOLD = 0.7
+MAX_DETECTIONS = 300
+NCNN_THREADS = 4  # số core của Pi 5
+# Precision của model NCNN: "fp32", "fp16" hoặc "int8"
+# fp32 dùng weights gốc với opt mặc định của ncnn (CPU hỗ trợ fp16 như Pi 5 vẫn tính fp16)
+# fp16 dùng thư mục <model>_fp16 nếu có, không thì chạy weights fp32 với fp16 arithmetic
+# int8 cần thư mục <model>_int8 (train_model/quantize_ncnn.py)
+MODEL_PRECISION = "fp32"
+# Warmup: số lần inference giả trên mỗi input size sau khi load model, trước khi báo ready
+# (lần chạy đầu chậm do cấp phát lazy), 0 = bỏ qua
+WARMUP_ITERATIONS = 3
+# Dynamic resolution: model NCNN cố định kích thước input nên mỗi size là một thư mục riêng
+# (train_model/train_yolo.py export đủ các size), size thiếu thư mục sẽ bị bỏ qua
+MODEL_VARIANTS = {
+    320: "../../weights/best_ncnn_model_320",
+    416: "../../weights/best_ncnn_model_416",
+    512: "../../weights/best_ncnn_model_512",
+    640: MODEL_PATH,
+}
+DYNAMIC_RESOLUTION = True
+RESOLUTION_TARGET_FPS = 10  # số lần detect/giây mục tiêu, quyết định latency budget
+RESOLUTION_MIN_OBJECT_SIZE = 48  # pixels (trong ảnh input), object nhỏ hơn -> tăng resolution
+RESOLUTION_PATIENCE = 5  # số lần detect liên tiếp cùng đề xuất trước khi đổi size
+DETECTION_INTERVAL = 0.1  # seconds, chỉ dùng khi EVENT_ENABLED = False
+
+# Region inference: chạy model trên crop quanh object/zone ("roi") hoặc trên lưới tile chồng lấn
+# ("tiled") để object nhỏ/xa chiếm nhiều pixel hơn trong ảnh input (không dùng với inference pool)
+REGION_MODE = "off"  # "off", "roi" hoặc "tiled"
+ROI_ZONES = []  # [(x1, y1, x2, y2)] toạ độ chuẩn hoá 0-1, luôn được detect ở mode roi
+ROI_PADDING = 1.0  # mở rộng bbox mỗi bên theo tỉ lệ cạnh lớn nhất của bbox
+ROI_MIN_SIZE = 192  # pixels, cạnh nhỏ nhất của crop
+ROI_MAX_REGIONS = 3  # nhiều crop hơn -> chạy full frame
+ROI_MAX_AREA = 0.5  # tổng diện tích crop vượt tỉ lệ này của frame -> chạy full frame
+ROI_FULL_FRAME_INTERVAL = 1.0  # seconds, full frame định kỳ để bắt object mới ngoài crop
+TILE_GRID = (2, 2)  # số cột, số hàng
+TILE_OVERLAP = 0.2  # tỉ lệ chồng lấn giữa hai tile liền kề
+TILE_FULL_FRAME = True  # thêm một lượt full frame cho object lớn bị cắt qua nhiều tile
+REGION_MERGE_THRESHOLD = 0.6  # intersection / diện tích box nhỏ hơn để gộp box giữa các region
+
+# Motion gate: chỉ chạy detector khi có chuyển động (ảnh xám thu nhỏ), keyframe định kỳ
+MOTION_GATE_ENABLED = True
+MOTION_METHOD = "diff"  # "diff" (frame differencing) hoặc "mog2" (background subtractor)
+MOTION_WIDTH = 160  # pixels, chiều rộng ảnh dùng để so sánh
+MOTION_THRESHOLD = 25  # độ lệch mức xám (diff) / varThreshold (mog2), lớn hơn = kém nhạy hơn
+MOTION_MIN_AREA = 0.005  # tỉ lệ pixel thay đổi trong zone để coi là có chuyển động
+MOTION_ZONES = []  # [(x1, y1, x2, y2)] toạ độ chuẩn hoá 0-1, rỗng = cả frame
+MOTION_KEYFRAME_INTERVAL = 5.0  # seconds, bắt buộc detect dù cảnh tĩnh
+MOTION_HOLD_TIME = 0.5  # seconds tiếp tục detect sau chuyển động cuối
+
+# Scheduler: chỉ chạy detector khi cần, các frame giữa dùng tracker.predict() (cần TRACKER_ENABLED)
+SCHEDULER_ENABLED = True
+SCHEDULER_CPU_BUDGET = 0.5  # tỉ lệ thời gian tối đa detector được chạy
+SCHEDULER_MIN_INTERVAL = 0.0  # seconds
+SCHEDULER_MAX_INTERVAL = 0.3  # seconds, khoảng detect khi cảnh tĩnh / không có object
+SCHEDULER_MOTION_GAIN = 2.0  # co interval theo tốc độ object (chiều cao bbox / giây)
+SCHEDULER_COUNT_GAIN = 0.5  # co interval theo số object
+
+# Tracker settings (IoU + Kalman, liên kết 2 bước kiểu ByteTrack)
+TRACKER_ENABLED = True
+TRACK_HIGH_THRESH = 0.5  # detection >= ngưỡng này được match ở bước 1
+TRACK_LOW_THRESH = 0.1  # bước 2 match detection thấp (cần CONFIDENCE_THRESHOLD <= ngưỡng này để có tác dụng)
+# Detection chưa match (cả bước 1 lẫn 2) >= ngưỡng này tạo track mới; detection dưới ngưỡng không có
+# track nên không bao giờ được vẽ/publish -> mặc định bằng CONFIDENCE_THRESHOLD để không nâng ngưỡng
+# detection, tăng lên để bớt track giả nhưng sẽ mất object confidence thấp
+TRACK_NEW_THRESH = CONFIDENCE_THRESHOLD
+TRACK_MATCH_IOU = 0.3  # IoU tối thiểu để match track với detection
+TRACK_BUFFER = 1.0  # seconds giữ track bị mất trước khi xoá
+TRACK_CONF_SMOOTHING = 0.6  # EMA confidence: conf = a * conf_cũ + (1 - a) * conf_mới
+
+# Event settings: chỉ gửi UART/MQTT khi trạng thái thay đổi (appeared / moved / disappeared)
+EVENT_ENABLED = True
+EVENT_CONF_ON = 0.5  # confidence để object được coi là xuất hiện
+EVENT_CONF_OFF = 0.35  # hysteresis: object chỉ mất khi confidence tụt dưới ngưỡng này
+EVENT_MOVE_THRESHOLD = 40  # pixels, tâm bbox lệch quá ngưỡng -> event "moved"
+EVENT_DISAPPEAR_TIME = 0.5  # seconds không thấy object -> event "disappeared"
+EVENT_COOLDOWN = 1.0  # seconds tối thiểu giữa hai event của cùng class
+EVENT_CLASS_COOLDOWNS = {}  # cooldown riêng theo class, ví dụ {"hands": 2.0}
+
+# Inference mode: "thread" (detector trong process chính) hoặc "pool" (K process, shared memory)
+INFERENCE_MODE = "thread"
+INFERENCE_WORKERS = 2
+INFERENCE_WORKER_THREADS = 2  # ncnn threads cho mỗi worker
+
+# Pipeline settings (capture -> preprocess -> infer -> postprocess -> publish)
+PIPELINE_ENABLED = True
+PIPELINE_QUEUE_SIZE = 2
+PIPELINE_DROP_POLICY = "drop_oldest"  # "drop_oldest" hoặc "block"
+PIPELINE_STATS_INTERVAL = 10  # seconds
 
 # UART settings (ESP32 communication)
+UART_ENABLED = True  # False: không import pyserial, không gửi lệnh ESP32
 UART_PORT = "/dev/ttyUSB0"  # hoặc "/dev/ttyACM0"
 UART_BAUDRATE = 115200
 UART_TIMEOUT = 1
 
 # MQTT settings
+MQTT_ENABLED = True  # False: không import paho, không gửi dữ liệu lên server
 MQTT_BROKER = "broker.hivemq.com"  # hoặc IP server của bạn
 MQTT_PORT = 1883
 MQTT_TOPIC_IMAGE = "fpt_hackathon/detection_image"
 MQTT_TOPIC_DATA = "fpt_hackathon/detection_data"
 MQTT_CLIENT_ID = "raspberry_pi_5"
+MQTT_PROTOCOL = "5"  # "5" (MQTT v5, có user properties) hoặc "3.1.1"
+MQTT_IMAGE_FORMAT = "binary"  # "binary" (header + JPEG thô) hoặc "json" (base64, format cũ)
+MQTT_ASYNC_ENABLED = True  # publish trên worker riêng, không chặn thread detection
+MQTT_QUEUE_SIZE = 64  # số detection message tối đa chờ publish
+MQTT_BATCH_WINDOW = 0.5  # seconds, gom detection trong cửa sổ này thành một message
+MQTT_MAX_BATCH = 20
+MQTT_IMAGE_QUEUE_SIZE = 2  # ảnh cũ nhất bị drop khi đầy
+MQTT_IMAGE_DOWNSCALE = 0.5  # thu nhỏ ảnh khi queue ảnh đang dồn
+MQTT_IMAGE_MODE = "crops"  # "full", "crops" (vùng quanh bbox) hoặc "thumbnail"
+MQTT_IMAGE_OVERLAY = False  # True: gửi ảnh đã vẽ bbox/FPS, False: ảnh gốc
+MQTT_CROP_PADDING = 0.2  # padding quanh bbox, tỉ lệ theo kích thước bbox
+MQTT_MAX_CROPS = 4
+MQTT_THUMBNAIL_WIDTH = 320
+MQTT_JPEG_QUALITY = 80  # quality ban đầu
+MQTT_JPEG_QUALITY_MIN = 30
+MQTT_JPEG_QUALITY_MAX = 90
+MQTT_IMAGE_BYTES_PER_SEC = 60000  # byte budget cho ảnh, 0 = quality cố định
 
 # Detection classes
 CLASS_NAMES = {
@@ -47,4 +168,39 @@ LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 
 # Performance settings
 MAX_FPS = 30
-MIN_INFERENCE_TIME = 50  # ms 
\ No newline at end of file
+MIN_INFERENCE_TIME = 50  # ms 
+# Performance monitor: cửa sổ trượt (số mẫu gần nhất) cho FPS, percentile latency từng stage
+PERF_WINDOW_SIZE = 256
+# Histogram latency kiểu HDR: mỗi khoảng [2^k, 2^(k+1)) ms chia thành N bucket tuyến tính
+# (sai số tương đối <= 1/N), giá trị ngoài [MIN, MAX] dồn vào bucket đầu/cuối
+PERF_HISTOGRAM_SUB_BUCKETS = 16
+PERF_HISTOGRAM_MIN_MS = 0.01
+PERF_HISTOGRAM_MAX_MS = 60000
+PERF_LOG_INTERVAL = 10  # seconds, log CPU/memory/FPS/latency của PerformanceMonitor
+
+# Metrics: HTTP endpoint /metrics (Prometheus text format) để scrape nhiều Pi
+# Giá trị thu thập lúc scrape, không tốn gì trên đường xử lý frame
+METRICS_ENABLED = True
+METRICS_HOST = "0.0.0.0"  # "127.0.0.1" nếu chỉ scrape trên máy
+METRICS_PORT = 9108
+# Bucket (ms) của histogram latency xuất ra, gộp từ histogram HDR của PerformanceMonitor
+METRICS_LATENCY_BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Governor: theo dõi nhiệt độ, throttle và tải CPU, hạ/khôi phục từng mức để giữ FPS mục tiêu
+# (min(MAX_FPS, CAMERA_FPS)) mà không chạm ngưỡng throttle của Pi
+GOVERNOR_ENABLED = True
+GOVERNOR_INTERVAL = 5  # seconds giữa hai lần quyết định
+GOVERNOR_TEMP_HIGH = 75  # °C, từ mức này hạ một level (Pi 5 bắt đầu throttle ở 80-85°C)
+GOVERNOR_TEMP_LOW = 65  # °C, dưới mức này mới được khôi phục
+GOVERNOR_CPU_HIGH = 90  # %, quá tải khi CPU cao mà FPS dưới mục tiêu
+GOVERNOR_FPS_TOLERANCE = 0.9  # FPS < mục tiêu * tolerance coi là không giữ được
+GOVERNOR_PATIENCE = 3  # số lần liên tiếp "mát" trước khi khôi phục một level
+# Mỗi level: hệ số nhân MIN_INFERENCE_TIME (khoảng cách tối thiểu giữa hai lần detect),
+# input size tối đa (None = không giới hạn, cần DYNAMIC_RESOLUTION), số thread, JPEG quality tối đa
+GOVERNOR_LEVELS = [
+    {"detect_interval": 1.0, "max_input_size": None, "threads": NCNN_THREADS, "jpeg_quality": MQTT_JPEG_QUALITY_MAX},
+    {"detect_interval": 1.0, "max_input_size": None, "threads": NCNN_THREADS, "jpeg_quality": 60},
+    {"detect_interval": 1.5, "max_input_size": 512, "threads": NCNN_THREADS, "jpeg_quality": 60},
+    {"detect_interval": 2.0, "max_input_size": 416, "threads": 3, "jpeg_quality": 50},
+    {"detect_interval": 3.0, "max_input_size": 320, "threads": 2, "jpeg_quality": MQTT_JPEG_QUALITY_MIN},
+]
@@ -4,7 +4,6 @@ Main script cho Raspberry Pi 5 - Cấu trúc module hóa
 Realtime detection + UART + MQTT
 """
 
-import cv2
 import time
 import threading
 import signal
@@ -14,37 +13,161 @@ import os
 # Thêm đường dẫn để import
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from configs.settings import CAMERA_WIDTH, CAMERA_HEIGHT, CAMERA_FPS, DETECTION_INTERVAL
+# Import đầu tiên: mốc thời gian bắt đầu cho startup profile
+from utils.startup import startup_profile
+import cv2
+from configs.settings import (CAMERA_WIDTH, CAMERA_HEIGHT, CAMERA_FPS, CAMERA_BUFFER_SIZE,
+                              DETECTION_INTERVAL, PIPELINE_ENABLED, PIPELINE_STATS_INTERVAL,
+                              INFERENCE_MODE, MQTT_ASYNC_ENABLED, MQTT_IMAGE_OVERLAY, EVENT_ENABLED,
+                              TRACKER_ENABLED, SCHEDULER_ENABLED, MOTION_GATE_ENABLED, CLASS_NAMES,
+                              DYNAMIC_RESOLUTION, DISPLAY_ENABLED, REGION_MODE, UART_ENABLED, MQTT_ENABLED,
+                              METRICS_ENABLED, GOVERNOR_ENABLED)
 from modules.yolo_detector import YOLODetector
 from modules.camera_manager import CameraManager
+from modules.tracker import Tracker
+from modules.scheduler import FrameScheduler
+from modules.motion_gate import MotionGate
+from modules.resolution_controller import ResolutionController
+from modules.region_planner import RegionPlanner
+from modules.event_engine import EventEngine, DISAPPEARED
+from modules.pipeline import DetectionPipeline, PipelineItem
+from modules.inference_pool import InferencePool
+from modules.governor import PerformanceGovernor
 from services.uart_service import UARTService
 from services.mqtt_service import MQTTService
+from services.mqtt_publisher import AsyncMQTTPublisher
 from utils.performance_monitor import PerformanceMonitor
+from utils.postprocess import Detections
 from utils.logger import system_logger
 
+# Backend detector, paho, pyserial, psutil import lazy khi dùng (xem utils/startup.py)
+startup_profile.mark("imports")
+
 class RaspberryPiSystem:
     def __init__(self):
         self.running = False
+        # Tạo trước pipeline: các stage ghi latency vào monitor
+        self.performance_monitor = PerformanceMonitor()
+        
+        # Inference pool (K process) chỉ dùng được với pipeline
+        self.inference_pool = None
+        if INFERENCE_MODE == "pool":
+            if PIPELINE_ENABLED:
+                self.inference_pool = InferencePool()
+            else:
+                system_logger.warning("INFERENCE_MODE='pool' requires PIPELINE_ENABLED, using thread mode")
+        
+        # Pipeline nhiều stage (mỗi stage một thread) hoặc chạy tuần tự
+        self.pipeline = None
+        self.display_queue = None
+        buffer_size = CAMERA_BUFFER_SIZE
+        if PIPELINE_ENABLED:
+            self.pipeline, self.display_queue = self._build_pipeline()
+            # Ring buffer phải đủ slot cho các frame đang nằm trong pipeline/pool
+            buffer_size += self.pipeline.capacity()
+            if self.inference_pool:
+                buffer_size += self.inference_pool.num_slots
         
         # Khởi tạo các components
-        self.detector = YOLODetector()
-        self.camera_manager = CameraManager()
-        self.uart_service = UARTService()
-        self.mqtt_service = MQTTService()
-        self.performance_monitor = PerformanceMonitor()
+        # Detect trên crop/tile chạy trong process chính, pool luôn detect full frame
+        self.region_planner = None
+        if REGION_MODE != "off":
+            if self.inference_pool:
+                system_logger.warning("REGION_MODE is not used in pool mode, detecting full frames")
+            else:
+                self.region_planner = RegionPlanner()
+        
+        # Blob preprocess nằm trong buffer dùng chung: đủ buffer cho mọi frame (và region) đang trong pipeline
+        frames_in_flight = self.pipeline.capacity() if self.pipeline else 1
+        regions_per_frame = self.region_planner.max_regions if self.region_planner else 1
+        self.detector = YOLODetector(num_buffers=frames_in_flight * regions_per_frame)
+        self.camera_manager = CameraManager(buffer_size=buffer_size)
+        # Service tắt thì không tạo (không import pyserial / paho)
+        self.uart_service = UARTService() if UART_ENABLED else None
+        self.mqtt_service = MQTTService() if MQTT_ENABLED else None
+        self.mqtt_publisher = None
+        if self.mqtt_service and MQTT_ASYNC_ENABLED:
+            self.mqtt_publisher = AsyncMQTTPublisher(self.mqtt_service)
+        self.tracker = Tracker() if TRACKER_ENABLED else None
+        self.motion_gate = MotionGate() if MOTION_GATE_ENABLED else None
+        # Tạo sau khi load model (cần biết các size đã load)
+        self.resolution_controller = None
+        self.governor = None
+        
+        # Scheduler bỏ qua detector ở một số frame, cần tracker để ngoại suy bbox
+        self.scheduler = None
+        if SCHEDULER_ENABLED:
+            if self.tracker is not None:
+                workers = self.inference_pool.num_workers if self.inference_pool else 1
+                self.scheduler = FrameScheduler(workers=workers)
+            else:
+                system_logger.warning("SCHEDULER_ENABLED requires TRACKER_ENABLED, running detector on every frame")
+        self.event_engine = EventEngine() if EVENT_ENABLED else None
+        
+        # Endpoint /metrics (http.server chỉ import khi bật)
+        self.metrics_exporter = None
+        if METRICS_ENABLED:
+            from services.metrics_exporter import MetricsExporter
+            self.metrics_exporter = MetricsExporter(self._collect_metrics)
         
         # Detection tracking
         self.last_detection_time = 0
         self.last_detections = []
+        # Kết quả detect gần nhất, dùng lại cho frame bị bỏ qua khi không có tracker
+        self.held_detections = Detections(class_names=CLASS_NAMES)
+        self.last_frame_id = -1
+        self.last_stats_time = time.time()
+    
+    def _build_pipeline(self):
+        """Tạo pipeline capture -> preprocess -> infer -> postprocess -> publish"""
+        pipeline = DetectionPipeline(on_drop=self._release_item, on_latency=self.performance_monitor.record_stage)
+        pipeline.add_stage("capture", self._capture_stage)
+        if self.inference_pool:
+            # Worker process tự preprocess/infer/postprocess, kết quả trả về theo thứ tự frame
+            pipeline.add_stage("submit", self._submit_stage)
+            pipeline.add_stage("collect", self._collect_stage, source=True)
+            pipeline.add_stage("publish", self._publish_stage)
+            display_queue = pipeline.add_sink("display")
+            return pipeline, display_queue
+        pipeline.add_stage("preprocess", self._preprocess_stage)
+        pipeline.add_stage("infer", self._infer_stage)
+        pipeline.add_stage("postprocess", self._postprocess_stage)
+        pipeline.add_stage("publish", self._publish_stage)
+        display_queue = pipeline.add_sink("display")
+        return pipeline, display_queue
         
     def setup(self):
         """Khởi tạo hệ thống"""
         system_logger.info("🚀 Khởi tạo hệ thống Raspberry Pi 5...")
         
-        # Load model
-        if not self.detector.load_model():
+        # Load model (trong process chính hoặc trong các worker của pool)
+        if self.inference_pool:
+            if not self.inference_pool.start():
+                system_logger.error("❌ Không thể khởi động inference pool!")
+                return False
+        elif not self.detector.load_model():
             system_logger.error("❌ Không thể load model!")
             return False
+        # load_model đã warmup (pool: mỗi worker tự warmup trước khi báo ready)
+        startup_profile.mark("model_loaded")
+        warmup_time = self.inference_pool.warmup_time if self.inference_pool else self.detector.warmup_time
+        self.performance_monitor.set_warmup_time(warmup_time)
+        
+        # Chọn kích thước input theo latency/kích thước object (chỉ khi có nhiều size)
+        if DYNAMIC_RESOLUTION:
+            sizes = self.detector.available_sizes()
+            if len(sizes) > 1:
+                self.resolution_controller = ResolutionController(sizes)
+            elif self.inference_pool:
+                system_logger.info("Dynamic resolution is not used in pool mode")
+        
+        # Governor điều chỉnh detector/resolution/JPEG theo nhiệt độ và tải (worker của pool giữ số thread)
+        if GOVERNOR_ENABLED:
+            self.governor = PerformanceGovernor(
+                self.performance_monitor,
+                detector=None if self.inference_pool else self.detector,
+                resolution_controller=self.resolution_controller,
+                image_encoder=self.mqtt_service.image_encoder if self.mqtt_service else None)
         
         # Khởi tạo camera
         if not self.camera_manager.initialize():
@@ -55,33 +178,117 @@ class RaspberryPiSystem:
         if not self.camera_manager.start_capture():
             system_logger.error("❌ Không thể bắt đầu camera capture!")
             return False
+        startup_profile.mark("camera_started")
         
         # Kết nối UART
-        if not self.uart_service.connect():
+        if self.uart_service and not self.uart_service.connect():
             system_logger.warning("⚠️ Không thể kết nối UART, tiếp tục không có UART...")
         
         # Kết nối MQTT
-        if not self.mqtt_service.connect():
-            system_logger.warning("⚠️ Không thể kết nối MQTT, tiếp tục không có MQTT...")
+        if self.mqtt_service:
+            if not self.mqtt_service.connect():
+                system_logger.warning("⚠️ Không thể kết nối MQTT, tiếp tục không có MQTT...")
+            elif self.mqtt_publisher:
+                self.mqtt_publisher.start()
+        startup_profile.mark("services_connected")
         
         # Bắt đầu performance monitoring
         self.performance_monitor.start_monitoring()
+        if self.governor:
+            self.governor.start()
+        if self.metrics_exporter and not self.metrics_exporter.start():
+            system_logger.warning("⚠️ Không thể mở metrics endpoint, tiếp tục không có metrics...")
+        
+        # Bắt đầu pipeline
+        if self.pipeline:
+            self.pipeline.start()
         
+        startup_profile.mark("ready")
         system_logger.info("✅ Hệ thống khởi tạo thành công!")
         return True
     
-    def process_frame(self, frame):
+    def process_frame(self, frame, frame_id=-1):
         """Xử lý một frame"""
-        # Thực hiện detection
+        # Thực hiện detection (motion gate / scheduler có thể bỏ qua frame này)
         start_inference = time.time()
-        detections = self.detector.detect(frame)
-        inference_time = (time.time() - start_inference) * 1000
+        detect, motion = self._should_detect(frame, start_inference, frame_id)
+        if detect:
+            input_size = self.resolution_controller.current_size if self.resolution_controller else None
+            self.detector.set_input_size(input_size)
+            regions = self._plan_regions(frame, start_inference)
+            start_inference = time.time()
+            detections = self.detector.detect(frame, regions, on_stage=self.performance_monitor.record_stage)
+            inference_time = (time.time() - start_inference) * 1000
+            startup_profile.mark_first_inference()
+        else:
+            detections, inference_time = None, 0
+        
+        # Phần còn lại tương ứng stage publish của pipeline
+        start_publish = time.time()
+        
+        # Gán track id + làm mượt bbox
+        detections = self._update_tracks(detections, start_inference, inference_time, motion)
+        if detect and self.resolution_controller:
+            self.resolution_controller.update(input_size, inference_time, detections, frame.shape)
         
         # Cập nhật performance monitor
         self.performance_monitor.update_fps()
-        self.performance_monitor.add_inference_time(inference_time)
+        if detect:
+            self.performance_monitor.add_inference_time(inference_time)
+        
+        # Frame từ ring buffer là view read-only -> copy một lần để vẽ
+        annotated = self.annotate_frame(frame.copy(), detections, inference_time)
+        
+        # Xử lý detections (ảnh MQTT lấy từ frame gốc trừ khi bật overlay)
+        if detections or self.event_engine:
+            self.handle_detections(detections, annotated if MQTT_IMAGE_OVERLAY else frame, frame_id)
+        
+        self.performance_monitor.record_stage("publish", (time.time() - start_publish) * 1000)
+        return annotated
+    
+    def _should_detect(self, frame, timestamp, frame_id=-1):
+        """Motion gate rồi scheduler: trả về (detect, motion)"""
+        if self.motion_gate:
+            start_gate = time.time()
+            # Dùng lores stream của camera nếu có (không phải resize/chuyển xám frame chính)
+            lores = self.camera_manager.get_lores(frame_id)
+            motion = self.motion_gate.check(lores if lores is not None else frame, timestamp)
+            self.performance_monitor.add_gate_result(motion, (time.time() - start_gate) * 1000)
+            if not motion:
+                return False, False
+        # Governor giới hạn tần suất detect (MIN_INFERENCE_TIME x hệ số của level)
+        if self.governor and not self.governor.can_detect(timestamp):
+            return False, True
+        detect = self.scheduler is None or self.scheduler.should_detect(timestamp)
+        if detect and self.governor:
+            self.governor.record_detect(timestamp)
+        return detect, True
+    
+    def _plan_regions(self, frame, timestamp):
+        """Vùng detect của frame (None = full frame) theo bbox gần nhất đã qua tracker"""
+        if not self.region_planner:
+            return None
+        return self.region_planner.plan(frame.shape, self.held_detections, timestamp)
+    
+    def _update_tracks(self, detections, timestamp, inference_time, motion=True):
+        """Tracker update sau khi detect, hoặc dùng lại kết quả khi frame bị bỏ qua (detections None)
         
-        # Vẽ detections
+        Frame bị bỏ qua: tracker.predict() ngoại suy khi có chuyển động, giữ nguyên bbox khi cảnh tĩnh.
+        """
+        if detections is None:
+            if self.tracker is None:
+                return self.held_detections
+            return self.tracker.predict(timestamp if motion else self.tracker.last_time)
+        # Tracker rỗng có len() = 0 nên phải so với None, không dùng truthiness
+        if self.tracker is not None:
+            detections = self.tracker.update(detections, timestamp)
+        if self.scheduler:
+            self.scheduler.record_detection(inference_time, detections)
+        self.held_detections = detections
+        return detections
+    
+    def annotate_frame(self, frame, detections, inference_time):
+        """Vẽ detections và thông tin hiệu suất lên frame"""
         frame = self.detector.draw_detections(frame, detections)
         
         # Lấy performance stats
@@ -97,14 +304,129 @@ class RaspberryPiSystem:
         cv2.putText(frame, f"CPU: {stats['cpu_usage']:.1f}%", (10, 150), 
                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
         
-        # Xử lý detections
-        if detections:
-            self.handle_detections(detections, frame)
-        
         return frame
     
-    def handle_detections(self, detections, frame):
+    def _collect_metrics(self, writer):
+        """Collector của metrics exporter, chạy trên thread HTTP mỗi lần scrape"""
+        from services.metrics_exporter import (collect_performance, collect_startup, collect_pipeline,
+                                               collect_camera, collect_inference_pool, collect_mqtt,
+                                               collect_uart, collect_governor, collect_system)
+        collect_performance(writer, self.performance_monitor)
+        collect_startup(writer)
+        collect_camera(writer, self.camera_manager)
+        if self.pipeline:
+            collect_pipeline(writer, self.pipeline)
+        if self.inference_pool and self.inference_pool.is_running:
+            collect_inference_pool(writer, self.inference_pool)
+        if self.mqtt_service:
+            collect_mqtt(writer, self.mqtt_service, self.mqtt_publisher)
+        if self.uart_service:
+            collect_uart(writer, self.uart_service)
+        if self.governor:
+            collect_governor(writer, self.governor)
+        collect_system(writer)
+    
+    def _release_item(self, item):
+        """Trả slot ring buffer của item (khi xử lý xong hoặc bị drop)"""
+        if item.frame is not None:
+            item.frame = None
+            self.camera_manager.release_frame(item.frame_id)
+    
+    def _capture_stage(self, _):
+        """Stage capture: lấy frame mới từ ring buffer"""
+        frame_id, frame = self.camera_manager.acquire_frame(self.last_frame_id, timeout=0.1)
+        if frame is None:
+            return None
+        self.last_frame_id = frame_id
+        item = PipelineItem(frame_id, frame)
+        try:
+            item.detect, item.motion = self._should_detect(frame, item.created_at, frame_id)
+            if self.resolution_controller:
+                item.input_size = self.resolution_controller.current_size
+            if item.detect:
+                item.regions = self._plan_regions(frame, item.created_at)
+        except Exception:
+            # Stage source: slot vừa lấy chưa thuộc queue nào, lỗi thì phải tự trả
+            self._release_item(item)
+            raise
+        return item
+    
+    def _preprocess_stage(self, item):
+        """Stage preprocess: letterbox/normalize"""
+        if item.detect:
+            item.blob, item.meta = self.detector.preprocess(item.frame, item.input_size, item.regions)
+        return item
+    
+    def _infer_stage(self, item):
+        """Stage inference"""
+        if not item.detect:
+            return item
+        start_inference = time.time()
+        item.output = self.detector.infer(item.blob)
+        item.inference_time = (time.time() - start_inference) * 1000
+        item.blob = None
+        return item
+    
+    def _postprocess_stage(self, item):
+        """Stage postprocess: decode + NMS"""
+        if not item.detect:
+            return item
+        item.detections = self.detector.postprocess(item.output, item.meta)
+        item.output = None
+        return item
+    
+    def _submit_stage(self, item):
+        """Stage submit: copy frame vào shared memory của inference pool"""
+        if not item.detect:
+            # Không inference nhưng vẫn giữ thứ tự frame trong pool
+            self.inference_pool.skip(item.frame_id, context=item)
+            return None
+        if not self.inference_pool.submit(item.frame_id, item.frame, context=item, timeout=1.0):
+            self._release_item(item)
+        return None
+    
+    def _collect_stage(self, _):
+        """Stage collect: lấy kết quả từ pool theo thứ tự frame id"""
+        result = self.inference_pool.get_result(timeout=0.1)
+        if result is None:
+            return None
+        _, detections, inference_time, item = result
+        if detections is None:
+            # Frame bị bỏ qua hoặc mất do worker chết: xử lý như frame không detect
+            item.detect = False
+        item.detections = detections
+        item.inference_time = inference_time
+        return item
+    
+    def _publish_stage(self, item):
+        """Stage publish: vẽ, gửi UART/MQTT rồi trả slot ring buffer"""
+        self.performance_monitor.update_fps()
+        if item.detect:
+            self.performance_monitor.add_inference_time(item.inference_time)
+            startup_profile.mark_first_inference()
+        
+        # Stage publish chạy trên một thread và nhận frame theo thứ tự -> tracker ở đây
+        item.detections = self._update_tracks(item.detections, item.created_at, item.inference_time,
+                                              item.motion)
+        if item.detect and self.resolution_controller:
+            self.resolution_controller.update(item.input_size, item.inference_time, item.detections,
+                                              item.frame.shape)
+        
+        item.annotated = self.annotate_frame(item.frame.copy(), item.detections, item.inference_time)
+        
+        # Gửi trước khi trả slot: crop/thumbnail được lấy trực tiếp từ frame gốc
+        if item.detections or self.event_engine:
+            frame = item.annotated if MQTT_IMAGE_OVERLAY else item.frame
+            self.handle_detections(item.detections, frame, item.frame_id)
+        self._release_item(item)
+        return item
+    
+    def handle_detections(self, detections, frame, frame_id=-1):
         """Xử lý khi có detections"""
+        if self.event_engine:
+            self.handle_events(detections, frame, frame_id)
+            return
+        
         current_time = time.time()
         
         # Chỉ xử lý nếu đã qua khoảng thời gian interval
@@ -113,16 +435,45 @@ class RaspberryPiSystem:
             self.last_detections = detections
             
             # Gửi lệnh đến ESP32
-            for detection in detections:
-                class_name = detection["class"]
-                confidence = detection["confidence"]
-                self.uart_service.send_detection(class_name, confidence)
+            if self.uart_service:
+                for class_name, confidence in zip(detections.names(), detections.conf.tolist()):
+                    self.uart_service.send_detection(class_name, confidence)
             
-            # Gửi dữ liệu đến MQTT
-            self.mqtt_service.send_detection_data(detections)
-            
-            # Gửi ảnh đến MQTT (chỉ khi có detection)
-            self.mqtt_service.send_image(frame, detections)
+            if self.mqtt_publisher:
+                # Encode + publish trên worker của publisher, không chờ network
+                self.mqtt_publisher.publish_detections(detections)
+                self.mqtt_publisher.publish_image(frame, detections, frame_id)
+            elif self.mqtt_service:
+                # Gửi dữ liệu đến MQTT
+                self.mqtt_service.send_detection_data(detections)
+                
+                # Gửi ảnh đến MQTT (chỉ khi có detection)
+                self.mqtt_service.send_image(frame, detections, frame_id)
+    
+    def handle_events(self, detections, frame, frame_id=-1):
+        """Chỉ gửi UART/MQTT khi có event (object xuất hiện, di chuyển hoặc biến mất)"""
+        events = self.event_engine.update(detections)
+        if not events:
+            return
+        
+        self.last_detection_time = time.time()
+        self.last_detections = detections
+        visible = [event for event in events if event.type != DISAPPEARED]
+        
+        # Gửi lệnh đến ESP32 cho object mới xuất hiện / di chuyển
+        if self.uart_service:
+            for event in visible:
+                self.uart_service.send_detection(event.class_name, event.confidence)
+        
+        # Ảnh chỉ có ý nghĩa khi object còn trong frame
+        if self.mqtt_publisher:
+            self.mqtt_publisher.publish_detections(detections, events)
+            if visible:
+                self.mqtt_publisher.publish_image(frame, detections, frame_id)
+        elif self.mqtt_service:
+            self.mqtt_service.send_detection_data(detections, events)
+            if visible:
+                self.mqtt_service.send_image(frame, detections, frame_id)
     
     def run(self):
         """Chạy hệ thống chính"""
@@ -131,43 +482,112 @@ class RaspberryPiSystem:
         
         self.running = True
         
+        if self.pipeline:
+            self._run_pipeline()
+        else:
+            self._run_sequential()
+        
+        self.cleanup()
+    
+    def _show(self, frame):
+        """Hiển thị frame (nếu bật display), trả về False khi nhấn 'q'"""
+        if not DISPLAY_ENABLED:
+            return True
+        if frame is not None:
+            cv2.imshow('Raspberry Pi 5 - YOLO Detection', frame)
+        return cv2.waitKey(1) & 0xFF != ord('q')
+    
+    def _run_pipeline(self):
+        """Main thread chỉ hiển thị kết quả, các stage chạy trên thread riêng"""
+        last_output_time = time.time()
+        while self.running:
+            item = self.display_queue.get(timeout=0.1)
+            if item is not None:
+                last_output_time = time.time()
+            elif self.camera_manager.finished and time.time() - last_output_time > 1.0:
+                # Nguồn replay đã hết và pipeline không còn frame nào
+                break
+            
+            # Log queue depth và latency của từng stage
+            if time.time() - self.last_stats_time >= PIPELINE_STATS_INTERVAL:
+                self.last_stats_time = time.time()
+                system_logger.info(f"Pipeline - {self.pipeline.format_stats()}")
+                if self.mqtt_publisher and self.mqtt_publisher.is_running:
+                    system_logger.info(f"MQTT publisher - {self.mqtt_publisher.get_stats()}")
+                if self.tracker is not None:
+                    system_logger.info(f"Tracker - {self.tracker.get_stats()}")
+                if self.scheduler:
+                    system_logger.info(f"Scheduler - {self.scheduler.get_stats()}")
+                if self.motion_gate:
+                    system_logger.info(f"Motion gate - {self.motion_gate.get_stats()}")
+                if self.resolution_controller:
+                    system_logger.info(f"Resolution - {self.resolution_controller.get_stats()}")
+                if self.region_planner:
+                    system_logger.info(f"Regions - {self.region_planner.get_stats()}")
+                if self.governor:
+                    system_logger.info(f"Governor - {self.governor.get_stats()}")
+                if self.event_engine:
+                    system_logger.info(f"Events - {self.event_engine.get_stats()}")
+            
+            # Hiển thị + kiểm tra phím
+            if not self._show(item.annotated if item is not None else None):
+                break
+    
+    def _run_sequential(self):
+        """Chạy tuần tự detection + I/O trên một thread"""
         while self.running:
-            # Lấy frame từ camera manager
-            frame = self.camera_manager.get_frame()
+            # Lấy frame mới từ ring buffer (bỏ qua frame đã xử lý)
+            start_capture = time.time()
+            frame_id, frame = self.camera_manager.acquire_frame(self.last_frame_id, timeout=0.1)
             if frame is None:
-                time.sleep(0.01)
+                if self.camera_manager.finished:
+                    break
                 continue
+            self.performance_monitor.record_stage("capture", (time.time() - start_capture) * 1000)
+            self.last_frame_id = frame_id
             
             # Xử lý frame
-            processed_frame = self.process_frame(frame)
-            
-            # Hiển thị
-            cv2.imshow('Raspberry Pi 5 - YOLO Detection', processed_frame)
+            try:
+                processed_frame = self.process_frame(frame, frame_id)
+            finally:
+                self.camera_manager.release_frame(frame_id)
             
-            # Kiểm tra phím
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('q'):
+            # Hiển thị + kiểm tra phím
+            if not self._show(processed_frame):
                 break
-        
-        self.cleanup()
     
     def cleanup(self):
         """Dọn dẹp tài nguyên"""
         system_logger.info("🧹 Đang dọn dẹp...")
         self.running = False
         
+        # Dừng pipeline trước để trả lại các slot của ring buffer
+        if self.pipeline:
+            self.pipeline.stop()
+        if self.inference_pool and self.inference_pool.is_running:
+            self.inference_pool.stop()
+        
         # Dừng performance monitoring
         self.performance_monitor.stop_monitoring()
+        if self.governor and self.governor.is_running:
+            self.governor.stop()
+        if self.metrics_exporter:
+            self.metrics_exporter.stop()
         
         # Dừng camera
         self.camera_manager.stop_capture()
         self.camera_manager.release()
         
         # Ngắt kết nối services
-        self.uart_service.disconnect()
-        self.mqtt_service.disconnect()
+        if self.mqtt_publisher and self.mqtt_publisher.is_running:
+            self.mqtt_publisher.stop()
+        if self.uart_service:
+            self.uart_service.disconnect()
+        if self.mqtt_service:
+            self.mqtt_service.disconnect()
         
-        cv2.destroyAllWindows()
+        if DISPLAY_ENABLED:
+            cv2.destroyAllWindows()
         system_logger.info("👋 Đã thoát!")
     
     def signal_handler(self, sig, frame):
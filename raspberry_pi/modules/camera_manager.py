@@ -2,38 +2,56 @@
 Camera Manager Module
 """
 
-import cv2
 import threading
 import time
-from configs.settings import CAMERA_WIDTH, CAMERA_HEIGHT, CAMERA_FPS
+import numpy as np
+from configs.settings import CAMERA_WIDTH, CAMERA_HEIGHT, CAMERA_BUFFER_SIZE
+from modules.frame_sources import create_source
 from utils.logger import system_logger
 
 class CameraManager:
-    def __init__(self):
-        self.camera = None
+    def __init__(self, buffer_size=CAMERA_BUFFER_SIZE, source=None):
+        # source: FrameSource bất kỳ (mặc định tạo theo CAMERA_SOURCE trong settings)
+        self.camera = source
         self.is_running = False
-        self.current_frame = None
         self.frame_lock = threading.Lock()
+        self.frame_ready = threading.Condition(self.frame_lock)
         self.camera_thread = None
         
+        # Ring buffer: capture thread đọc thẳng vào slot trống, consumer nhận view read-only
+        self.buffer_size = max(2, buffer_size)
+        self.slots = None
+        # Lores (ảnh xám nhỏ cho motion gate) đi kèm từng slot nếu nguồn có lores stream
+        self.lores_slots = None
+        self.slot_ids = [-1] * self.buffer_size
+        self.slot_refs = [0] * self.buffer_size
+        self.latest_slot = -1
+        self.frame_id = -1
+        self.acquired_id = -1
+        self.dropped_frames = 0
+        self.finished = False
+        
     def initialize(self):
         """Khởi tạo camera"""
         try:
-            self.camera = cv2.VideoCapture(0)
-            self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)
-            self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_HEIGHT)
-            self.camera.set(cv2.CAP_PROP_FPS, CAMERA_FPS)
-            
-            if not self.camera.isOpened():
-                system_logger.error("Cannot open camera!")
-                return False
+            if self.camera is None:
+                self.camera = create_source()
+            self.camera.open()
             
-            system_logger.info("Camera initialized successfully")
+            self._allocate_slots((CAMERA_HEIGHT, CAMERA_WIDTH, 3))
+            system_logger.info(f"Camera initialized successfully ({self.camera.get_info()})")
             return True
         except Exception as e:
             system_logger.error(f"Camera initialization failed: {e}")
             return False
     
+    def _allocate_slots(self, shape):
+        """Cấp phát trước các slot của ring buffer"""
+        self.slots = np.zeros((self.buffer_size,) + tuple(shape), dtype=np.uint8)
+        self.slot_ids = [-1] * self.buffer_size
+        self.slot_refs = [0] * self.buffer_size
+        self.latest_slot = -1
+    
     def start_capture(self):
         """Bắt đầu capture frames"""
         if not self.camera:
@@ -54,26 +72,119 @@ class CameraManager:
             self.camera_thread.join()
         system_logger.info("Camera capture stopped")
     
+    def _next_free_slot(self):
+        """Tìm slot không bị consumer giữ và không phải frame mới nhất"""
+        with self.frame_lock:
+            for offset in range(1, self.buffer_size + 1):
+                slot = (self.latest_slot + offset) % self.buffer_size
+                if slot != self.latest_slot and self.slot_refs[slot] == 0:
+                    return slot
+        return None
+    
+    def _wait_consumed(self):
+        """Pacing "fast": chờ consumer lấy frame mới nhất rồi mới đọc frame tiếp (không bỏ frame)"""
+        with self.frame_ready:
+            self.frame_ready.wait_for(lambda: self.acquired_id >= self.frame_id or not self.is_running, 0.5)
+    
     def _capture_loop(self):
         """Loop capture frames"""
         while self.is_running:
             try:
-                ret, frame = self.camera.read()
-                if ret:
-                    with self.frame_lock:
-                        self.current_frame = frame.copy()
-                else:
+                if self.camera.pacing == "fast":
+                    self._wait_consumed()
+                slot = self._next_free_slot()
+                if slot is None:
+                    # Consumer đang giữ hết slot -> bỏ frame này
+                    self.camera.grab()
+                    self.dropped_frames += 1
+                    continue
+                
+                buffer = self.slots[slot]
+                ret, frame = self.camera.read(buffer)
+                if not ret and self.camera.finished:
+                    # Nguồn replay đã hết frame
+                    system_logger.info(f"Frame source finished after {self.frame_id + 1} frames")
+                    with self.frame_ready:
+                        self.finished = True
+                        self.frame_ready.notify_all()
+                    break
+                if not ret:
                     system_logger.warning("Failed to read frame from camera")
                     time.sleep(0.1)
+                    continue
+                
+                if frame.shape != buffer.shape:
+                    # Camera trả về kích thước khác cấu hình -> cấp phát lại ring buffer
+                    with self.frame_lock:
+                        if any(self.slot_refs):
+                            self.dropped_frames += 1
+                            continue
+                        system_logger.warning(f"Camera frame shape {frame.shape}, reallocating buffer")
+                        self._allocate_slots(frame.shape)
+                    buffer = self.slots[slot]
+                if not np.shares_memory(frame, buffer):
+                    buffer[...] = frame
+                lores = self.camera.lores
+                if lores is not None:
+                    if self.lores_slots is None or self.lores_slots.shape[1:] != lores.shape:
+                        self.lores_slots = np.zeros((self.buffer_size,) + lores.shape, dtype=np.uint8)
+                    self.lores_slots[slot] = lores
+                
+                with self.frame_ready:
+                    # Frame id = vị trí trong nguồn, frame bị bỏ (grab) vẫn giữ id của nó
+                    self.frame_id = self.camera.index
+                    self.slot_ids[slot] = self.frame_id
+                    self.latest_slot = slot
+                    self.frame_ready.notify_all()
             except Exception as e:
                 system_logger.error(f"Camera capture error: {e}")
                 time.sleep(0.1)
     
+    def acquire_frame(self, last_frame_id=-1, timeout=0):
+        """Lấy frame mới hơn last_frame_id: trả về (frame_id, view read-only) hoặc (None, None)
+        
+        Slot được giữ cho tới khi gọi release_frame(frame_id).
+        """
+        with self.frame_ready:
+            if self.frame_id <= last_frame_id and timeout > 0:
+                self.frame_ready.wait_for(lambda: self.frame_id > last_frame_id, timeout)
+            if self.latest_slot < 0 or self.frame_id <= last_frame_id:
+                return None, None
+            
+            slot = self.latest_slot
+            self.slot_refs[slot] += 1
+            if self.slot_ids[slot] > self.acquired_id:
+                self.acquired_id = self.slot_ids[slot]
+                self.frame_ready.notify_all()
+            view = self.slots[slot].view()
+            view.flags.writeable = False
+            return self.slot_ids[slot], view
+    
+    def get_lores(self, frame_id):
+        """Lores của frame đang được giữ (view read-only), None nếu nguồn không có lores"""
+        with self.frame_lock:
+            if self.lores_slots is None:
+                return None
+            for slot in range(self.buffer_size):
+                if self.slot_ids[slot] == frame_id and self.slot_refs[slot] > 0:
+                    view = self.lores_slots[slot].view()
+                    view.flags.writeable = False
+                    return view
+        return None
+    
+    def release_frame(self, frame_id):
+        """Trả slot của frame_id về ring buffer"""
+        with self.frame_lock:
+            for slot in range(self.buffer_size):
+                if self.slot_ids[slot] == frame_id and self.slot_refs[slot] > 0:
+                    self.slot_refs[slot] -= 1
+                    return
+    
     def get_frame(self):
-        """Lấy frame hiện tại"""
+        """Lấy bản copy của frame hiện tại (cho consumer cần sửa frame)"""
         with self.frame_lock:
-            if self.current_frame is not None:
-                return self.current_frame.copy()
+            if self.latest_slot >= 0:
+                return self.slots[self.latest_slot].copy()
         return None
     
     def release(self):
@@ -89,16 +200,13 @@ class CameraManager:
             return None
         
         try:
-            width = int(self.camera.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(self.camera.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            fps = self.camera.get(cv2.CAP_PROP_FPS)
-            
-            return {
-                "width": width,
-                "height": height,
-                "fps": fps,
-                "is_opened": self.camera.isOpened()
-            }
+            info = self.camera.get_info()
+            info.update({
+                "frame_id": self.frame_id,
+                "dropped_frames": self.dropped_frames,
+                "finished": self.finished
+            })
+            return info
         except Exception as e:
             system_logger.error(f"Error getting camera info: {e}")
             return None 
\ No newline at end of file
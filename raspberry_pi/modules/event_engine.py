@@ -0,0 +1,179 @@
+"""
+Event Engine Module
+Biến kết quả detection theo từng frame thành event khi trạng thái thay đổi:
+appeared / moved / disappeared, có hysteresis confidence và cooldown theo class
+Nếu detections đã qua tracker thì mỗi track là một object riêng, ngược lại mỗi class là một object
+"""
+
+import time
+import numpy as np
+from configs.settings import (EVENT_CONF_ON, EVENT_CONF_OFF, EVENT_MOVE_THRESHOLD,
+                              EVENT_DISAPPEAR_TIME, EVENT_COOLDOWN, EVENT_CLASS_COOLDOWNS)
+
+APPEARED = "appeared"
+MOVED = "moved"
+DISAPPEARED = "disappeared"
+
+class Event:
+    """Một thay đổi trạng thái của object"""
+    __slots__ = ("type", "class_id", "class_name", "confidence", "bbox", "center", "timestamp",
+                 "track_id")
+
+    def __init__(self, event_type, class_id, class_name, confidence, bbox, center, timestamp,
+                 track_id=-1):
+        self.type = event_type
+        self.track_id = track_id
+        self.class_id = class_id
+        self.class_name = class_name
+        self.confidence = confidence
+        self.bbox = bbox
+        self.center = center
+        self.timestamp = timestamp
+
+    def to_dict(self):
+        """Dict cho JSON payload"""
+        data = {
+            "type": self.type,
+            "class": self.class_name,
+            "class_id": self.class_id,
+            "confidence": self.confidence,
+            "bbox": self.bbox,
+            "center": self.center,
+            "timestamp": self.timestamp
+        }
+        if self.track_id >= 0:
+            data["track_id"] = self.track_id
+        return data
+
+class _ObjectState:
+    """Trạng thái hiện tại của một object (class hoặc track)"""
+    __slots__ = ("present", "last_seen", "published_center", "confidence", "bbox", "center")
+
+    def __init__(self):
+        self.present = False
+        self.last_seen = 0
+        self.published_center = None
+        self.confidence = 0
+        self.bbox = None
+        self.center = None
+
+class EventEngine:
+    def __init__(self, conf_on=EVENT_CONF_ON, conf_off=EVENT_CONF_OFF, move_threshold=EVENT_MOVE_THRESHOLD,
+                 disappear_time=EVENT_DISAPPEAR_TIME, cooldown=EVENT_COOLDOWN,
+                 class_cooldowns=EVENT_CLASS_COOLDOWNS):
+        # conf_on > conf_off: object phải đủ chắc mới "xuất hiện", nhưng chỉ mất khi tụt dưới conf_off
+        self.conf_on = conf_on
+        self.conf_off = min(conf_off, conf_on)
+        self.move_threshold = move_threshold
+        self.disappear_time = disappear_time
+        self.cooldown = cooldown
+        self.class_cooldowns = dict(class_cooldowns)
+        self.states = {}
+        # Thời điểm event gần nhất của mỗi class: cooldown dùng chung cho mọi object (track) cùng class
+        self.class_event_times = {}
+
+        # Thống kê
+        self.frames = 0
+        self.event_counts = {APPEARED: 0, MOVED: 0, DISAPPEARED: 0}
+        self.suppressed = 0
+
+    def get_cooldown(self, class_name):
+        """Cooldown của class (mặc định EVENT_COOLDOWN)"""
+        return self.class_cooldowns.get(class_name, self.cooldown)
+
+    def update(self, detections, timestamp=None):
+        """Cập nhật trạng thái từ detections của một frame, trả về list Event
+
+        Gọi mỗi frame, kể cả khi không có detection (để phát hiện disappeared).
+        """
+        timestamp = timestamp or time.time()
+        self.frames += 1
+        seen = self._best_per_object(detections)
+        events = []
+
+        for key in seen.keys() | self.states.keys():
+            state = self.states.get(key)
+            if state is None:
+                state = self.states[key] = _ObjectState()
+            class_id, track_id = key
+            class_name = detections.class_names.get(class_id, f"class_{class_id}")
+            best = seen.get(key)
+
+            # Hysteresis: ngưỡng để giữ object thấp hơn ngưỡng để bắt đầu
+            threshold = self.conf_off if state.present else self.conf_on
+            if best is not None and best["conf"] >= threshold:
+                state.last_seen = timestamp
+                state.confidence = float(best["conf"])
+                state.bbox = best["xyxy"].tolist()
+                state.center = best["center"].tolist()
+                event_type = self._visible_event(state, class_name, timestamp)
+            elif state.present and timestamp - state.last_seen >= self.disappear_time:
+                # Chỉ báo mất sau disappear_time để không nhấp nháy khi miss vài frame
+                state.present = False
+                event_type = DISAPPEARED
+                if track_id >= 0:
+                    # Track id không bao giờ dùng lại
+                    del self.states[key]
+            elif track_id >= 0 and not state.present and timestamp - state.last_seen >= self.disappear_time:
+                # Track chưa từng đủ confidence để xuất hiện
+                del self.states[key]
+                event_type = None
+            else:
+                event_type = None
+
+            if event_type is not None:
+                if event_type != DISAPPEARED:
+                    state.published_center = state.center
+                self.class_event_times[class_name] = timestamp
+                self.event_counts[event_type] += 1
+                events.append(Event(event_type, class_id, class_name, state.confidence,
+                                    state.bbox, state.center, timestamp, track_id))
+        return events
+
+    def _visible_event(self, state, class_name, timestamp):
+        """Event cho object đang thấy: appeared, moved hoặc None (không đổi / đang cooldown)"""
+        # Xuất hiện không bị cooldown để giữ latency phản ứng
+        # (nhấp nháy đã được chặn bởi hysteresis + disappear_time)
+        if not state.present:
+            state.present = True
+            return APPEARED
+
+        dx = state.center[0] - state.published_center[0]
+        dy = state.center[1] - state.published_center[1]
+        if dx * dx + dy * dy < self.move_threshold * self.move_threshold:
+            return None
+        if timestamp - self.class_event_times.get(class_name, 0) < self.get_cooldown(class_name):
+            self.suppressed += 1
+            return None
+        return MOVED
+
+    @staticmethod
+    def _best_per_object(detections):
+        """Map (class_id, track_id) -> detection
+
+        Có track id: mỗi track một object. Không có: detection confidence cao nhất
+        của mỗi class (vectorized), track_id = -1.
+        """
+        data = detections.data
+        if len(data) == 0:
+            return {}
+        if detections.track_ids is not None:
+            return {key: det for key, det in zip(zip(data["cls"].tolist(), data["track_id"].tolist()), data)}
+        order = np.lexsort((-data["conf"], data["cls"]))
+        classes = data["cls"][order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = classes[1:] != classes[:-1]
+        return {(int(data["cls"][i]), -1): data[i] for i in order[first]}
+
+    def get_present(self):
+        """Danh sách (class_id, track_id) đang có mặt"""
+        return [key for key, state in self.states.items() if state.present]
+
+    def get_stats(self):
+        """Thống kê event"""
+        return {
+            "frames": self.frames,
+            "events": dict(self.event_counts),
+            "suppressed": self.suppressed,
+            "present": len(self.get_present())
+        }
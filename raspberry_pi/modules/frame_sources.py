@@ -0,0 +1,365 @@
+"""
+Frame Sources Module
+Nguồn frame cho CameraManager: camera V4L2, Picamera2 (libcamera), file video, thư mục ảnh
+hoặc frame tổng hợp
+Các nguồn replay có frame id cố định (frame thứ N của nguồn luôn có id N) để tái hiện lỗi
+và benchmark end-to-end mà không cần camera
+"""
+
+import glob
+import os
+import time
+import cv2
+import numpy as np
+from configs.settings import (CAMERA_WIDTH, CAMERA_HEIGHT, CAMERA_FPS, CAMERA_SOURCE, CAMERA_DEVICE,
+                              CAMERA_SOURCE_PATH, CAMERA_PACING, CAMERA_LOOP, CAMERA_FORMAT,
+                              CAMERA_LORES_ENABLED, MOTION_WIDTH)
+
+PACINGS = ("realtime", "fast")
+# Thứ tự thử format khi CAMERA_FORMAT = "auto"
+DEVICE_FORMATS = ("MJPG", "YUYV")
+# RGB888 của Picamera2 có layout BGR: ISP chuyển màu, CPU chỉ copy vào ring buffer
+PICAMERA2_FORMATS = ("RGB888", "YUV420", "XBGR8888")
+IMAGE_EXTENSIONS = ("*.jpg", "*.jpeg", "*.png", "*.bmp")
+
+class FrameSource:
+    """Giao diện chung giống cv2.VideoCapture: read(buffer) -> (ret, frame), grab(), release()
+
+    index: vị trí trong nguồn của frame vừa đọc/bỏ qua (tăng cả khi grab)
+    pacing "realtime": giữ nhịp fps của nguồn, "fast": đọc nhanh nhất có thể
+    lores: ảnh xám nhỏ của frame vừa đọc (None nếu nguồn không có lores stream)
+    """
+    kind = None
+
+    def __init__(self, width=CAMERA_WIDTH, height=CAMERA_HEIGHT, fps=CAMERA_FPS, pacing=CAMERA_PACING,
+                 loop=CAMERA_LOOP):
+        if pacing not in PACINGS:
+            raise ValueError(f"Unknown camera pacing: {pacing}")
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.pacing = pacing
+        self.loop = loop
+        self.index = -1
+        self.finished = False
+        self.next_time = None
+        self.lores = None
+
+    def open(self):
+        """Mở nguồn, báo lỗi nếu không mở được"""
+
+    def isOpened(self):
+        return not self.finished
+
+    def _read(self, buffer):
+        """Đọc frame tiếp theo (chỉ số self.index + 1): trả về frame hoặc None khi hết nguồn"""
+        raise NotImplementedError
+
+    def _pace(self):
+        """Chờ tới thời điểm của frame tiếp theo theo fps (không bù khi bị chậm)"""
+        if self.pacing != "realtime" or not self.fps:
+            return
+        now = time.time()
+        if self.next_time is not None and self.next_time > now:
+            time.sleep(self.next_time - now)
+            now = self.next_time
+        self.next_time = now + 1 / self.fps
+
+    def read(self, buffer=None):
+        """Đọc frame vào buffer (nếu cùng kích thước)"""
+        if self.finished:
+            return False, None
+        self._pace()
+        frame = self._read(buffer)
+        if frame is None:
+            self.finished = True
+            return False, None
+        self.index += 1
+        return True, frame
+
+    def grab(self):
+        """Bỏ qua một frame (vẫn tính index để frame id không đổi)"""
+        return self.read()[0]
+
+    def release(self):
+        self.finished = True
+
+    def _fit(self, frame, buffer):
+        """Resize frame về kích thước cấu hình, ghi thẳng vào buffer khi có"""
+        size = (self.width, self.height)
+        if frame.shape[1::-1] == size:
+            if buffer is not None and buffer.shape == frame.shape:
+                buffer[...] = frame
+                return buffer
+            return frame
+        if buffer is not None and buffer.shape == (self.height, self.width, 3):
+            return cv2.resize(frame, size, dst=buffer, interpolation=cv2.INTER_LINEAR)
+        return cv2.resize(frame, size, interpolation=cv2.INTER_LINEAR)
+
+    def get_info(self):
+        """Thông tin nguồn"""
+        return {
+            "source": self.kind,
+            "width": self.width,
+            "height": self.height,
+            "fps": self.fps,
+            "pacing": self.pacing,
+            "is_opened": self.isOpened()
+        }
+
+class DeviceSource(FrameSource):
+    """Camera V4L2 qua cv2.VideoCapture (camera tự giữ nhịp)"""
+    kind = "device"
+
+    def __init__(self, device=CAMERA_DEVICE, pixel_format=CAMERA_FORMAT, **kwargs):
+        super().__init__(**kwargs)
+        self.device = device
+        self.pixel_format = pixel_format
+        self.pacing = "realtime"
+        self.capture = None
+
+    def open(self):
+        self.capture = cv2.VideoCapture(self.device)
+        if not self.capture.isOpened():
+            raise RuntimeError(f"Cannot open camera device {self.device}")
+        self.pixel_format = self._negotiate_format()
+        self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        self.capture.set(cv2.CAP_PROP_FPS, self.fps)
+
+    def _negotiate_format(self):
+        """Chọn FOURCC camera chấp nhận (MJPG: đủ fps ở độ phân giải cao qua USB)"""
+        formats = DEVICE_FORMATS if self.pixel_format == "auto" else (self.pixel_format,)
+        for fourcc in formats:
+            self.capture.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+            if self._fourcc() == fourcc:
+                return fourcc
+        return self._fourcc()
+
+    def _fourcc(self):
+        code = int(self.capture.get(cv2.CAP_PROP_FOURCC))
+        return "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4))
+
+    def isOpened(self):
+        return self.capture is not None and self.capture.isOpened()
+
+    def read(self, buffer=None):
+        ret, frame = self.capture.read(buffer)
+        if ret:
+            self.index += 1
+        return ret, frame
+
+    def grab(self):
+        ret = self.capture.grab()
+        if ret:
+            self.index += 1
+        return ret
+
+    def release(self):
+        if self.capture:
+            self.capture.release()
+
+    def get_info(self):
+        info = super().get_info()
+        info.update({
+            "width": int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": self.capture.get(cv2.CAP_PROP_FPS),
+            "format": self.pixel_format
+        })
+        return info
+
+class Picamera2Source(FrameSource):
+    """Camera CSI qua Picamera2/libcamera: ISP scale về kích thước cấu hình, lores YUV420 cho motion gate
+
+    camera: đối tượng kiểu Picamera2 (truyền mock để chạy không cần phần cứng),
+    None = tạo Picamera2() khi open()
+    """
+    kind = "picamera2"
+
+    def __init__(self, camera=None, pixel_format=CAMERA_FORMAT, lores=CAMERA_LORES_ENABLED,
+                 lores_width=MOTION_WIDTH, **kwargs):
+        super().__init__(**kwargs)
+        self.camera = camera
+        self.pixel_format = pixel_format
+        self.lores_size = None
+        if lores:
+            # YUV420 cần kích thước chẵn
+            lores_height = round(self.height * lores_width / self.width)
+            self.lores_size = (lores_width - lores_width % 2, lores_height - lores_height % 2)
+        self.pacing = "realtime"
+        self.main_size = None
+
+    def open(self):
+        if self.camera is None:
+            from picamera2 import Picamera2
+            self.camera = Picamera2()
+        self.pixel_format = self._negotiate_format()
+        self.camera.start()
+
+    def _negotiate_format(self):
+        """Configure main stream với format đầu tiên camera chấp nhận"""
+        formats = PICAMERA2_FORMATS if self.pixel_format == "auto" else (self.pixel_format,)
+        last_error = None
+        for pixel_format in formats:
+            main = {"size": (self.width, self.height), "format": pixel_format}
+            lores = {"size": self.lores_size, "format": "YUV420"} if self.lores_size else None
+            try:
+                config = self.camera.create_video_configuration(
+                    main=main, lores=lores, controls={"FrameRate": self.fps})
+                self.camera.align_configuration(config)
+                self.camera.configure(config)
+            except Exception as e:
+                last_error = e
+                continue
+            self.main_size = tuple(config["main"]["size"])
+            if self.lores_size:
+                self.lores_size = tuple(config["lores"]["size"])
+            return pixel_format
+        raise RuntimeError(f"No supported Picamera2 format in {formats}: {last_error}")
+
+    def isOpened(self):
+        return self.camera is not None and self.main_size is not None
+
+    def _convert(self, array, buffer):
+        """Chuyển main stream sang BGR một lần, ghi thẳng vào buffer khi cùng kích thước"""
+        width, height = self.main_size
+        dst = buffer if buffer is not None and buffer.shape == (height, width, 3) else None
+        if self.pixel_format == "YUV420":
+            # align_configuration giữ stride = width nên array đúng layout I420
+            frame = cv2.cvtColor(array, cv2.COLOR_YUV2BGR_I420, dst=dst)
+        elif self.pixel_format == "XBGR8888":
+            # XBGR8888 của libcamera nằm trong bộ nhớ theo thứ tự R, G, B, X -> numpy là RGBA
+            frame = cv2.cvtColor(array[:, :width], cv2.COLOR_RGBA2BGR, dst=dst)
+        elif dst is not None:
+            dst[...] = array[:, :width]
+            frame = dst
+        else:
+            frame = array[:, :width]
+        return self._fit(frame, buffer) if frame is not dst else frame
+
+    def read(self, buffer=None):
+        request = self.camera.capture_request()
+        try:
+            frame = self._convert(request.make_array("main"), buffer)
+            if self.lores_size:
+                # Mặt phẳng Y của YUV420 chính là ảnh xám
+                width, height = self.lores_size
+                self.lores = request.make_array("lores")[:height, :width]
+        finally:
+            request.release()
+        self.index += 1
+        return True, frame
+
+    def grab(self):
+        self.camera.capture_request().release()
+        self.index += 1
+        return True
+
+    def release(self):
+        if self.camera is not None:
+            self.camera.stop()
+            self.camera.close()
+
+    def get_info(self):
+        info = super().get_info()
+        info.update({
+            "format": self.pixel_format,
+            "main_size": self.main_size,
+            "lores_size": self.lores_size
+        })
+        return info
+
+class VideoFileSource(FrameSource):
+    """Replay file video, fps lấy từ file"""
+    kind = "video"
+
+    def __init__(self, path=CAMERA_SOURCE_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.capture = None
+        self.raw = None
+
+    def open(self):
+        if not os.path.isfile(self.path):
+            raise RuntimeError(f"Video file not found: {self.path}")
+        self.capture = cv2.VideoCapture(self.path)
+        if not self.capture.isOpened():
+            raise RuntimeError(f"Cannot open video file {self.path}")
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or self.fps
+
+    def _read(self, buffer):
+        ret, self.raw = self.capture.read(self.raw)
+        if not ret and self.loop and self.index >= 0:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, self.raw = self.capture.read(self.raw)
+        return self._fit(self.raw, buffer) if ret else None
+
+    def release(self):
+        super().release()
+        if self.capture:
+            self.capture.release()
+
+class ImageDirSource(FrameSource):
+    """Replay ảnh trong thư mục theo thứ tự tên file"""
+    kind = "images"
+
+    def __init__(self, path=CAMERA_SOURCE_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.paths = []
+
+    def open(self):
+        self.paths = sorted(p for pattern in IMAGE_EXTENSIONS for p in glob.glob(os.path.join(self.path, pattern)))
+        if not self.paths:
+            raise RuntimeError(f"No images found in {self.path}")
+
+    def _read(self, buffer):
+        position = self.index + 1
+        if position >= len(self.paths) and not self.loop:
+            return None
+        image = cv2.imread(self.paths[position % len(self.paths)])
+        if image is None:
+            raise RuntimeError(f"Cannot read image {self.paths[position % len(self.paths)]}")
+        return self._fit(image, buffer)
+
+class SyntheticSource(FrameSource):
+    """Frame tổng hợp: các hình chữ nhật di chuyển trên nền xám, frame N chỉ phụ thuộc vào N và seed"""
+    kind = "synthetic"
+
+    def __init__(self, num_objects=3, seed=0, **kwargs):
+        super().__init__(**kwargs)
+        rng = np.random.default_rng(seed)
+        self.sizes = rng.integers(40, 120, size=(num_objects, 2))
+        self.starts = rng.uniform(0, 1, size=(num_objects, 2))
+        self.speeds = rng.uniform(0.002, 0.01, size=(num_objects, 2))
+        self.colors = rng.integers(0, 256, size=(num_objects, 3)).tolist()
+        self.background = rng.integers(110, 118, size=(self.height, self.width, 3), dtype=np.uint8)
+
+    def _read(self, buffer):
+        if buffer is None or buffer.shape != (self.height, self.width, 3):
+            buffer = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        buffer[...] = self.background
+
+        # Vị trí dạng sóng tam giác trong [0, 1]: object nảy qua lại giữa hai cạnh
+        phase = (self.starts + self.speeds * (self.index + 1)) % 2
+        positions = np.where(phase > 1, 2 - phase, phase)
+        limits = np.array([self.width, self.height]) - self.sizes
+        for (x, y), (w, h), color in zip((positions * limits).astype(int).tolist(), self.sizes.tolist(),
+                                         self.colors):
+            cv2.rectangle(buffer, (x, y), (x + w, y + h), color, -1)
+        return buffer
+
+def create_source(kind=CAMERA_SOURCE, **kwargs):
+    """Tạo nguồn frame theo cấu hình"""
+    if kind == "device":
+        return DeviceSource(**kwargs)
+    if kind == "picamera2":
+        return Picamera2Source(**kwargs)
+    if kind == "video":
+        return VideoFileSource(**kwargs)
+    if kind == "images":
+        return ImageDirSource(**kwargs)
+    if kind == "synthetic":
+        return SyntheticSource(**kwargs)
+    raise ValueError(f"Unknown camera source: {kind}")
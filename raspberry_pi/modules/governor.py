@@ -0,0 +1,183 @@
+"""
+Performance Governor Module
+Đọc nhiệt độ CPU, cờ throttle của firmware và tải CPU, hạ hoặc khôi phục từng level:
+khoảng cách giữa hai lần detect, input size tối đa, số thread inference, JPEG quality tối đa
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from configs.settings import (MAX_FPS, MIN_INFERENCE_TIME, CAMERA_FPS, GOVERNOR_INTERVAL, GOVERNOR_TEMP_HIGH,
+                              GOVERNOR_TEMP_LOW, GOVERNOR_CPU_HIGH, GOVERNOR_FPS_TOLERANCE, GOVERNOR_PATIENCE,
+                              GOVERNOR_LEVELS)
+from utils.logger import system_logger
+from utils.system_stats import read_cpu_temperature, read_throttled, decode_throttled
+
+DEGRADE = "degrade"
+RESTORE = "restore"
+# Cờ get_throttled (đang xảy ra) coi là máy đang nóng / thiếu điện
+THROTTLE_TRIGGERS = ("throttled", "soft_temp_limit", "freq_capped")
+
+class PerformanceGovernor:
+    def __init__(self, performance_monitor, detector=None, resolution_controller=None, image_encoder=None,
+                 levels=GOVERNOR_LEVELS, target_fps=min(MAX_FPS, CAMERA_FPS),
+                 min_inference_time=MIN_INFERENCE_TIME, interval=GOVERNOR_INTERVAL):
+        # detector None (inference pool): không đổi được số thread của worker
+        self.performance_monitor = performance_monitor
+        self.detector = detector
+        self.resolution_controller = resolution_controller
+        self.image_encoder = image_encoder
+        self.levels = levels
+        self.target_fps = target_fps
+        self.base_interval = min_inference_time / 1000
+        self.interval = interval
+
+        self.lock = threading.Lock()
+        self.level = 0
+        self.detect_interval = self.base_interval
+        self.last_detect_time = None
+        self.cool_count = 0
+        self.is_running = False
+        self.thread = None
+
+        # Input lần quyết định gần nhất + thống kê quyết định
+        self.temperature = None
+        self.throttled = None
+        self.cpu_usage = 0
+        self.load = 0
+        self.decisions = {DEGRADE: 0, RESTORE: 0}
+        self.history = deque(maxlen=20)
+        self.skipped_frames = 0
+
+        self._apply(0)
+
+    def start(self):
+        """Bắt đầu thread quyết định"""
+        self.is_running = True
+        self.thread = threading.Thread(target=self._loop, name="governor")
+        self.thread.daemon = True
+        self.thread.start()
+        system_logger.info(f"Governor started (target {self.target_fps} FPS, {len(self.levels)} levels)")
+
+    def stop(self):
+        """Dừng governor"""
+        self.is_running = False
+        if self.thread:
+            self.thread.join()
+        system_logger.info("Governor stopped")
+
+    def can_detect(self, timestamp):
+        """Frame tại timestamp được chạy detector chưa (cách lần detect trước >= detect_interval)"""
+        if self.last_detect_time is None or timestamp - self.last_detect_time >= self.detect_interval:
+            return True
+        self.skipped_frames += 1
+        return False
+
+    def record_detect(self, timestamp):
+        """Ghi thời điểm detect (sau khi scheduler cũng đồng ý)"""
+        self.last_detect_time = timestamp
+
+    def _loop(self):
+        """Mỗi interval giây đọc trạng thái và quyết định một lần"""
+        while self.is_running:
+            deadline = time.time() + self.interval
+            while self.is_running and time.time() < deadline:
+                time.sleep(0.2)
+            if not self.is_running:
+                break
+            try:
+                self.step()
+            except Exception as e:
+                system_logger.error(f"Governor error: {e}")
+
+    def _read_inputs(self):
+        """Nhiệt độ, cờ throttle đang bật, CPU% (psutil của PerformanceMonitor) và load average / số core"""
+        self.temperature = read_cpu_temperature()
+        throttled = read_throttled()
+        self.throttled = None
+        if throttled is not None:
+            flags = decode_throttled(throttled)
+            self.throttled = [flag for flag in THROTTLE_TRIGGERS if flags[flag][0]]
+        self.cpu_usage = self.performance_monitor.cpu_usage
+        try:
+            self.load = os.getloadavg()[0] / (os.cpu_count() or 1)
+        except OSError:
+            self.load = 0
+
+    def step(self):
+        """Một lần quyết định: hạ level khi nóng/throttle/quá tải, khôi phục sau GOVERNOR_PATIENCE lần mát"""
+        self._read_inputs()
+        fps = self.performance_monitor.fps
+        # CPU% chỉ có khi có psutil, không thì dùng load average
+        cpu = self.cpu_usage if self.cpu_usage else self.load * 100
+
+        reasons = []
+        if self.temperature is not None and self.temperature >= GOVERNOR_TEMP_HIGH:
+            reasons.append(f"temperature {self.temperature:.1f}C")
+        if self.throttled:
+            reasons.append(f"throttled ({', '.join(self.throttled)})")
+        if cpu >= GOVERNOR_CPU_HIGH and fps < self.target_fps * GOVERNOR_FPS_TOLERANCE:
+            reasons.append(f"CPU {cpu:.0f}% at {fps:.1f} FPS")
+
+        if reasons:
+            self.cool_count = 0
+            if self.level < len(self.levels) - 1:
+                self._decide(DEGRADE, self.level + 1, ", ".join(reasons))
+            return
+
+        cool = ((self.temperature is None or self.temperature <= GOVERNOR_TEMP_LOW)
+                and cpu < GOVERNOR_CPU_HIGH)
+        if not cool or self.level == 0:
+            self.cool_count = 0
+            return
+        self.cool_count += 1
+        if self.cool_count >= GOVERNOR_PATIENCE:
+            self.cool_count = 0
+            temperature = f"{self.temperature:.1f}C" if self.temperature is not None else "n/a"
+            self._decide(RESTORE, self.level - 1, f"temperature {temperature}, CPU {cpu:.0f}%, {fps:.1f} FPS")
+
+    def _decide(self, action, level, reason):
+        """Đổi level, ghi lại quyết định (log + metric)"""
+        previous = self.level
+        self._apply(level)
+        with self.lock:
+            self.decisions[action] += 1
+            self.history.append({"time": time.time(), "action": action, "from": previous, "to": level,
+                                 "reason": reason})
+        config = self.levels[level]
+        system_logger.info(f"Governor {action} level {previous} -> {level} ({reason}): "
+                           f"detect interval {self.detect_interval * 1000:.0f}ms, "
+                           f"max size {config['max_input_size']}, threads {config['threads']}, "
+                           f"JPEG quality {config['jpeg_quality']}")
+
+    def _apply(self, level):
+        """Áp dụng cấu hình của level cho detector, resolution controller và image encoder"""
+        config = self.levels[level]
+        self.level = level
+        self.detect_interval = self.base_interval * config["detect_interval"]
+        if self.resolution_controller:
+            self.resolution_controller.set_max_size(config["max_input_size"])
+        if self.detector and self.detector.num_threads != config["threads"]:
+            self.detector.set_num_threads(config["threads"])
+        if self.image_encoder:
+            self.image_encoder.set_max_quality(config["jpeg_quality"])
+
+    def get_stats(self):
+        """Level hiện tại, input lần quyết định gần nhất và số quyết định"""
+        config = self.levels[self.level]
+        with self.lock:
+            return {
+                "level": self.level,
+                "detect_interval_ms": self.detect_interval * 1000,
+                "max_input_size": config["max_input_size"],
+                "threads": config["threads"],
+                "jpeg_quality": config["jpeg_quality"],
+                "temperature": self.temperature,
+                "throttled": self.throttled,
+                "cpu_usage": self.cpu_usage,
+                "load": self.load,
+                "skipped_frames": self.skipped_frames,
+                "decisions": dict(self.decisions),
+                "last_decision": self.history[-1] if self.history else None
+            }
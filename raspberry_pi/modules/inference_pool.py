@@ -0,0 +1,310 @@
+"""
+Inference Pool Module
+K process, mỗi process load model một lần; frame được chuyển qua multiprocessing.shared_memory
+Mỗi worker có request queue riêng nên pool biết frame nào đang ở worker nào: worker chết thì
+các frame đó được bỏ qua (không chặn thứ tự kết quả) và worker được chạy lại
+"""
+
+import multiprocessing as mp
+import queue
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+import numpy as np
+from configs.settings import (CAMERA_WIDTH, CAMERA_HEIGHT, DETECTOR_BACKEND, CLASS_NAMES,
+                              INFERENCE_WORKERS, INFERENCE_WORKER_THREADS)
+from utils.logger import system_logger
+from utils.postprocess import Detections
+
+def _worker_main(worker_index, backend, num_threads, shm_names, request_queue, result_queue):
+    """Process worker: load model một lần rồi xử lý frame từ shared memory"""
+    from modules.yolo_detector import YOLODetector
+
+    shms = [shared_memory.SharedMemory(name=name) for name in shm_names]
+    detector = YOLODetector(backend, num_threads=num_threads)
+    ok = detector.load_model()
+    result_queue.put(("ready", worker_index, ok, detector.warmup_time))
+
+    try:
+        while True:
+            request = request_queue.get()
+            if request is None:
+                break
+
+            slot, frame_id, shape = request
+            frame = np.ndarray(shape, dtype=np.uint8, buffer=shms[slot].buf)
+            start_inference = time.time()
+            detections = detector.detect(frame)
+            inference_time = (time.time() - start_inference) * 1000
+            del frame
+
+            # Chỉ gửi structured array nhỏ về process chính
+            result_queue.put(("result", frame_id, slot, detections.data, inference_time, worker_index))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for shm in shms:
+            shm.close()
+
+class InferencePool:
+    def __init__(self, num_workers=INFERENCE_WORKERS, frame_shape=(CAMERA_HEIGHT, CAMERA_WIDTH, 3),
+                 backend=DETECTOR_BACKEND, num_threads=INFERENCE_WORKER_THREADS, slots_per_worker=2,
+                 health_interval=0.5):
+        self.num_workers = max(1, num_workers)
+        self.frame_shape = tuple(frame_shape)
+        self.backend = backend
+        self.num_threads = num_threads
+        self.num_slots = self.num_workers * max(1, slots_per_worker)
+        self.slot_size = int(np.prod(self.frame_shape))
+        self.health_interval = health_interval
+
+        self.ctx = mp.get_context("spawn")
+        self.shms = []
+        self.slot_views = []
+        self.workers = []
+        self.request_queues = []
+        self.result_queue = None
+        self.collector_thread = None
+        self.is_running = False
+
+        # Slot shared memory trống + kết quả chờ trả về theo thứ tự submit
+        self.cond = threading.Condition()
+        self.free_slots = deque()
+        self.submitted = deque()
+        self.results = {}
+        self.contexts = {}
+        # Worker đã load model xong và các frame đang chờ ở từng worker {frame_id: slot}
+        self.ready = [False] * self.num_workers
+        self.outstanding = [{} for _ in range(self.num_workers)]
+
+        # Thống kê
+        self.completed = 0
+        self.worker_completed = [0] * self.num_workers
+        self.avg_inference_time = 0
+        self.warmup_time = 0  # ms, worker warmup lâu nhất (các worker warmup song song)
+        self.restarts = 0
+        self.failed_frames = 0
+
+    def start(self, timeout=60):
+        """Tạo shared memory, chạy các worker và chờ model load xong"""
+        try:
+            for _ in range(self.num_slots):
+                shm = shared_memory.SharedMemory(create=True, size=self.slot_size)
+                self.shms.append(shm)
+                self.slot_views.append(np.ndarray(self.slot_size, dtype=np.uint8, buffer=shm.buf))
+            self.free_slots.extend(range(self.num_slots))
+
+            self.result_queue = self.ctx.Queue()
+            self.workers = [None] * self.num_workers
+            self.request_queues = [None] * self.num_workers
+            for index in range(self.num_workers):
+                self._start_worker(index)
+
+            # Chờ tất cả worker báo ready
+            deadline = time.time() + timeout
+            for _ in range(self.num_workers):
+                _, index, ok, warmup_time = self.result_queue.get(timeout=max(0.1, deadline - time.time()))
+                if not ok:
+                    raise RuntimeError(f"Worker {index} failed to load model")
+                self.ready[index] = True
+                self.warmup_time = max(self.warmup_time, warmup_time)
+
+            self.is_running = True
+            self.collector_thread = threading.Thread(target=self._collect_loop)
+            self.collector_thread.daemon = True
+            self.collector_thread.start()
+            system_logger.info(f"Inference pool started with {self.num_workers} workers, "
+                               f"{self.num_slots} shared memory slots")
+            return True
+        except Exception as e:
+            system_logger.error(f"Inference pool start failed: {e}")
+            self.stop()
+            return False
+
+    def stop(self):
+        """Dừng worker và giải phóng shared memory"""
+        self.is_running = False
+        with self.cond:
+            self.cond.notify_all()
+
+        for worker, request_queue in zip(self.workers, self.request_queues):
+            if worker is not None and worker.is_alive():
+                request_queue.put(None)
+        for worker in self.workers:
+            if worker is None:
+                continue
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        if self.collector_thread:
+            self.collector_thread.join()
+
+        self.slot_views = []
+        for shm in self.shms:
+            shm.close()
+            shm.unlink()
+        self.shms = []
+        self.workers = []
+        self.request_queues = []
+        system_logger.info("Inference pool stopped")
+
+    def _start_worker(self, index):
+        """Chạy (hoặc chạy lại) process worker index với request queue mới"""
+        self.request_queues[index] = self.ctx.Queue()
+        worker = self.ctx.Process(
+            target=_worker_main, name=f"inference-{index}",
+            args=(index, self.backend, self.num_threads, [shm.name for shm in self.shms],
+                  self.request_queues[index], self.result_queue))
+        worker.daemon = True
+        worker.start()
+        self.workers[index] = worker
+
+    def submit(self, frame_id, frame, context=None, timeout=None):
+        """Copy frame vào slot shared memory trống và gửi cho worker
+
+        context ở lại process chính và được trả về cùng kết quả.
+        Trả về False nếu không có slot trống (hoặc không có worker ready) trong timeout.
+        """
+        if frame.nbytes > self.slot_size:
+            raise ValueError(f"Frame {frame.shape} larger than pool slot {self.frame_shape}")
+
+        with self.cond:
+            if not self.cond.wait_for(lambda: (self.free_slots and any(self.ready)) or not self.is_running,
+                                      timeout):
+                return False
+            if not self.is_running:
+                return False
+            slot = self.free_slots.popleft()
+            # Worker ready đang giữ ít frame nhất
+            index = min((i for i in range(self.num_workers) if self.ready[i]),
+                        key=lambda i: len(self.outstanding[i]))
+            self.outstanding[index][frame_id] = slot
+            self.submitted.append(frame_id)
+            self.contexts[frame_id] = context
+            request_queue = self.request_queues[index]
+
+        # Một lần memcpy vào shared memory thay vì pickle cả frame
+        self.slot_views[slot][:frame.nbytes] = frame.reshape(-1)
+        request_queue.put((slot, frame_id, frame.shape))
+        return True
+
+    def skip(self, frame_id, context=None):
+        """Giữ chỗ cho frame không cần inference để get_result vẫn trả về đúng thứ tự
+
+        Kết quả của frame này có Detections = None.
+        """
+        with self.cond:
+            self.submitted.append(frame_id)
+            self.contexts[frame_id] = context
+            self.results[frame_id] = (None, 0)
+            self.cond.notify_all()
+
+    def get_result(self, timeout=None):
+        """Lấy kết quả theo đúng thứ tự submit: (frame_id, Detections, inference_time, context)
+
+        Frame bị bỏ qua hoặc mất do worker chết có Detections = None.
+        """
+        with self.cond:
+            ready = self.cond.wait_for(
+                lambda: not self.is_running or (self.submitted and self.submitted[0] in self.results),
+                timeout)
+            if not ready or not self.submitted or self.submitted[0] not in self.results:
+                return None
+
+            frame_id = self.submitted.popleft()
+            data, inference_time = self.results.pop(frame_id)
+            context = self.contexts.pop(frame_id)
+        if data is None:
+            return frame_id, None, inference_time, context
+        return frame_id, Detections(data, CLASS_NAMES), inference_time, context
+
+    def _collect_loop(self):
+        """Nhận kết quả từ worker, trả slot, đánh thức get_result và kiểm tra worker còn sống"""
+        last_check = time.time()
+        while self.is_running:
+            if time.time() - last_check >= self.health_interval:
+                last_check = time.time()
+                self._check_workers()
+            try:
+                message = self.result_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+
+            if message[0] == "ready":
+                self._on_worker_ready(*message[1:])
+                continue
+
+            _, frame_id, slot, data, inference_time, worker_index = message
+            with self.cond:
+                # Frame đã bị bỏ qua khi worker chết (kết quả đến muộn): slot đã được trả
+                if self.outstanding[worker_index].pop(frame_id, None) is None:
+                    continue
+                self.results[frame_id] = (data, inference_time)
+                self.free_slots.append(slot)
+                self.completed += 1
+                self.worker_completed[worker_index] += 1
+                if self.completed == 1:
+                    self.avg_inference_time = inference_time
+                else:
+                    self.avg_inference_time = 0.9 * self.avg_inference_time + 0.1 * inference_time
+                self.cond.notify_all()
+
+    def _check_workers(self):
+        """Worker chết: bỏ qua các frame nó đang giữ, trả slot rồi chạy lại worker"""
+        for index, worker in enumerate(self.workers):
+            if worker is None or worker.is_alive():
+                continue
+            was_ready = self.ready[index]
+            with self.cond:
+                self.ready[index] = False
+                lost = self.outstanding[index]
+                self.outstanding[index] = {}
+                for frame_id, slot in lost.items():
+                    self.results[frame_id] = (None, 0)
+                    self.free_slots.append(slot)
+                self.failed_frames += len(lost)
+                self.cond.notify_all()
+            system_logger.error(f"Inference worker {index} died (exit code {worker.exitcode}), "
+                                f"skipped {len(lost)} frames")
+
+            if not was_ready:
+                # Chết khi đang load model: chạy lại cũng sẽ lỗi
+                system_logger.error(f"Inference worker {index} died while loading, not restarting")
+                self.workers[index] = None
+                continue
+            try:
+                self._start_worker(index)
+                self.restarts += 1
+                system_logger.info(f"Inference worker {index} restarted")
+            except Exception as e:
+                system_logger.error(f"Inference worker {index} restart failed: {e}")
+                self.workers[index] = None
+
+    def _on_worker_ready(self, index, ok, warmup_time):
+        """Worker chạy lại đã load model xong"""
+        if not ok:
+            system_logger.error(f"Restarted inference worker {index} failed to load model")
+            self.request_queues[index].put(None)
+            return
+        with self.cond:
+            self.ready[index] = True
+            self.cond.notify_all()
+        system_logger.info(f"Inference worker {index} ready ({warmup_time:.0f}ms warmup)")
+
+    def get_stats(self):
+        """Thống kê của pool"""
+        with self.cond:
+            return {
+                "workers": self.num_workers,
+                "ready_workers": sum(self.ready),
+                "in_flight": len(self.submitted),
+                "free_slots": len(self.free_slots),
+                "completed": self.completed,
+                "worker_completed": list(self.worker_completed),
+                "avg_inference_time_ms": self.avg_inference_time,
+                "restarts": self.restarts,
+                "failed_frames": self.failed_frames
+            }
@@ -0,0 +1,129 @@
+"""
+Motion Gate Module
+Kiểm tra chuyển động rẻ (ảnh xám thu nhỏ) trước khi chạy detector, bỏ qua inference khi cảnh tĩnh
+"""
+
+import time
+import cv2
+import numpy as np
+from configs.settings import (MOTION_METHOD, MOTION_WIDTH, MOTION_THRESHOLD, MOTION_MIN_AREA,
+                              MOTION_ZONES, MOTION_KEYFRAME_INTERVAL, MOTION_HOLD_TIME)
+
+METHODS = ("diff", "mog2")
+
+class MotionGate:
+    def __init__(self, method=MOTION_METHOD, width=MOTION_WIDTH, threshold=MOTION_THRESHOLD,
+                 min_area=MOTION_MIN_AREA, zones=MOTION_ZONES, keyframe_interval=MOTION_KEYFRAME_INTERVAL,
+                 hold_time=MOTION_HOLD_TIME):
+        if method not in METHODS:
+            raise ValueError(f"Unknown motion method: {method}")
+        self.method = method
+        self.width = width
+        self.threshold = threshold
+        self.min_area = min_area
+        self.zones = list(zones)
+        self.keyframe_interval = keyframe_interval
+        self.hold_time = hold_time
+
+        self.background = None
+        self.subtractor = None
+        self.mask = None
+        self.mask_shape = None
+        self.mask_pixels = 0
+        self.last_keyframe = None
+        self.last_motion = None
+
+        # Thống kê
+        self.checks = 0
+        self.passed = 0
+        self.keyframes = 0
+        self.motion_ratio = 0
+
+    def reset(self):
+        """Bỏ background hiện tại (ví dụ khi camera khởi động lại)"""
+        self.background = None
+        self.subtractor = None
+        self.mask = None
+        self.mask_shape = None
+        self.last_keyframe = None
+        self.last_motion = None
+
+    def _prepare(self, frame):
+        """Thu nhỏ về width pixels, ảnh xám, blur để giảm nhiễu sensor (lores của camera đã đúng size)"""
+        height, width = frame.shape[:2]
+        small = frame
+        if width != self.width:
+            scale = self.width / width
+            small = cv2.resize(frame, (self.width, max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def _build_mask(self, shape):
+        """Mask các zone (toạ độ chuẩn hoá 0-1), không có zone = cả frame"""
+        height, width = shape
+        self.mask_shape = shape
+        if not self.zones:
+            self.mask = None
+            self.mask_pixels = height * width
+            return
+        self.mask = np.zeros(shape, dtype=np.uint8)
+        for x1, y1, x2, y2 in self.zones:
+            self.mask[int(y1 * height):int(np.ceil(y2 * height)), int(x1 * width):int(np.ceil(x2 * width))] = 255
+        self.mask_pixels = max(1, cv2.countNonZero(self.mask))
+
+    def _foreground(self, gray):
+        """Mask pixel thay đổi so với background"""
+        if self.method == "mog2":
+            if self.subtractor is None:
+                self.subtractor = cv2.createBackgroundSubtractorMOG2(
+                    history=500, varThreshold=self.threshold, detectShadows=False)
+            return self.subtractor.apply(gray)
+
+        # Frame differencing với background trung bình động (chịu được thay đổi ánh sáng chậm)
+        if self.background is None:
+            self.background = gray.astype(np.float32)
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+        cv2.accumulateWeighted(gray, self.background, 0.1)
+        _, foreground = cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY)
+        return foreground
+
+    def check(self, frame, timestamp=None):
+        """True nếu frame cần chạy detector (có chuyển động, đang giữ sau chuyển động, hoặc keyframe)"""
+        timestamp = timestamp or time.time()
+        self.checks += 1
+
+        gray = self._prepare(frame)
+        if self.mask_shape != gray.shape:
+            self._build_mask(gray.shape)
+        foreground = self._foreground(gray)
+        if self.mask is not None:
+            foreground = cv2.bitwise_and(foreground, self.mask)
+        self.motion_ratio = cv2.countNonZero(foreground) / self.mask_pixels
+
+        if self.motion_ratio >= self.min_area:
+            self.last_motion = timestamp
+        moving = self.last_motion is not None and timestamp - self.last_motion <= self.hold_time
+
+        # Keyframe định kỳ (tính từ lần gate mở gần nhất) để bắt object đứng yên / trôi background
+        keyframe = (not moving and
+                    (self.last_keyframe is None or timestamp - self.last_keyframe >= self.keyframe_interval))
+        if keyframe:
+            self.keyframes += 1
+
+        if moving or keyframe:
+            self.last_keyframe = timestamp
+            self.passed += 1
+            return True
+        return False
+
+    def get_stats(self):
+        """Thống kê gate"""
+        return {
+            "method": self.method,
+            "checks": self.checks,
+            "passed": self.passed,
+            "keyframes": self.keyframes,
+            "hit_rate": self.passed / self.checks if self.checks else 0,
+            "motion_ratio": self.motion_ratio
+        }
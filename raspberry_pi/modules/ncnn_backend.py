@@ -0,0 +1,143 @@
+"""
+NCNN Backend - chạy model NCNN trực tiếp bằng ncnn.Net
+Không cần Ultralytics/torch: tự letterbox, decode output và NMS bằng NumPy
+"""
+
+import os
+import numpy as np
+import ncnn
+from configs.settings import (MODEL_PATH, MODEL_INPUT_SIZE, CONFIDENCE_THRESHOLD, NMS_IOU_THRESHOLD,
+                              MAX_DETECTIONS, NCNN_THREADS, MODEL_PRECISION, CLASS_NAMES)
+from modules.preprocess import Preprocessor
+from utils.logger import system_logger
+from utils.boxes import cxcywh_to_xyxy, batched_nms, unletterbox
+from utils.postprocess import Detections, from_arrays
+
+# Tên blob input/output của model export từ Ultralytics (xem weights/best_ncnn_model/model_ncnn.py)
+INPUT_NAME = "in0"
+OUTPUT_NAME = "out0"
+MAX_NMS_CANDIDATES = 30000
+
+# Hậu tố thư mục model theo precision (train_model/quantize_ncnn.py)
+PRECISIONS = ("fp32", "fp16", "int8")
+PRECISION_SUFFIX = {"fp32": "", "fp16": "_fp16", "int8": "_int8"}
+
+class NCNNBackend:
+    def __init__(self, model_dir=MODEL_PATH, input_size=MODEL_INPUT_SIZE, num_threads=NCNN_THREADS,
+                 variants=None, precision=MODEL_PRECISION, num_buffers=1):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown model precision: {precision}")
+        self.model_dir = model_dir
+        self.input_size = input_size
+        self.num_threads = num_threads
+        self.precision = precision
+        # variants: {input_size: model_dir}, mỗi size một model (NCNN cố định kích thước input)
+        self.variants = dict(variants or {})
+        self.variants[input_size] = model_dir
+        self.nets = {}
+        self.net = None
+        # num_buffers: số blob có thể chờ inference cùng lúc (pipeline), tuần tự chỉ cần 1
+        self.preprocessor = Preprocessor(num_buffers)
+
+    @property
+    def sizes(self):
+        """Các kích thước input đã load"""
+        return sorted(self.nets)
+
+    def load(self):
+        """Load model mặc định và các variant có sẵn"""
+        self.net = self._load_net(self.model_dir)
+        self.nets = {self.input_size: self.net}
+
+        for size, model_dir in self.variants.items():
+            if size == self.input_size:
+                continue
+            if not os.path.isdir(model_dir):
+                system_logger.warning(f"NCNN variant {size} not found: {model_dir}")
+                continue
+            self.nets[size] = self._load_net(model_dir)
+        system_logger.info(f"NCNN input sizes: {self.sizes}, precision: {self.precision}")
+
+    def set_num_threads(self, num_threads):
+        """Đổi số thread khi đang chạy (extractor tạo sau đó copy opt của net)"""
+        self.num_threads = num_threads
+        for net in self.nets.values():
+            net.opt.num_threads = num_threads
+
+    def _resolve_dir(self, model_dir):
+        """Thư mục weights theo precision: <model_dir>_fp16 / <model_dir>_int8"""
+        suffix = PRECISION_SUFFIX[self.precision]
+        precision_dir = model_dir.rstrip("/\\") + suffix
+        if suffix and os.path.isdir(precision_dir):
+            return precision_dir
+        if self.precision == "int8":
+            raise RuntimeError(f"INT8 model not found: {precision_dir} (run train_model/quantize_ncnn.py)")
+        return model_dir
+
+    def _load_net(self, model_dir):
+        """Load file model.ncnn.param/.bin của một thư mục"""
+        model_dir = self._resolve_dir(model_dir)
+        param_path = os.path.join(model_dir, "model.ncnn.param")
+        bin_path = os.path.join(model_dir, "model.ncnn.bin")
+
+        net = ncnn.Net()
+        net.opt.use_vulkan_compute = False
+        net.opt.num_threads = self.num_threads
+        # fp32 giữ opt mặc định của ncnn (tự bật fp16 storage/arithmetic trên ARMv8.2 như Cortex-A76
+        # của Pi 5, giống đường Ultralytics-NCNN), chỉ ghi đè khi chọn rõ fp16/int8
+        if self.precision == "fp16":
+            net.opt.use_fp16_packed = True
+            net.opt.use_fp16_storage = True
+            net.opt.use_fp16_arithmetic = True
+        elif self.precision == "int8":
+            net.opt.use_int8_inference = True
+
+        if net.load_param(param_path) != 0:
+            raise RuntimeError(f"Cannot load NCNN param: {param_path}")
+        if net.load_model(bin_path) != 0:
+            raise RuntimeError(f"Cannot load NCNN weights: {bin_path}")
+
+        return net
+
+    def preprocess(self, frame, input_size=None):
+        """Letterbox frame BGR về input_size x input_size vào buffer cấp phát sẵn, trả về blob CHW RGB [0, 1]
+
+        input_size không có model tương ứng thì dùng size mặc định.
+        """
+        if input_size not in self.nets:
+            input_size = self.input_size
+        return self.preprocessor(frame, input_size)
+
+    def infer(self, blob):
+        """Chạy ncnn extractor, trả về output dạng (4 + num_classes, num_anchors)
+
+        Model được chọn theo kích thước blob (preprocess đã letterbox về đúng size).
+        """
+        with self.nets[blob.shape[-1]].create_extractor() as ex:
+            ex.input(INPUT_NAME, ncnn.Mat(blob))
+            _, out = ex.extract(OUTPUT_NAME)
+            return np.array(out)
+
+    def postprocess(self, output, meta):
+        """Decode output, NMS và đưa bbox về toạ độ frame gốc"""
+        # (4 + nc, N) -> (N, 4 + nc)
+        preds = output.reshape(output.shape[0], -1).T
+        scores = preds[:, 4:]
+        class_ids = scores.argmax(axis=1)
+        confs = scores[np.arange(len(scores)), class_ids]
+
+        mask = confs > CONFIDENCE_THRESHOLD
+        if not mask.any():
+            return Detections(class_names=CLASS_NAMES)
+        preds, class_ids, confs = preds[mask], class_ids[mask], confs[mask]
+
+        if len(confs) > MAX_NMS_CANDIDATES:
+            top_idx = confs.argsort()[::-1][:MAX_NMS_CANDIDATES]
+            preds, class_ids, confs = preds[top_idx], class_ids[top_idx], confs[top_idx]
+
+        boxes = cxcywh_to_xyxy(preds[:, :4])
+        keep = batched_nms(boxes, confs, class_ids, NMS_IOU_THRESHOLD)[:MAX_DETECTIONS]
+
+        # Bỏ padding letterbox và scale về frame gốc
+        boxes = unletterbox(boxes[keep], meta)
+        return Detections(from_arrays(boxes, confs[keep], class_ids[keep]), CLASS_NAMES)
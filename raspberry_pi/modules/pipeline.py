@@ -0,0 +1,255 @@
+"""
+Detection Pipeline Module
+Các stage chạy trên thread riêng, nối với nhau bằng queue bounded có drop policy
+"""
+
+import threading
+import time
+from collections import deque
+from configs.settings import PIPELINE_QUEUE_SIZE, PIPELINE_DROP_POLICY
+from utils.logger import system_logger
+
+DROP_OLDEST = "drop_oldest"
+BLOCK = "block"
+
+class PipelineItem:
+    """Dữ liệu của một frame khi đi qua các stage"""
+    __slots__ = ("frame_id", "frame", "blob", "meta", "output", "detections",
+                 "annotated", "inference_time", "created_at", "detect", "motion", "input_size", "regions")
+
+    def __init__(self, frame_id, frame):
+        self.frame_id = frame_id
+        self.frame = frame
+        self.blob = None
+        self.meta = None
+        self.output = None
+        self.detections = None
+        self.annotated = None
+        self.inference_time = 0
+        self.created_at = time.time()
+        # False: bỏ qua detector, publish dùng tracker.predict()
+        self.detect = True
+        # False: motion gate thấy cảnh tĩnh, giữ nguyên bbox thay vì ngoại suy
+        self.motion = True
+        # Kích thước input do ResolutionController chọn (None = mặc định)
+        self.input_size = None
+        # Vùng detect do RegionPlanner chọn (None = full frame)
+        self.regions = None
+
+class StageQueue:
+    """Queue bounded giữa hai stage"""
+    def __init__(self, name, maxsize=PIPELINE_QUEUE_SIZE, drop_policy=PIPELINE_DROP_POLICY, on_drop=None):
+        if drop_policy not in (DROP_OLDEST, BLOCK):
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.name = name
+        self.maxsize = max(1, maxsize)
+        self.drop_policy = drop_policy
+        self.on_drop = on_drop
+        self.items = deque()
+        self.cond = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item):
+        """Đưa item vào queue, trả về False nếu queue đã đóng"""
+        dropped_item = None
+        with self.cond:
+            if self.drop_policy == BLOCK:
+                self.cond.wait_for(lambda: self.closed or len(self.items) < self.maxsize)
+            elif len(self.items) >= self.maxsize:
+                dropped_item = self.items.popleft()
+                self.dropped += 1
+            if self.closed:
+                dropped_item = item
+            else:
+                self.items.append(item)
+                self.cond.notify_all()
+
+        if dropped_item is not None and self.on_drop:
+            self.on_drop(dropped_item)
+        return dropped_item is not item
+
+    def get(self, timeout=None):
+        """Lấy item, trả về None khi hết timeout hoặc queue đã đóng"""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.closed or self.items, timeout):
+                return None
+            if not self.items:
+                return None
+            item = self.items.popleft()
+            self.cond.notify_all()
+            return item
+
+    def close(self):
+        """Đóng queue và trả lại các item còn lại"""
+        with self.cond:
+            self.closed = True
+            remaining = list(self.items)
+            self.items.clear()
+            self.cond.notify_all()
+
+        if self.on_drop:
+            for item in remaining:
+                self.on_drop(item)
+
+    def __len__(self):
+        return len(self.items)
+
+class PipelineStage:
+    """Một stage: lấy item từ input queue, xử lý, đưa sang output queue
+    
+    Khi stage lỗi, item đang giữ được trả qua on_drop (giải phóng slot ring buffer).
+    Stage source tự lấy tài nguyên bên trong func nên phải tự trả lại nếu func raise.
+    """
+    def __init__(self, name, func, input_queue=None, output_queue=None, on_latency=None, on_drop=None):
+        self.name = name
+        self.func = func
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        # on_latency(tên stage, ms): ghi thêm vào monitor bên ngoài (percentile/histogram)
+        self.on_latency = on_latency
+        self.on_drop = on_drop
+        self.is_running = False
+        self.thread = None
+
+        # Thống kê latency của stage
+        self.processed = 0
+        self.errors = 0
+        self.last_latency = 0
+        self.avg_latency = 0
+        self.max_latency = 0
+
+    def start(self):
+        """Bắt đầu thread của stage"""
+        self.is_running = True
+        self.thread = threading.Thread(target=self._loop, name=f"stage-{self.name}")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """Dừng stage"""
+        self.is_running = False
+        if self.thread:
+            self.thread.join()
+
+    def _loop(self):
+        """Loop xử lý của stage"""
+        while self.is_running:
+            item = None
+            if self.input_queue is not None:
+                item = self.input_queue.get(timeout=0.1)
+                if item is None:
+                    continue
+
+            start_time = time.time()
+            result = None
+            try:
+                result = self.func(item)
+                # Source stage không có dữ liệu thì không tính latency
+                if item is not None or result is not None:
+                    self._record_latency((time.time() - start_time) * 1000)
+                if result is not None and self.output_queue is not None:
+                    self.output_queue.put(result)
+                    result = None
+            except Exception as e:
+                self.errors += 1
+                system_logger.error(f"Pipeline stage '{self.name}' error: {e}")
+                # Trả lại item vào và kết quả chưa chuyển đi (thường là cùng một item)
+                if self.on_drop:
+                    if item is not None:
+                        self.on_drop(item)
+                    if result is not None and result is not item:
+                        self.on_drop(result)
+
+    def _record_latency(self, latency):
+        """Cập nhật thống kê latency (ms)"""
+        self.processed += 1
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        # Trung bình trượt để thấy được thay đổi gần đây
+        self.avg_latency = latency if self.processed == 1 else 0.9 * self.avg_latency + 0.1 * latency
+        if self.on_latency:
+            self.on_latency(self.name, latency)
+
+class DetectionPipeline:
+    """Chuỗi stage nối tiếp nhau bằng StageQueue"""
+    def __init__(self, queue_size=PIPELINE_QUEUE_SIZE, drop_policy=PIPELINE_DROP_POLICY, on_drop=None,
+                 on_latency=None):
+        self.queue_size = queue_size
+        self.drop_policy = drop_policy
+        self.on_drop = on_drop
+        self.on_latency = on_latency
+        self.stages = []
+        self.queues = []
+        self.is_running = False
+
+    def add_stage(self, name, func, source=False):
+        """Thêm stage vào cuối pipeline
+
+        Stage source (stage đầu tiên hoặc source=True) không có input queue,
+        func được gọi với None và tự lấy dữ liệu (camera, inference pool...).
+        """
+        input_queue = None
+        if self.stages and not source:
+            input_queue = StageQueue(name, self.queue_size, self.drop_policy, self.on_drop)
+            self.queues.append(input_queue)
+            self.stages[-1].output_queue = input_queue
+
+        self.stages.append(PipelineStage(name, func, input_queue, on_latency=self.on_latency,
+                                         on_drop=self.on_drop))
+        return self
+
+    def add_sink(self, name, maxsize=1):
+        """Queue output cuối cùng (ví dụ cho hiển thị trên main thread)"""
+        sink = StageQueue(name, maxsize, DROP_OLDEST, self.on_drop)
+        self.queues.append(sink)
+        self.stages[-1].output_queue = sink
+        return sink
+
+    def capacity(self):
+        """Số frame tối đa pipeline có thể giữ cùng lúc (trong stage + trong queue)"""
+        return len(self.stages) + sum(queue.maxsize for queue in self.queues)
+
+    def start(self):
+        """Chạy tất cả stage"""
+        self.is_running = True
+        for stage in self.stages:
+            stage.start()
+        system_logger.info(f"Pipeline started: {' -> '.join(s.name for s in self.stages)} "
+                           f"(queue={self.queue_size}, policy={self.drop_policy})")
+
+    def stop(self):
+        """Dừng pipeline và trả lại các item còn trong queue"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        for stage in self.stages:
+            stage.is_running = False
+        for queue in self.queues:
+            queue.close()
+        for stage in self.stages:
+            stage.stop()
+        system_logger.info("Pipeline stopped")
+
+    def get_stats(self):
+        """Queue depth và latency của từng stage"""
+        stats = {}
+        for stage in self.stages:
+            queue = stage.input_queue
+            stats[stage.name] = {
+                "queue_depth": len(queue) if queue is not None else 0,
+                "dropped": queue.dropped if queue is not None else 0,
+                "processed": stage.processed,
+                "errors": stage.errors,
+                "last_latency_ms": stage.last_latency,
+                "avg_latency_ms": stage.avg_latency,
+                "max_latency_ms": stage.max_latency
+            }
+        return stats
+
+    def format_stats(self):
+        """Chuỗi tóm tắt để log"""
+        return " | ".join(
+            f"{name}: q={s['queue_depth']} drop={s['dropped']} {s['avg_latency_ms']:.1f}ms"
+            for name, s in self.get_stats().items()
+        )
@@ -0,0 +1,66 @@
+"""
+Preprocess Module
+Letterbox + BGR->RGB + scale [0, 1] + HWC->CHW ghi thẳng vào buffer cấp phát sẵn
+Mỗi frame chỉ có hai pass: cv2.resize vào vùng giữa canvas, rồi một ufunc NumPy
+(đảo kênh + transpose + nhân 1/255) ghi vào blob float32, không cấp phát mảng mới
+"""
+
+import cv2
+import numpy as np
+
+PAD_COLOR = (114, 114, 114)
+SCALE = np.float32(1 / 255)
+
+def letterbox_params(width, height, input_size):
+    """scale, kích thước sau resize và padding trái/trên (chia padding giống LetterBox của Ultralytics)"""
+    scale = min(input_size / height, input_size / width)
+    new_w, new_h = int(round(width * scale)), int(round(height * scale))
+    left = int(round((input_size - new_w) / 2 - 0.1))
+    top = int(round((input_size - new_h) / 2 - 0.1))
+    return scale, new_w, new_h, left, top
+
+class Preprocessor:
+    """Ring num_buffers cặp (canvas uint8 HWC, blob float32 CHW) cho mỗi input size
+
+    Blob trả về là buffer dùng chung: hợp lệ tới khi bị ghi đè sau num_buffers lần gọi,
+    nên num_buffers phải >= số blob có thể đang chờ inference cùng lúc (pipeline).
+    """
+    def __init__(self, num_buffers=1, pad_color=PAD_COLOR):
+        self.num_buffers = max(1, num_buffers)
+        self.pad_color = pad_color
+        self.buffers = {}  # input_size -> [[canvas, blob, (width, height) đã letterbox], ...]
+        self.next_index = 0
+
+    def _buffers(self, input_size):
+        """Cấp phát buffer của input_size ở lần dùng đầu tiên"""
+        buffers = self.buffers.get(input_size)
+        if buffers is None:
+            buffers = self.buffers[input_size] = [
+                [np.empty((input_size, input_size, 3), dtype=np.uint8),
+                 np.empty((3, input_size, input_size), dtype=np.float32),
+                 None]
+                for _ in range(self.num_buffers)]
+        return buffers
+
+    def __call__(self, frame, input_size):
+        """Letterbox frame BGR, trả về (blob CHW RGB [0, 1], meta để đưa bbox về frame gốc)"""
+        height, width = frame.shape[:2]
+        scale, new_w, new_h, left, top = letterbox_params(width, height, input_size)
+
+        buffers = self._buffers(input_size)
+        slot = buffers[self.next_index % self.num_buffers]
+        self.next_index += 1
+        canvas, blob, layout = slot
+
+        # Chỉ tô lại padding khi kích thước frame đổi, phần giữa bị ghi đè mỗi frame
+        if layout != (width, height):
+            canvas[...] = self.pad_color
+            slot[2] = (width, height)
+        view = canvas[top:top + new_h, left:left + new_w]
+        if (new_w, new_h) == (width, height):
+            view[...] = frame
+        else:
+            cv2.resize(frame, (new_w, new_h), dst=view, interpolation=cv2.INTER_LINEAR)
+
+        np.multiply(canvas[:, :, ::-1].transpose(2, 0, 1), SCALE, out=blob, dtype=np.float32)
+        return blob, (scale, left, top, width, height)
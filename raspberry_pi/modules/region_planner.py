@@ -0,0 +1,154 @@
+"""
+Region Planner Module
+Chọn vùng ảnh cho detector: crop quanh vị trí track gần nhất + zone cấu hình (roi), hoặc
+lưới tile chồng lấn (tiled); gộp detection của các vùng bằng NMS theo class
+"""
+
+import numpy as np
+from configs.settings import (REGION_MODE, ROI_ZONES, ROI_PADDING, ROI_MIN_SIZE, ROI_MAX_REGIONS, ROI_MAX_AREA,
+                              ROI_FULL_FRAME_INTERVAL, TILE_GRID, TILE_OVERLAP, TILE_FULL_FRAME,
+                              REGION_MERGE_THRESHOLD, MAX_DETECTIONS, CLASS_NAMES)
+from utils.boxes import batched_nms
+from utils.postprocess import Detections, from_arrays
+
+MODES = ("roi", "tiled")
+
+def merge_region_detections(results, offsets, threshold=REGION_MERGE_THRESHOLD):
+    """Đưa detection của từng region về toạ độ frame rồi gộp box trùng giữa các region"""
+    pairs = [(result, offset) for result, offset in zip(results, offsets) if len(result)]
+    if not pairs:
+        return Detections(class_names=CLASS_NAMES)
+    xyxy = np.concatenate([result.xyxy + np.tile(offset, 2) for result, offset in pairs])
+    conf = np.concatenate([result.conf for result, _ in pairs])
+    cls = np.concatenate([result.cls for result, _ in pairs])
+
+    # intersection / box nhỏ hơn: box bị cắt ở biên tile nằm trong box đầy đủ vẫn bị gộp
+    keep = batched_nms(xyxy, conf, cls, threshold, metric="ios")[:MAX_DETECTIONS]
+    return Detections(from_arrays(xyxy[keep], conf[keep], cls[keep]), CLASS_NAMES)
+
+def merge_rects(rects):
+    """Gộp các hình chữ nhật giao nhau thành hình bao của chúng"""
+    rects = [list(rect) for rect in rects]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                a, b = rects[i], rects[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    rects[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del rects[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return rects
+
+class RegionPlanner:
+    def __init__(self, mode=REGION_MODE, zones=ROI_ZONES, padding=ROI_PADDING, min_size=ROI_MIN_SIZE,
+                 max_regions=ROI_MAX_REGIONS, max_area=ROI_MAX_AREA, full_frame_interval=ROI_FULL_FRAME_INTERVAL,
+                 grid=TILE_GRID, overlap=TILE_OVERLAP, tile_full_frame=TILE_FULL_FRAME):
+        if mode not in MODES:
+            raise ValueError(f"Unknown region mode: {mode}")
+        self.mode = mode
+        self.zones = list(zones)
+        self.padding = padding
+        self.min_size = min_size
+        self.roi_max_regions = max(1, max_regions)
+        self.max_area = max_area
+        self.full_frame_interval = full_frame_interval
+        self.grid = tuple(grid)
+        self.overlap = min(max(overlap, 0), 0.9)
+        self.tile_full_frame = tile_full_frame
+
+        self.tiles = None
+        self.tiles_shape = None
+        self.last_full_frame = None
+
+        # Thống kê
+        self.frames = 0
+        self.full_frames = 0
+        self.regions = 0
+
+    @property
+    def max_regions(self):
+        """Số region tối đa của một frame (để cấp phát đủ buffer preprocess)"""
+        if self.mode == "tiled":
+            return self.grid[0] * self.grid[1] + (1 if self.tile_full_frame else 0)
+        return self.roi_max_regions
+
+    def plan(self, frame_shape, detections, timestamp):
+        """List region (x1, y1, x2, y2) pixels cho frame, None = detect full frame như bình thường"""
+        height, width = frame_shape[:2]
+        self.frames += 1
+        if self.mode == "tiled":
+            regions = self._tiles(width, height)
+        else:
+            regions = self._rois(width, height, detections, timestamp)
+
+        if regions is None:
+            self.full_frames += 1
+        else:
+            self.regions += len(regions)
+        return regions
+
+    def _tiles(self, width, height):
+        """Lưới tile phủ kín frame, hai tile liền kề chồng lấn overlap (tính lại khi đổi kích thước)"""
+        if self.tiles_shape != (width, height):
+            cols, rows = self.grid
+            tile_w = width / (cols - (cols - 1) * self.overlap)
+            tile_h = height / (rows - (rows - 1) * self.overlap)
+            self.tiles = []
+            for row in range(rows):
+                for col in range(cols):
+                    x1 = int(round(col * tile_w * (1 - self.overlap)))
+                    y1 = int(round(row * tile_h * (1 - self.overlap)))
+                    self.tiles.append((x1, y1, min(width, int(round(x1 + tile_w))),
+                                       min(height, int(round(y1 + tile_h)))))
+            if self.tile_full_frame:
+                self.tiles.append((0, 0, width, height))
+            self.tiles_shape = (width, height)
+        return self.tiles
+
+    def _rois(self, width, height, detections, timestamp):
+        """Crop quanh bbox gần nhất và zone; full frame định kỳ hoặc khi crop không tiết kiệm"""
+        if self.last_full_frame is None or timestamp - self.last_full_frame >= self.full_frame_interval:
+            self.last_full_frame = timestamp
+            return None
+
+        rects = []
+        if len(detections) > 0:
+            xyxy = detections.xyxy
+            sizes = (xyxy[:, 2:] - xyxy[:, :2]).max(axis=1, keepdims=True)
+            centers = (xyxy[:, :2] + xyxy[:, 2:]) / 2
+            # Nửa cạnh crop: bbox + padding mỗi bên, không nhỏ hơn min_size
+            half = np.maximum((xyxy[:, 2:] - xyxy[:, :2]) / 2 + self.padding * sizes, self.min_size / 2)
+            rects.extend(np.concatenate((centers - half, centers + half), axis=1).tolist())
+        for x1, y1, x2, y2 in self.zones:
+            rects.append([x1 * width, y1 * height, x2 * width, y2 * height])
+        if not rects:
+            # Chưa biết object ở đâu
+            self.last_full_frame = timestamp
+            return None
+
+        regions = []
+        for x1, y1, x2, y2 in merge_rects(rects):
+            x1, y1 = max(0, int(x1)), max(0, int(y1))
+            x2, y2 = min(width, int(np.ceil(x2))), min(height, int(np.ceil(y2)))
+            if x2 > x1 and y2 > y1:
+                regions.append((x1, y1, x2, y2))
+        area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+        if not regions or len(regions) > self.roi_max_regions or area > self.max_area * width * height:
+            self.last_full_frame = timestamp
+            return None
+        return regions
+
+    def get_stats(self):
+        """Thống kê planner"""
+        region_frames = self.frames - self.full_frames
+        return {
+            "mode": self.mode,
+            "frames": self.frames,
+            "full_frames": self.full_frames,
+            "avg_regions": self.regions / region_frames if region_frames else 0
+        }
@@ -0,0 +1,108 @@
+"""
+Resolution Controller Module
+Chọn kích thước input của detector theo latency so với FPS mục tiêu và kích thước object gần đây
+"""
+
+import threading
+from configs.settings import RESOLUTION_TARGET_FPS, RESOLUTION_MIN_OBJECT_SIZE, RESOLUTION_PATIENCE
+from utils.logger import system_logger
+
+class ResolutionController:
+    def __init__(self, sizes, target_fps=RESOLUTION_TARGET_FPS, min_object_size=RESOLUTION_MIN_OBJECT_SIZE,
+                 patience=RESOLUTION_PATIENCE, initial_size=None):
+        self.sizes = sorted(sizes)
+        self.budget = 1000 / target_fps  # ms cho mỗi lần detect
+        self.min_object_size = min_object_size
+        self.patience = max(1, patience)
+        self.current_size = initial_size if initial_size in self.sizes else self.sizes[-1]
+        # Size lớn nhất được phép chọn (governor hạ xuống khi máy nóng/quá tải)
+        self.max_size = self.sizes[-1]
+
+        self.lock = threading.Lock()
+        self.latency = {}  # size -> latency trung bình (ms)
+        self.pending_size = None
+        self.pending_count = 0
+
+        # Thống kê
+        self.switches = 0
+        self.frames_per_size = {size: 0 for size in self.sizes}
+
+    def estimate_latency(self, size):
+        """Latency của size: đo được hoặc ngoại suy từ size đã đo gần nhất (tỉ lệ với diện tích)"""
+        if size in self.latency:
+            return self.latency[size]
+        if not self.latency:
+            return 0
+        measured = min(self.latency, key=lambda s: abs(s - size))
+        return self.latency[measured] * (size / measured) ** 2
+
+    def update(self, size, inference_time, detections, frame_shape):
+        """Ghi latency của lần detect vừa chạy ở size, trả về size cho các lần detect sau"""
+        with self.lock:
+            if size not in self.frames_per_size:
+                return self.current_size
+            self.frames_per_size[size] += 1
+            if size in self.latency:
+                self.latency[size] = 0.8 * self.latency[size] + 0.2 * inference_time
+            else:
+                self.latency[size] = inference_time
+
+            target = self._target_size(detections, frame_shape)
+            if target == self.current_size:
+                self.pending_size, self.pending_count = None, 0
+                return self.current_size
+
+            # Đổi size khi đề xuất ổn định, hoặc ngay lập tức khi vượt budget quá xa
+            if target == self.pending_size:
+                self.pending_count += 1
+            else:
+                self.pending_size, self.pending_count = target, 1
+            overloaded = self.estimate_latency(self.current_size) > 1.5 * self.budget
+            if self.pending_count >= self.patience or (overloaded and target < self.current_size):
+                system_logger.info(f"Input size {self.current_size} -> {target} "
+                                   f"(latency {self.estimate_latency(self.current_size):.1f}ms, "
+                                   f"budget {self.budget:.1f}ms)")
+                self.current_size = target
+                self.pending_size, self.pending_count = None, 0
+                self.switches += 1
+            return self.current_size
+
+    def set_max_size(self, max_size):
+        """Giới hạn size lớn nhất (None = không giới hạn), size hiện tại vượt giới hạn thì giảm ngay"""
+        with self.lock:
+            allowed = [size for size in self.sizes if max_size is None or size <= max_size]
+            self.max_size = allowed[-1] if allowed else self.sizes[0]
+            if self.current_size > self.max_size:
+                system_logger.info(f"Input size {self.current_size} -> {self.max_size} (max size limit)")
+                self.current_size = self.max_size
+                self.pending_size, self.pending_count = None, 0
+                self.switches += 1
+
+    def _target_size(self, detections, frame_shape):
+        """Size lớn nhất vừa budget, giảm xuống size nhỏ nhất vẫn đủ thấy object nhỏ nhất"""
+        affordable = [size for size in self.sizes
+                      if size <= self.max_size and self.estimate_latency(size) <= self.budget]
+        max_size = affordable[-1] if affordable else self.sizes[0]
+
+        # Không có object: dùng size lớn nhất có thể để không bỏ sót
+        if len(detections) == 0:
+            return max_size
+
+        boxes = detections.xyxy
+        min_side = float((boxes[:, 2:] - boxes[:, :2]).min())
+        frame_side = max(frame_shape[:2])
+        enough = [size for size in self.sizes if min_side * size / frame_side >= self.min_object_size]
+        needed = enough[0] if enough else self.sizes[-1]
+        return min(needed, max_size)
+
+    def get_stats(self):
+        """Thống kê controller"""
+        with self.lock:
+            return {
+                "current_size": self.current_size,
+                "max_size": self.max_size,
+                "budget_ms": self.budget,
+                "latency_ms": dict(self.latency),
+                "frames_per_size": dict(self.frames_per_size),
+                "switches": self.switches
+            }
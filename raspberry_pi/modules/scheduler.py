@@ -0,0 +1,97 @@
+"""
+Frame Scheduler Module
+Quyết định frame nào chạy detector, các frame còn lại dùng tracker.predict()
+Khoảng cách giữa hai lần detect tự co lại khi object di chuyển nhanh hoặc có nhiều object
+"""
+
+import threading
+import time
+import numpy as np
+from configs.settings import (SCHEDULER_CPU_BUDGET, SCHEDULER_MIN_INTERVAL, SCHEDULER_MAX_INTERVAL,
+                              SCHEDULER_MOTION_GAIN, SCHEDULER_COUNT_GAIN)
+
+class FrameScheduler:
+    def __init__(self, cpu_budget=SCHEDULER_CPU_BUDGET, min_interval=SCHEDULER_MIN_INTERVAL,
+                 max_interval=SCHEDULER_MAX_INTERVAL, motion_gain=SCHEDULER_MOTION_GAIN,
+                 count_gain=SCHEDULER_COUNT_GAIN, workers=1):
+        # cpu_budget: tỉ lệ thời gian tối đa dành cho detector (trên mỗi worker)
+        self.cpu_budget = max(0.01, cpu_budget)
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.motion_gain = motion_gain
+        self.count_gain = count_gain
+        self.workers = max(1, workers)
+
+        self.lock = threading.Lock()
+        self.avg_detect_time = 0
+        self.motion = 0
+        self.object_count = 0
+        self.interval = min_interval
+        self.last_detect_time = None
+        self.track_ids = set()
+
+        # Thống kê
+        self.detected_frames = 0
+        self.skipped_frames = 0
+
+    def should_detect(self, timestamp=None):
+        """True nếu frame tại timestamp cần chạy detector"""
+        timestamp = timestamp or time.time()
+        with self.lock:
+            if self.last_detect_time is None or timestamp - self.last_detect_time >= self.interval:
+                self.last_detect_time = timestamp
+                self.detected_frames += 1
+                return True
+            self.skipped_frames += 1
+            return False
+
+    def record_detection(self, detect_time, detections):
+        """Cập nhật latency detector (ms) và mức chuyển động sau mỗi lần detect
+
+        detections có velocity (qua tracker) thì chuyển động = tốc độ lớn nhất theo
+        chiều cao bbox mỗi giây, ngược lại chỉ dùng số object.
+        Track mới (chưa có vận tốc, hoặc object nhảy quá xa nên mất track) -> detect lại ngay
+        ở frame sau với interval nhỏ nhất.
+        """
+        motion = 0
+        new_tracks = False
+        if len(detections) > 0 and detections.track_ids is not None:
+            heights = np.maximum(detections.xyxy[:, 3] - detections.xyxy[:, 1], 1)
+            speeds = np.hypot(detections.data["velocity"][:, 0], detections.data["velocity"][:, 1])
+            motion = float(np.max(speeds / heights))
+            track_ids = set(detections.track_ids.tolist())
+            new_tracks = not track_ids <= self.track_ids
+            self.track_ids = track_ids
+
+        with self.lock:
+            detect_time = detect_time / 1000
+            if self.detected_frames <= 1:
+                self.avg_detect_time = detect_time
+            else:
+                self.avg_detect_time = 0.9 * self.avg_detect_time + 0.1 * detect_time
+            self.motion = motion
+            self.object_count = len(detections)
+            self.interval = self._compute_interval()
+            if new_tracks:
+                self.interval = max(self.min_interval, self.avg_detect_time / (self.cpu_budget * self.workers))
+
+    def _compute_interval(self):
+        """Khoảng cách detect: từ max_interval (cảnh tĩnh) co về mức budget cho phép"""
+        # Không detect nhanh hơn latency budget: detector chiếm tối đa cpu_budget thời gian
+        budget_interval = self.avg_detect_time / (self.cpu_budget * self.workers)
+        low = max(self.min_interval, budget_interval)
+        high = max(low, self.max_interval)
+        activity = self.motion_gain * self.motion + self.count_gain * self.object_count
+        return low + (high - low) / (1 + activity)
+
+    def get_stats(self):
+        """Thống kê scheduler"""
+        with self.lock:
+            total = self.detected_frames + self.skipped_frames
+            return {
+                "interval_ms": self.interval * 1000,
+                "avg_detect_time_ms": self.avg_detect_time * 1000,
+                "detected_frames": self.detected_frames,
+                "skipped_frames": self.skipped_frames,
+                "detect_ratio": self.detected_frames / total if total else 0
+            }
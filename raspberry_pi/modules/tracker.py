@@ -0,0 +1,228 @@
+"""
+Tracker Module
+Multi-object tracker IoU + Kalman, liên kết 2 bước kiểu ByteTrack
+Trạng thái của mọi track nằm trong mảng NumPy nên predict/update/IoU đều vectorized
+"""
+
+import time
+import numpy as np
+from configs.settings import (CAMERA_FPS, TRACK_HIGH_THRESH, TRACK_LOW_THRESH, TRACK_NEW_THRESH,
+                              TRACK_MATCH_IOU, TRACK_BUFFER, TRACK_CONF_SMOOTHING)
+from utils.boxes import iou_matrix, xyxy_to_cxcywh, cxcywh_to_xyxy
+from utils.postprocess import Detections, TRACK_DTYPE
+
+# Nhiễu Kalman theo chiều cao bbox (giống ByteTrack), vận tốc tính theo pixels/s
+STD_POSITION = 1.0 / 20
+STD_VELOCITY = 1.0 / 160 * CAMERA_FPS
+
+# Measurement: cx, cy, w, h; state: thêm vận tốc của 4 giá trị
+MEASUREMENT_MATRIX = np.eye(4, 8)
+
+def greedy_match(scores, threshold):
+    """Match greedy theo score giảm dần (không cần scipy): trả về (rows, cols)"""
+    rows, cols = np.nonzero(scores >= threshold)
+    order = np.argsort(-scores[rows, cols], kind="stable")
+    used_rows, used_cols = set(), set()
+    matches = []
+    for row, col in zip(rows[order].tolist(), cols[order].tolist()):
+        if row in used_rows or col in used_cols:
+            continue
+        used_rows.add(row)
+        used_cols.add(col)
+        matches.append((row, col))
+    if not matches:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    matched = np.array(matches, dtype=np.intp)
+    return matched[:, 0], matched[:, 1]
+
+def transition_matrix(dt):
+    """Ma trận chuyển trạng thái vận tốc không đổi sau dt giây"""
+    transition = np.eye(8)
+    transition[:4, 4:] = np.eye(4) * dt
+    return transition
+
+def _diag(values):
+    """Batch ma trận đường chéo: (N, D) -> (N, D, D)"""
+    result = np.zeros(values.shape + values.shape[-1:])
+    index = np.arange(values.shape[-1])
+    result[:, index, index] = values
+    return result
+
+class Tracker:
+    def __init__(self, high_thresh=TRACK_HIGH_THRESH, low_thresh=TRACK_LOW_THRESH,
+                 new_thresh=TRACK_NEW_THRESH, match_iou=TRACK_MATCH_IOU, track_buffer=TRACK_BUFFER,
+                 conf_smoothing=TRACK_CONF_SMOOTHING):
+        self.high_thresh = high_thresh
+        self.low_thresh = low_thresh
+        self.new_thresh = new_thresh
+        self.match_iou = match_iou
+        self.track_buffer = track_buffer
+        self.conf_smoothing = conf_smoothing
+        self.class_names = {}
+        self.reset()
+
+    def reset(self):
+        """Xoá toàn bộ track"""
+        self.means = np.empty((0, 8))
+        self.covs = np.empty((0, 8, 8))
+        self.ids = np.empty(0, dtype=np.int32)
+        self.cls = np.empty(0, dtype=np.int32)
+        self.conf = np.empty(0, dtype=np.float32)
+        self.last_seen = np.empty(0)
+        self.last_time = None
+        self.next_id = 1
+
+        # Thống kê
+        self.created_tracks = 0
+        self.removed_tracks = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def update(self, detections, timestamp=None):
+        """Cập nhật track với detections của một frame
+
+        Trả về Detections (TRACK_DTYPE) của các track được match/tạo trong frame này,
+        bbox là trạng thái Kalman đã làm mượt, conf là EMA.
+        """
+        timestamp = timestamp or time.time()
+        self.class_names = detections.class_names
+        self._predict_state(timestamp)
+
+        data = detections.data
+        data = data[data["conf"] >= self.low_thresh]
+        boxes = data["xyxy"].astype(np.float64)
+        track_boxes = cxcywh_to_xyxy(self.means[:, :4])
+
+        # IoU chỉ tính giữa track và detection cùng class
+        iou = iou_matrix(track_boxes, boxes) * (self.cls[:, None] == data["cls"][None, :])
+
+        # Bước 1: detection confidence cao
+        high = np.nonzero(data["conf"] >= self.high_thresh)[0]
+        track_rows, det_cols = greedy_match(iou[:, high], self.match_iou)
+        matched_tracks = track_rows
+        matched_dets = high[det_cols]
+
+        # Bước 2: track chưa match với detection confidence thấp (thường là bị che một phần)
+        remaining = np.setdiff1d(np.arange(len(self.ids)), matched_tracks)
+        low = np.nonzero(data["conf"] < self.high_thresh)[0]
+        track_rows, det_cols = greedy_match(iou[np.ix_(remaining, low)], self.match_iou)
+        matched_tracks = np.concatenate([matched_tracks, remaining[track_rows]])
+        matched_dets = np.concatenate([matched_dets, low[det_cols]])
+
+        self._update_state(matched_tracks, data[matched_dets], timestamp)
+
+        # Mọi detection chưa match (kể cả confidence thấp) >= new_thresh -> track mới, để tracker
+        # không nâng ngưỡng detection hiệu dụng; track giả không được match lại sẽ không còn trong output
+        unmatched = np.setdiff1d(np.arange(len(data)), matched_dets)
+        new_dets = data[unmatched[data["conf"][unmatched] >= self.new_thresh]]
+        new_tracks = np.arange(len(self.ids), len(self.ids) + len(new_dets))
+        self._create_tracks(new_dets, timestamp)
+
+        # Output theo thứ tự detection, sau đó mới xoá track mất quá lâu
+        output = self._build_output(np.concatenate([matched_tracks, new_tracks]))
+        self._remove_lost(timestamp)
+        return output
+
+    def predict(self, timestamp=None):
+        """Ngoại suy vị trí các track đang hoạt động tới timestamp (không đổi trạng thái)
+
+        Dùng cho frame không chạy detector: trả về Detections (TRACK_DTYPE) của các track
+        được match ở lần update gần nhất (track đang mất không được trả về).
+        """
+        timestamp = timestamp or time.time()
+        if self.last_time is None or len(self.ids) == 0:
+            return Detections(np.empty(0, dtype=TRACK_DTYPE), self.class_names)
+        active = np.nonzero(self.last_seen >= self.last_time)[0]
+        means = self.means[active] @ transition_matrix(max(0.0, timestamp - self.last_time)).T
+        return self._build_output(active, means)
+
+    def _predict_state(self, timestamp):
+        """Kalman predict cho toàn bộ track tới timestamp"""
+        dt = 0.0 if self.last_time is None else max(0.0, timestamp - self.last_time)
+        self.last_time = timestamp
+        if len(self.ids) == 0 or dt == 0:
+            return
+
+        transition = transition_matrix(dt)
+        heights = self.means[:, 3:4]
+        std = np.concatenate([np.repeat(STD_POSITION * heights, 4, axis=1),
+                              np.repeat(STD_VELOCITY * heights, 4, axis=1)], axis=1)
+        # Nhiễu tích luỹ theo số frame danh định đã trôi qua
+        noise = _diag(std ** 2) * (dt * CAMERA_FPS)
+        self.means = self.means @ transition.T
+        self.covs = transition @ self.covs @ transition.T + noise
+
+    def _update_state(self, tracks, dets, timestamp):
+        """Kalman update cho các track đã match"""
+        if len(tracks) == 0:
+            return
+        means, covs = self.means[tracks], self.covs[tracks]
+        measurements = xyxy_to_cxcywh(dets["xyxy"].astype(np.float64))
+
+        measurement_std = STD_POSITION * means[:, 3:4]
+        noise = _diag(np.repeat(measurement_std, 4, axis=1) ** 2)
+        projected_cov = MEASUREMENT_MATRIX @ covs @ MEASUREMENT_MATRIX.T + noise
+        # Kalman gain K = P H^T S^-1 (giải batch thay vì nghịch đảo)
+        cross_cov = covs @ MEASUREMENT_MATRIX.T
+        gain = np.linalg.solve(projected_cov, cross_cov.transpose(0, 2, 1)).transpose(0, 2, 1)
+        innovation = measurements - means[:, :4]
+
+        self.means[tracks] = means + np.einsum("nij,nj->ni", gain, innovation)
+        self.covs[tracks] = covs - gain @ MEASUREMENT_MATRIX @ covs
+        self.conf[tracks] = (self.conf_smoothing * self.conf[tracks] +
+                             (1 - self.conf_smoothing) * dets["conf"])
+        self.last_seen[tracks] = timestamp
+
+    def _create_tracks(self, dets, timestamp):
+        """Thêm track mới cho các detection chưa match"""
+        count = len(dets)
+        if count == 0:
+            return
+        means = np.zeros((count, 8))
+        means[:, :4] = xyxy_to_cxcywh(dets["xyxy"].astype(np.float64))
+        heights = means[:, 3:4]
+        std = np.concatenate([np.repeat(2 * STD_POSITION * heights, 4, axis=1),
+                              np.repeat(10 * STD_VELOCITY * heights, 4, axis=1)], axis=1)
+
+        self.means = np.concatenate([self.means, means])
+        self.covs = np.concatenate([self.covs, _diag(std ** 2)])
+        self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + count, dtype=np.int32)])
+        self.cls = np.concatenate([self.cls, dets["cls"]])
+        self.conf = np.concatenate([self.conf, dets["conf"]])
+        self.last_seen = np.concatenate([self.last_seen, np.full(count, timestamp)])
+        self.next_id += count
+        self.created_tracks += count
+
+    def _remove_lost(self, timestamp):
+        """Xoá track không được thấy quá track_buffer giây"""
+        keep = timestamp - self.last_seen <= self.track_buffer
+        if keep.all():
+            return
+        self.removed_tracks += int((~keep).sum())
+        self.means = self.means[keep]
+        self.covs = self.covs[keep]
+        self.ids = self.ids[keep]
+        self.cls = self.cls[keep]
+        self.conf = self.conf[keep]
+        self.last_seen = self.last_seen[keep]
+
+    def _build_output(self, tracks, means=None):
+        """Structured array TRACK_DTYPE cho các track được chọn"""
+        means = self.means[tracks] if means is None else means
+        dets = np.empty(len(tracks), dtype=TRACK_DTYPE)
+        dets["xyxy"] = cxcywh_to_xyxy(means[:, :4])
+        dets["conf"] = self.conf[tracks]
+        dets["cls"] = self.cls[tracks]
+        dets["center"] = means[:, :2]
+        dets["track_id"] = self.ids[tracks]
+        dets["velocity"] = means[:, 4:6]
+        return Detections(dets, self.class_names)
+
+    def get_stats(self):
+        """Thống kê tracker"""
+        return {
+            "tracks": len(self.ids),
+            "created_tracks": self.created_tracks,
+            "removed_tracks": self.removed_tracks
+        }
@@ -0,0 +1,39 @@
+"""
+Ultralytics Backend - chạy model qua YOLO() của Ultralytics (cần torch)
+"""
+
+from ultralytics import YOLO
+from configs.settings import MODEL_PATH, MODEL_INPUT_SIZE, CONFIDENCE_THRESHOLD, CLASS_NAMES
+from utils.postprocess import Detections, from_results
+
+class UltralyticsBackend:
+    def __init__(self, model_path=MODEL_PATH, num_threads=None):
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.model = None
+        self.sizes = [MODEL_INPUT_SIZE]
+
+    def load(self):
+        """Load model YOLO"""
+        if self.num_threads:
+            import torch
+            torch.set_num_threads(self.num_threads)
+        self.model = YOLO(self.model_path, task='detect')
+
+    def set_num_threads(self, num_threads):
+        """Đổi số thread của torch khi đang chạy"""
+        import torch
+        self.num_threads = num_threads
+        torch.set_num_threads(num_threads)
+
+    def preprocess(self, frame, input_size=None):
+        """Ultralytics tự letterbox bên trong predictor (chỉ một size)"""
+        return frame, None
+
+    def infer(self, frame):
+        """Chạy predictor của Ultralytics"""
+        return self.model(frame, conf=CONFIDENCE_THRESHOLD, verbose=False)
+
+    def postprocess(self, results, meta):
+        """Chuyển Results của Ultralytics thành Detections (vectorized)"""
+        return Detections(from_results(results), CLASS_NAMES)
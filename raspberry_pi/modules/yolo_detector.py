@@ -5,20 +5,51 @@ YOLO Detector Module
 import cv2
 import time
 import numpy as np
-from ultralytics import YOLO
-from configs.settings import MODEL_PATH, CONFIDENCE_THRESHOLD, CLASS_NAMES
+from configs.settings import (MODEL_PATH, DETECTOR_BACKEND, CLASS_NAMES, MODEL_VARIANTS, DYNAMIC_RESOLUTION,
+                              MODEL_PRECISION, WARMUP_ITERATIONS, CAMERA_WIDTH, CAMERA_HEIGHT)
+from modules.region_planner import merge_region_detections
 from utils.logger import system_logger
+from utils.postprocess import Detections
+from utils.startup import startup_profile
 
 class YOLODetector:
-    def __init__(self):
-        self.model = None
+    def __init__(self, backend=DETECTOR_BACKEND, num_threads=None, precision=MODEL_PRECISION, model_path=None,
+                 num_buffers=1):
+        self.backend_name = backend
+        self.num_buffers = num_buffers
+        self.model_path = model_path or MODEL_PATH
+        self.num_threads = num_threads
+        self.precision = precision
+        self.backend = None
         self.is_loaded = False
+        self.input_size = None
+        # Thời gian warmup (ms) tổng và theo từng input size, không tính vào thống kê
+        self.warmup_time = 0
+        self.warmup_latencies = {}
+    
+    def _create_backend(self):
+        """Tạo backend theo cấu hình (import lazy để backend ncnn không kéo theo torch)"""
+        if self.backend_name == "ncnn":
+            NCNNBackend = startup_profile.timed_import("modules.ncnn_backend").NCNNBackend
+            kwargs = {"model_dir": self.model_path, "precision": self.precision, "num_buffers": self.num_buffers}
+            if DYNAMIC_RESOLUTION and self.model_path == MODEL_PATH:
+                kwargs["variants"] = MODEL_VARIANTS
+            if self.num_threads:
+                kwargs["num_threads"] = self.num_threads
+            return NCNNBackend(**kwargs)
+        if self.backend_name == "ultralytics":
+            UltralyticsBackend = startup_profile.timed_import("modules.ultralytics_backend").UltralyticsBackend
+            return UltralyticsBackend(self.model_path, self.num_threads)
+        raise ValueError(f"Unknown detector backend: {self.backend_name}")
         
-    def load_model(self):
-        """Load model YOLO"""
+    def load_model(self, warmup=WARMUP_ITERATIONS):
+        """Load model YOLO rồi warmup, chỉ báo loaded (ready) khi warmup xong"""
         try:
-            system_logger.info(f"Loading model from {MODEL_PATH}...")
-            self.model = YOLO(MODEL_PATH, task='detect')
+            system_logger.info(f"Loading model from {self.model_path} "
+                               f"(backend: {self.backend_name}, precision: {self.precision})...")
+            self.backend = self._create_backend()
+            self.backend.load()
+            self.warmup(warmup)
             self.is_loaded = True
             system_logger.info("Model loaded successfully!")
             return True
@@ -27,54 +58,121 @@ class YOLODetector:
             self.is_loaded = False
             return False
     
-    def detect(self, frame):
-        """Thực hiện detection trên frame"""
+    def warmup(self, iterations=WARMUP_ITERATIONS, frame_shape=(CAMERA_HEIGHT, CAMERA_WIDTH, 3)):
+        """Chạy inference giả trên từng input size của backend (cấp phát buffer, khởi tạo kernel)
+        
+        Frame giả cùng kích thước camera để buffer letterbox dùng luôn cho frame thật.
+        """
+        self.warmup_latencies = {}
+        if iterations <= 0:
+            self.warmup_time = 0
+            return
+        
+        frame = np.full(frame_shape, 114, dtype=np.uint8)
+        start_warmup = time.time()
+        for input_size in self.backend.sizes:
+            latencies = []
+            for _ in range(iterations):
+                start_inference = time.time()
+                blob, meta = self.backend.preprocess(frame, input_size)
+                self.backend.postprocess(self.backend.infer(blob), meta)
+                latencies.append((time.time() - start_inference) * 1000)
+            self.warmup_latencies[input_size] = latencies
+        self.warmup_time = (time.time() - start_warmup) * 1000
+        
+        summary = ", ".join(f"{size}: {' '.join(f'{t:.0f}' for t in latencies)}ms"
+                            for size, latencies in self.warmup_latencies.items())
+        system_logger.info(f"Warmup done in {self.warmup_time:.0f}ms ({summary})")
+    
+    def detect(self, frame, regions=None, on_stage=None):
+        """Thực hiện detection trên frame (hoặc chỉ trên các region (x1, y1, x2, y2) của frame)
+        
+        on_stage(tên stage, ms) nhận latency của preprocess / infer / postprocess.
+        """
         if not self.is_loaded:
-            return []
+            return Detections(class_names=CLASS_NAMES)
         
         try:
-            # Thực hiện detection
-            results = self.model(frame, conf=CONFIDENCE_THRESHOLD, verbose=False)
-            
-            detections = []
-            for result in results:
-                if result.boxes is not None:
-                    boxes = result.boxes
-                    for box in boxes:
-                        # Lấy thông tin detection
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                        conf = box.conf[0].cpu().numpy()
-                        cls = int(box.cls[0].cpu().numpy())
-                        
-                        # Lấy tên class
-                        class_name = CLASS_NAMES.get(cls, f"class_{cls}")
-                        
-                        detection = {
-                            "class": class_name,
-                            "confidence": float(conf),
-                            "bbox": [int(x1), int(y1), int(x2), int(y2)],
-                            "center": [int((x1+x2)/2), int((y1+y2)/2)]
-                        }
-                        detections.append(detection)
+            if on_stage is None:
+                blob, meta = self.preprocess(frame, regions=regions)
+                return self.postprocess(self.infer(blob), meta)
             
+            start_stage = time.time()
+            blob, meta = self.preprocess(frame, regions=regions)
+            on_stage("preprocess", (time.time() - start_stage) * 1000)
+            start_stage = time.time()
+            output = self.infer(blob)
+            on_stage("infer", (time.time() - start_stage) * 1000)
+            start_stage = time.time()
+            detections = self.postprocess(output, meta)
+            on_stage("postprocess", (time.time() - start_stage) * 1000)
             return detections
         except Exception as e:
             system_logger.error(f"Detection error: {e}")
-            return []
+            return Detections(class_names=CLASS_NAMES)
+    
+    def available_sizes(self):
+        """Các kích thước input backend hỗ trợ"""
+        return self.backend.sizes if self.is_loaded else []
+    
+    def set_num_threads(self, num_threads):
+        """Đổi số thread inference của backend đã load"""
+        self.num_threads = num_threads
+        if self.is_loaded:
+            self.backend.set_num_threads(num_threads)
+    
+    def set_input_size(self, input_size):
+        """Chọn kích thước input cho các lần detect sau (None = mặc định)"""
+        self.input_size = input_size
+    
+    def preprocess(self, frame, input_size=None, regions=None):
+        """Stage preprocess của backend: trả về (blob, meta)
+        
+        Có regions: mỗi region một blob (crop là view của frame), blob/meta là list.
+        """
+        input_size = input_size or self.input_size
+        if regions is None:
+            return self.backend.preprocess(frame, input_size)
+        blobs, metas = [], []
+        for x1, y1, x2, y2 in regions:
+            blob, meta = self.backend.preprocess(frame[y1:y2, x1:x2], input_size)
+            blobs.append(blob)
+            metas.append((meta, (x1, y1)))
+        return blobs, metas
+    
+    def infer(self, blob):
+        """Stage inference của backend (blob list = một blob mỗi region)"""
+        if isinstance(blob, list):
+            return [self.backend.infer(region_blob) for region_blob in blob]
+        return self.backend.infer(blob)
+    
+    def postprocess(self, output, meta):
+        """Stage postprocess của backend: trả về Detections (gộp các region về toạ độ frame)
+        
+        Nhận biết batch region qua meta (list do preprocess tạo), không qua output:
+        output của Ultralytics luôn là list Results kể cả khi chạy cả frame.
+        """
+        if isinstance(meta, list):
+            results = [self.backend.postprocess(region_output, region_meta)
+                       for region_output, (region_meta, _) in zip(output, meta)]
+            return merge_region_detections(results, [offset for _, offset in meta])
+        return self.backend.postprocess(output, meta)
     
     def draw_detections(self, frame, detections):
         """Vẽ detections lên frame"""
-        for detection in detections:
-            x1, y1, x2, y2 = detection["bbox"]
-            class_name = detection["class"]
-            conf = detection["confidence"]
-            
+        bboxes = detections.xyxy.astype(np.int32).tolist()
+        track_ids = detections.track_ids
+        track_ids = track_ids.tolist() if track_ids is not None else [None] * len(bboxes)
+        for (x1, y1, x2, y2), class_name, conf, track_id in zip(bboxes, detections.names(),
+                                                                 detections.conf.tolist(), track_ids):
             # Vẽ bounding box
             cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
             
             # Vẽ label
             label = f"{class_name}: {conf:.2f}"
+            if track_id is not None:
+                label = f"#{track_id} {label}"
             cv2.putText(frame, label, (x1, y1-10), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
         
-        return frame 
\ No newline at end of file
+        return frame
\ No newline at end of file
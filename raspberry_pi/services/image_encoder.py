@@ -0,0 +1,153 @@
+"""
+Image Encoder cho MQTT upload
+Chế độ full frame / crop quanh bbox / thumbnail, JPEG quality tự chỉnh theo byte budget
+"""
+
+import threading
+import time
+from collections import deque
+import cv2
+import numpy as np
+from configs.settings import (MQTT_IMAGE_MODE, MQTT_CROP_PADDING, MQTT_MAX_CROPS, MQTT_THUMBNAIL_WIDTH,
+                              MQTT_JPEG_QUALITY, MQTT_JPEG_QUALITY_MIN, MQTT_JPEG_QUALITY_MAX,
+                              MQTT_IMAGE_BYTES_PER_SEC)
+
+MODES = ("full", "crops", "thumbnail")
+
+class ImageRegion:
+    """Một phần ảnh cần upload: ảnh + vị trí (x, y) và scale so với frame gốc"""
+    __slots__ = ("image", "x", "y", "scale", "index", "count")
+
+    def __init__(self, image, x=0, y=0, scale=1.0, index=0, count=1):
+        self.image = image
+        self.x = x
+        self.y = y
+        self.scale = scale
+        self.index = index
+        self.count = count
+
+    def downscale(self, factor):
+        """Thu nhỏ ảnh của region (khi bị backpressure)"""
+        self.image = cv2.resize(self.image, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+        self.scale *= factor
+
+class ImageEncoder:
+    def __init__(self, mode=MQTT_IMAGE_MODE, crop_padding=MQTT_CROP_PADDING, max_crops=MQTT_MAX_CROPS,
+                 thumbnail_width=MQTT_THUMBNAIL_WIDTH, quality=MQTT_JPEG_QUALITY,
+                 min_quality=MQTT_JPEG_QUALITY_MIN, max_quality=MQTT_JPEG_QUALITY_MAX,
+                 bytes_per_sec=MQTT_IMAGE_BYTES_PER_SEC):
+        if mode not in MODES:
+            raise ValueError(f"Unknown image mode: {mode}")
+        self.mode = mode
+        self.crop_padding = crop_padding
+        self.max_crops = max(1, max_crops)
+        self.thumbnail_width = thumbnail_width
+        self.quality = quality
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.bytes_per_sec = bytes_per_sec
+
+        # Số byte đã encode trong 1 giây gần nhất
+        self.lock = threading.Lock()
+        self.sent = deque()
+        self.sent_bytes = 0
+
+        # Thống kê
+        self.encoded_images = 0
+        self.encoded_bytes = 0
+        self.encode_time = 0
+
+    def prepare(self, frame, detections):
+        """Lấy phần ảnh cần gửi (chạy trên thread gọi, không encode)
+
+        Ảnh trả về luôn thuộc sở hữu của region: frame read-only (view của ring buffer)
+        được copy, crop được copy, thumbnail là ảnh mới.
+        """
+        if self.mode == "crops" and len(detections) > 0:
+            regions = self._crop_regions(frame, detections)
+        elif self.mode in ("crops", "thumbnail"):
+            regions = [self._thumbnail_region(frame)]
+        else:
+            image = frame if frame.flags.writeable else frame.copy()
+            regions = [ImageRegion(image)]
+
+        for index, region in enumerate(regions):
+            region.index = index
+            region.count = len(regions)
+        return regions
+
+    def _crop_regions(self, frame, detections):
+        """Crop quanh từng bbox (có padding), ưu tiên detection có confidence cao"""
+        height, width = frame.shape[:2]
+        order = np.argsort(-detections.conf)[:self.max_crops]
+        boxes = detections.xyxy[order]
+
+        # Padding theo kích thước bbox rồi clip vào frame (vectorized)
+        pad = (boxes[:, 2:] - boxes[:, :2]) * self.crop_padding
+        x1y1 = np.floor(boxes[:, :2] - pad).clip(0, None).astype(np.int32)
+        x2y2 = np.ceil(boxes[:, 2:] + pad).clip(None, (width, height)).astype(np.int32)
+
+        regions = []
+        for (x1, y1), (x2, y2) in zip(x1y1.tolist(), x2y2.tolist()):
+            if x2 > x1 and y2 > y1:
+                regions.append(ImageRegion(frame[y1:y2, x1:x2].copy(), x1, y1))
+        return regions or [self._thumbnail_region(frame)]
+
+    def _thumbnail_region(self, frame):
+        """Thu nhỏ cả frame về thumbnail_width"""
+        width = frame.shape[1]
+        if width <= self.thumbnail_width:
+            return ImageRegion(frame.copy())
+        scale = self.thumbnail_width / width
+        image = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return ImageRegion(image, scale=scale)
+
+    def encode(self, region):
+        """Encode JPEG với quality hiện tại rồi cập nhật quality theo byte budget"""
+        start_time = time.time()
+        with self.lock:
+            quality = self.quality
+        _, buffer = cv2.imencode('.jpg', region.image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        jpeg_bytes = buffer.tobytes()
+
+        with self.lock:
+            self.encoded_images += 1
+            self.encoded_bytes += len(jpeg_bytes)
+            self.encode_time += time.time() - start_time
+            self._update_quality(len(jpeg_bytes))
+        return jpeg_bytes
+
+    def set_max_quality(self, max_quality):
+        """Giới hạn quality tối đa (governor giảm khi máy nóng/quá tải), quality hiện tại giảm theo"""
+        with self.lock:
+            self.max_quality = max(self.min_quality, max_quality)
+            self.quality = min(self.quality, self.max_quality)
+
+    def _update_quality(self, num_bytes):
+        """Giảm quality nhanh khi vượt budget, tăng chậm khi còn dư"""
+        if self.bytes_per_sec <= 0:
+            return
+
+        now = time.time()
+        self.sent.append((now, num_bytes))
+        self.sent_bytes += num_bytes
+        while self.sent and now - self.sent[0][0] > 1.0:
+            self.sent_bytes -= self.sent.popleft()[1]
+
+        if self.sent_bytes > self.bytes_per_sec:
+            self.quality = max(self.min_quality, self.quality - 5)
+        elif self.sent_bytes < 0.7 * self.bytes_per_sec:
+            self.quality = min(self.max_quality, self.quality + 1)
+
+    def get_stats(self):
+        """Thống kê encode"""
+        with self.lock:
+            return {
+                "mode": self.mode,
+                "quality": self.quality,
+                "bytes_last_second": self.sent_bytes,
+                "encoded_images": self.encoded_images,
+                "encoded_bytes": self.encoded_bytes,
+                "avg_encode_time_ms": (self.encode_time / self.encoded_images * 1000
+                                       if self.encoded_images else 0)
+            }
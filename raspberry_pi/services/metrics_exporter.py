@@ -0,0 +1,277 @@
+"""
+Metrics Exporter
+HTTP endpoint /metrics dạng Prometheus text format (http.server, không cần thư viện ngoài)
+Giá trị được thu thập lúc scrape qua các collector, không tốn gì trên đường xử lý frame
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from configs.settings import METRICS_HOST, METRICS_PORT, METRICS_LATENCY_BUCKETS
+from utils.logger import system_logger
+from utils.startup import startup_profile
+from utils.system_stats import (read_cpu_temperature, read_cpu_frequency, read_throttled, decode_throttled,
+                                read_rss_bytes)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "yolo_"
+
+def _format_value(value):
+    """Số theo format Prometheus (bool -> 0/1)"""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _format_labels(labels):
+    """{"stage": "infer"} -> {stage="infer"}"""
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+               for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+class MetricsWriter:
+    """Gom sample theo metric family (Prometheus yêu cầu sample cùng family nằm liền nhau)"""
+    def __init__(self, prefix=PREFIX):
+        self.prefix = prefix
+        self.families = {}  # name -> (type, help, [dòng sample])
+
+    def _family(self, name, metric_type, help_text):
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = (metric_type, help_text, [])
+        return family[2]
+
+    def add(self, name, value, labels=None, metric_type="gauge", help_text=""):
+        """Thêm một sample gauge/counter (value None = không có dữ liệu, bỏ qua)"""
+        if value is None:
+            return
+        name = self.prefix + name
+        self._family(name, metric_type, help_text).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    def histogram(self, name, bounds, cumulative_counts, count, total, labels=None, help_text=""):
+        """Thêm một histogram: bounds tăng dần, cumulative_counts = số mẫu <= từng bound"""
+        name = self.prefix + name
+        samples = self._family(name, "histogram", help_text)
+        labels = dict(labels or {})
+        for bound, bucket_count in zip(bounds, cumulative_counts):
+            samples.append(f"{name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {bucket_count}")
+        samples.append(f"{name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {count}")
+        samples.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+        samples.append(f"{name}_count{_format_labels(labels)} {count}")
+
+    def render(self):
+        """Text format đầy đủ"""
+        lines = []
+        for name, (metric_type, help_text, samples) in self.families.items():
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+def _latency_histogram(writer, name, window, labels=None, help_text=""):
+    """LatencyWindow (ms) -> histogram Prometheus (giây) với bucket METRICS_LATENCY_BUCKETS"""
+    bounds = [bound / 1000 for bound in METRICS_LATENCY_BUCKETS]
+    writer.histogram(name, bounds, window.cumulative_counts(METRICS_LATENCY_BUCKETS), window.total,
+                     window.sum / 1000, labels, help_text)
+
+def collect_performance(writer, monitor):
+    """FPS, latency từng stage (histogram + percentile cửa sổ), CPU/memory, motion gate, warmup"""
+    stats = monitor.get_performance_stats()
+    writer.add("fps", stats["fps"], help_text="Frames per second over the recent window")
+    writer.add("frames_total", stats["frame_count"], metric_type="counter", help_text="Frames processed")
+    writer.add("cpu_usage_percent", stats["cpu_usage"], help_text="System CPU usage")
+    writer.add("memory_usage_percent", stats["memory_usage"], help_text="System memory usage")
+    writer.add("warmup_seconds", stats["warmup_time"] / 1000, help_text="Model warmup time before ready")
+    writer.add("gate_hit_rate", stats["gate_hit_rate"], help_text="Fraction of frames passing the motion gate")
+    writer.add("gate_skipped_frames_total", stats["gate_skipped_frames"], metric_type="counter",
+               help_text="Frames skipped by the motion gate")
+    writer.add("gate_saved_cpu_seconds_total", stats["gate_saved_cpu_ms"] / 1000, metric_type="counter",
+               help_text="Estimated inference CPU time saved by the motion gate")
+    writer.add("gate_cpu_seconds_total", stats["gate_cost_ms"] / 1000, metric_type="counter",
+               help_text="CPU time spent running the motion gate")
+
+    _latency_histogram(writer, "inference_latency_seconds", monitor.inference_times,
+                       help_text="Detector inference latency")
+    for stage, window in list(monitor.stages.items()):
+        if not window.total:
+            continue
+        _latency_histogram(writer, "stage_latency_seconds", window, {"stage": stage},
+                           help_text="Per-stage latency")
+        stage_stats = window.get_stats()
+        for key, quantile in (("p50_ms", "0.5"), ("p90_ms", "0.9"), ("p99_ms", "0.99")):
+            writer.add("stage_latency_window_seconds", stage_stats[key] / 1000,
+                       {"stage": stage, "quantile": quantile},
+                       help_text="Per-stage latency quantiles over the recent window")
+
+def collect_startup(writer):
+    """Mốc khởi động và time-to-first-inference"""
+    stats = startup_profile.get_stats()
+    for name, ms in stats["marks"].items():
+        writer.add("startup_seconds", ms / 1000, {"phase": name}, help_text="Time from process start to phase")
+    first_inference = stats["time_to_first_inference"]
+    writer.add("time_to_first_inference_seconds", first_inference / 1000 if first_inference is not None else None,
+               help_text="Time from process start to first completed detection")
+
+def collect_pipeline(writer, pipeline):
+    """Queue depth, số item bị drop/lỗi của từng stage"""
+    for stage, stats in pipeline.get_stats().items():
+        labels = {"stage": stage}
+        writer.add("pipeline_queue_depth", stats["queue_depth"], labels, help_text="Items waiting before stage")
+        writer.add("pipeline_dropped_total", stats["dropped"], labels, "counter",
+                   "Items dropped from the stage input queue")
+        writer.add("pipeline_processed_total", stats["processed"], labels, "counter", "Items processed by stage")
+        writer.add("pipeline_errors_total", stats["errors"], labels, "counter", "Stage errors")
+
+def collect_camera(writer, camera_manager):
+    """Frame đã capture và frame bị ghi đè trước khi được xử lý"""
+    writer.add("camera_frames_total", camera_manager.frame_id + 1, metric_type="counter",
+               help_text="Frames captured")
+    writer.add("camera_dropped_frames_total", camera_manager.dropped_frames, metric_type="counter",
+               help_text="Frames overwritten before processing")
+
+def collect_inference_pool(writer, pool):
+    """Số frame đang xử lý và đã xong của inference pool, worker chết/chạy lại"""
+    stats = pool.get_stats()
+    writer.add("pool_in_flight", stats["in_flight"], help_text="Frames submitted to the inference pool")
+    writer.add("pool_ready_workers", stats["ready_workers"], help_text="Workers with the model loaded")
+    writer.add("pool_worker_restarts_total", stats["restarts"], metric_type="counter",
+               help_text="Inference workers restarted after dying")
+    writer.add("pool_failed_frames_total", stats["failed_frames"], metric_type="counter",
+               help_text="Frames skipped because their worker died")
+    for worker, completed in enumerate(stats["worker_completed"]):
+        writer.add("pool_completed_total", completed, {"worker": worker}, "counter", "Frames completed by worker")
+
+def collect_mqtt(writer, mqtt_service, mqtt_publisher=None):
+    """Kết nối, message/byte đã publish, lỗi và queue của publisher bất đồng bộ"""
+    stats = mqtt_service.get_connection_status()
+    writer.add("mqtt_connected", stats["connected"], help_text="MQTT connection state")
+    writer.add("mqtt_published_messages_total", stats["published_messages"], metric_type="counter",
+               help_text="MQTT messages published")
+    writer.add("mqtt_published_bytes_total", stats["published_bytes"], metric_type="counter",
+               help_text="MQTT payload bytes published")
+    writer.add("mqtt_errors_total", stats["publish_errors"], metric_type="counter", help_text="MQTT publish errors")
+    if mqtt_publisher is None:
+        return
+    stats = mqtt_publisher.get_stats()
+    for queue, depth, dropped in (("detections", stats["detection_queue_depth"], stats["dropped_detections"]),
+                                  ("images", stats["image_queue_depth"], stats["dropped_images"])):
+        writer.add("mqtt_queue_depth", depth, {"queue": queue}, help_text="Messages waiting in publisher queue")
+        writer.add("mqtt_dropped_total", dropped, {"queue": queue}, "counter", "Messages dropped by publisher")
+
+def collect_uart(writer, uart_service):
+    """Kết nối, lệnh/byte đã gửi, message nhận và lỗi UART"""
+    stats = uart_service.get_connection_status()
+    writer.add("uart_connected", stats["connected"], help_text="UART connection state")
+    writer.add("uart_sent_commands_total", stats["sent_commands"], metric_type="counter",
+               help_text="Commands sent to ESP32")
+    writer.add("uart_sent_bytes_total", stats["sent_bytes"], metric_type="counter", help_text="Bytes sent to ESP32")
+    writer.add("uart_received_total", stats["received_messages"], metric_type="counter",
+               help_text="Messages received from ESP32")
+    writer.add("uart_errors_total", stats["send_errors"], {"direction": "send"}, "counter", "UART errors")
+    writer.add("uart_errors_total", stats["read_errors"], {"direction": "read"}, "counter", "UART errors")
+
+def collect_governor(writer, governor):
+    """Level hiện tại, giá trị từng knob và số quyết định của governor"""
+    stats = governor.get_stats()
+    writer.add("governor_level", stats["level"], help_text="Governor level (0 = full performance)")
+    writer.add("governor_detect_interval_seconds", stats["detect_interval_ms"] / 1000,
+               help_text="Minimum time between detections")
+    writer.add("governor_max_input_size", stats["max_input_size"], help_text="Largest allowed input size")
+    writer.add("governor_threads", stats["threads"], help_text="Inference threads")
+    writer.add("governor_jpeg_quality", stats["jpeg_quality"], help_text="Maximum JPEG quality")
+    writer.add("governor_skipped_frames_total", stats["skipped_frames"], metric_type="counter",
+               help_text="Frames not detected because of the governor detect interval")
+    for action, count in stats["decisions"].items():
+        writer.add("governor_decisions_total", count, {"action": action}, "counter", "Governor level changes")
+    last = stats["last_decision"]
+    if last is not None:
+        writer.add("governor_last_decision_timestamp_seconds", last["time"], {"action": last["action"]},
+                   help_text="Time of the last governor decision")
+
+def collect_system(writer):
+    """Nhiệt độ, tần số CPU, cờ throttle của firmware Pi và RSS của process"""
+    writer.add("cpu_temperature_celsius", read_cpu_temperature(), help_text="CPU temperature")
+    writer.add("cpu_frequency_hertz", read_cpu_frequency(), help_text="Current frequency of cpu0")
+    throttled = read_throttled()
+    if throttled is not None:
+        for flag, (now, occurred) in decode_throttled(throttled).items():
+            writer.add("throttled", now, {"flag": flag}, help_text="Firmware throttle flag active now")
+            writer.add("throttled_since_boot", occurred, {"flag": flag},
+                       help_text="Firmware throttle flag seen since boot")
+    writer.add("process_resident_memory_bytes", read_rss_bytes(), help_text="Resident memory of this process")
+
+class MetricsExporter:
+    def __init__(self, collect, host=METRICS_HOST, port=METRICS_PORT):
+        # collect(writer): thêm toàn bộ metric vào MetricsWriter, gọi mỗi lần scrape
+        self.collect = collect
+        self.host = host
+        self.port = port
+        self.server = None
+        self.server_thread = None
+        self.is_running = False
+        self.scrapes = 0
+        self.scrape_errors = 0
+
+    def render(self):
+        """Thu thập và trả về text của /metrics"""
+        start_time = time.time()
+        writer = MetricsWriter()
+        try:
+            self.collect(writer)
+        except Exception as e:
+            self.scrape_errors += 1
+            system_logger.error(f"Metrics collect error: {e}")
+        self.scrapes += 1
+        writer.add("scrapes_total", self.scrapes, metric_type="counter", help_text="Metrics scrapes served")
+        writer.add("scrape_errors_total", self.scrape_errors, metric_type="counter", help_text="Metrics collect errors")
+        writer.add("scrape_duration_seconds", time.time() - start_time, help_text="Time spent collecting metrics")
+        return writer.render()
+
+    def start(self):
+        """Chạy HTTP server trên thread riêng"""
+        try:
+            self.server = ThreadingHTTPServer((self.host, self.port), _make_handler(self))
+            self.server.daemon_threads = True
+            self.server_thread = threading.Thread(target=self.server.serve_forever, name="metrics-exporter")
+            self.server_thread.daemon = True
+            self.server_thread.start()
+            self.is_running = True
+            system_logger.info(f"Metrics exporter listening on http://{self.host}:{self.port}/metrics")
+            return True
+        except Exception as e:
+            system_logger.error(f"Metrics exporter start failed: {e}")
+            return False
+
+    def stop(self):
+        """Dừng HTTP server"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        self.server.shutdown()
+        self.server.server_close()
+        self.server_thread.join()
+        system_logger.info("Metrics exporter stopped")
+
+def _make_handler(exporter):
+    """Handler HTTP trả /metrics của exporter"""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = exporter.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Không log mỗi lần scrape
+            pass
+
+    return MetricsHandler
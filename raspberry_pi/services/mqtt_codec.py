@@ -0,0 +1,98 @@
+"""
+MQTT image codec - payload nhị phân cho MQTT_TOPIC_IMAGE
+Chỉ phụ thuộc struct + numpy để server có thể copy file này để decode
+
+Format (little-endian):
+    header   38 bytes: magic "YRPI", version u8, flags u8, num_detections u16,
+                       timestamp f64, frame_id i64, width u16, height u16, scale f32,
+                       roi_x u16, roi_y u16, part_index u8, part_count u8
+    detections num_detections x 22 bytes: x1, y1, x2, y2 f32, conf f32, cls u16
+    jpeg     phần còn lại của payload
+
+Ảnh có thể là crop/thumbnail của frame: điểm (u, v) trong ảnh tương ứng với
+(roi_x + u / scale, roi_y + v / scale) trong frame gốc; bbox luôn theo toạ độ frame gốc.
+Một frame có thể gửi thành nhiều part (mỗi crop một message cùng frame_id).
+Version 1 (32 bytes, không có roi/part) vẫn decode được.
+"""
+
+import struct
+import numpy as np
+
+MAGIC = b"YRPI"
+VERSION = 2
+CONTENT_TYPE = "application/x-yrpi-image"
+
+HEADER_STRUCT = struct.Struct("<4sBBHdqHHfHHBB")
+HEADER_STRUCT_V1 = struct.Struct("<4sBBHdqHHf")
+PACKED_DETECTION_DTYPE = np.dtype([
+    ("xyxy", "<f4", (4,)),
+    ("conf", "<f4"),
+    ("cls", "<u2"),
+])
+
+def pack_detections(dets):
+    """Structured array detection -> bytes (bỏ các field không cần gửi)"""
+    packed = np.empty(len(dets), dtype=PACKED_DETECTION_DTYPE)
+    packed["xyxy"] = dets["xyxy"]
+    packed["conf"] = dets["conf"]
+    packed["cls"] = dets["cls"]
+    return packed.tobytes()
+
+def encode_image_message(jpeg_bytes, dets, timestamp, frame_id=-1, width=0, height=0, scale=1.0,
+                         roi_x=0, roi_y=0, part_index=0, part_count=1):
+    """Ghép header + detections + JPEG thành một payload"""
+    header = HEADER_STRUCT.pack(MAGIC, VERSION, 0, len(dets), timestamp, frame_id, width, height, scale,
+                                roi_x, roi_y, part_index, part_count)
+    return b"".join((header, pack_detections(dets), jpeg_bytes))
+
+def decode_image_message(payload):
+    """Decode payload nhị phân (dùng phía server)
+
+    Trả về dict: timestamp, frame_id, width, height, scale, roi_x, roi_y,
+    part_index, part_count, detections (structured array xyxy/conf/cls) và jpeg (bytes).
+    """
+    payload = memoryview(payload)
+    if len(payload) < HEADER_STRUCT_V1.size:
+        raise ValueError("Payload too short")
+
+    magic, version = bytes(payload[:4]), payload[4]
+    if magic != MAGIC:
+        raise ValueError(f"Invalid magic: {magic!r}")
+    if version == 1:
+        header_struct = HEADER_STRUCT_V1
+        roi_x, roi_y, part_index, part_count = 0, 0, 0, 1
+    elif version == VERSION:
+        header_struct = HEADER_STRUCT
+        if len(payload) < header_struct.size:
+            raise ValueError("Payload too short")
+        roi_x, roi_y, part_index, part_count = header_struct.unpack_from(payload)[9:]
+    else:
+        raise ValueError(f"Unsupported version: {version}")
+
+    _, _, flags, num_dets, timestamp, frame_id, width, height, scale = \
+        header_struct.unpack_from(payload)[:9]
+
+    offset = header_struct.size
+    dets_size = num_dets * PACKED_DETECTION_DTYPE.itemsize
+    if len(payload) < offset + dets_size:
+        raise ValueError("Payload truncated")
+    detections = np.frombuffer(payload, dtype=PACKED_DETECTION_DTYPE, count=num_dets, offset=offset)
+
+    return {
+        "timestamp": timestamp,
+        "frame_id": frame_id,
+        "width": width,
+        "height": height,
+        "scale": scale,
+        "roi_x": roi_x,
+        "roi_y": roi_y,
+        "part_index": part_index,
+        "part_count": part_count,
+        "flags": flags,
+        "detections": detections,
+        "jpeg": bytes(payload[offset + dets_size:])
+    }
+
+def is_binary_image_message(payload):
+    """Phân biệt payload nhị phân với payload JSON cũ"""
+    return bytes(payload[:len(MAGIC)]) == MAGIC
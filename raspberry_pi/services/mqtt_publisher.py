@@ -0,0 +1,176 @@
+"""
+Async MQTT Publisher
+Queue + worker riêng: gom detection theo cửa sổ thời gian, drop/downsample ảnh khi backpressure
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from configs.settings import (MQTT_TOPIC_DATA, MQTT_QUEUE_SIZE, MQTT_BATCH_WINDOW,
+                              MQTT_MAX_BATCH, MQTT_IMAGE_QUEUE_SIZE, MQTT_IMAGE_DOWNSCALE)
+from utils.logger import system_logger
+
+class AsyncMQTTPublisher:
+    def __init__(self, mqtt_service, queue_size=MQTT_QUEUE_SIZE, batch_window=MQTT_BATCH_WINDOW,
+                 max_batch=MQTT_MAX_BATCH, image_queue_size=MQTT_IMAGE_QUEUE_SIZE,
+                 image_downscale=MQTT_IMAGE_DOWNSCALE):
+        # mqtt_service chỉ cần publish(topic, payload) và is_connected (có thể là broker stand-in)
+        self.mqtt_service = mqtt_service
+        self.batch_window = batch_window
+        self.max_batch = max(1, max_batch)
+        self.image_downscale = image_downscale
+
+        self.detection_queue = deque()
+        self.image_queue = deque()
+        self.queue_size = max(1, queue_size)
+        self.image_queue_size = max(1, image_queue_size)
+        self.cond = threading.Condition()
+        self.is_running = False
+        self.worker_thread = None
+
+        # Thống kê
+        self.published_batches = 0
+        self.published_images = 0
+        self.dropped_detections = 0
+        self.dropped_images = 0
+        self.downsampled_images = 0
+        self.publish_errors = 0
+
+    def start(self):
+        """Bắt đầu worker publish"""
+        self.is_running = True
+        self.worker_thread = threading.Thread(target=self._worker_loop, name="mqtt-publisher")
+        self.worker_thread.daemon = True
+        self.worker_thread.start()
+        system_logger.info("MQTT async publisher started")
+
+    def stop(self, flush=True):
+        """Dừng worker (publish nốt detection còn trong queue)"""
+        with self.cond:
+            self.is_running = False
+            self.cond.notify_all()
+        if self.worker_thread:
+            self.worker_thread.join()
+        if flush:
+            self._flush_detections(force=True)
+        system_logger.info("MQTT async publisher stopped")
+
+    def publish_detections(self, detections, events=None):
+        """Đưa detection (và events) vào queue, không bao giờ chặn thread detection"""
+        with self.cond:
+            if len(self.detection_queue) >= self.queue_size:
+                self.detection_queue.popleft()
+                self.dropped_detections += 1
+            self.detection_queue.append((time.time(), detections, events))
+            self.cond.notify_all()
+
+    def publish_image(self, frame, detections, frame_id=-1):
+        """Đưa ảnh vào queue, drop ảnh cũ nhất nếu queue đầy
+        
+        Crop/thumbnail được lấy ngay trên thread gọi (rẻ, và frame có thể là view của
+        ring buffer), JPEG encode chạy trên worker.
+        """
+        regions = self.mqtt_service.image_encoder.prepare(frame, detections)
+        with self.cond:
+            if len(self.image_queue) >= self.image_queue_size:
+                self.image_queue.popleft()
+                self.dropped_images += 1
+            self.image_queue.append((time.time(), regions, detections, frame_id))
+            self.cond.notify_all()
+
+    def _worker_loop(self):
+        """Loop publish: flush batch detection khi hết cửa sổ, encode ảnh khi có"""
+        while True:
+            with self.cond:
+                self.cond.wait_for(self._has_work, timeout=self._next_timeout())
+                if not self.is_running:
+                    break
+                image_item = self.image_queue.popleft() if self.image_queue else None
+                # Ảnh còn chờ phía sau -> đang bị backpressure
+                backlog = len(self.image_queue)
+
+            self._flush_detections()
+            if image_item is not None:
+                self._send_image(image_item, backlog)
+
+    def _has_work(self):
+        """Có việc cần làm ngay không"""
+        if not self.is_running or self.image_queue:
+            return True
+        if not self.detection_queue:
+            return False
+        return (len(self.detection_queue) >= self.max_batch or
+                time.time() - self.detection_queue[0][0] >= self.batch_window)
+
+    def _next_timeout(self):
+        """Thời gian chờ tới khi cửa sổ batch hiện tại kết thúc"""
+        if not self.detection_queue:
+            return 0.1
+        return max(0.0, self.batch_window - (time.time() - self.detection_queue[0][0]))
+
+    def _flush_detections(self, force=False):
+        """Gom các detection trong cửa sổ thành một message"""
+        with self.cond:
+            if not self.detection_queue:
+                return
+            window_done = time.time() - self.detection_queue[0][0] >= self.batch_window
+            if not (force or window_done or len(self.detection_queue) >= self.max_batch):
+                return
+            count = min(len(self.detection_queue), self.max_batch)
+            batch = [self.detection_queue.popleft() for _ in range(count)]
+
+        try:
+            timestamp, latest, _ = batch[-1]
+            data = {
+                "timestamp": timestamp,
+                "detections": latest.to_dicts(),
+                "device": "raspberry_pi_5",
+                "batch": [{"timestamp": t, "detections": dets.to_dicts()} for t, dets, _ in batch]
+            }
+            events = [event.to_dict() for _, _, batch_events in batch for event in batch_events or ()]
+            if events:
+                data["events"] = events
+            message = json.dumps(data)
+        except Exception as e:
+            self.publish_errors += 1
+            system_logger.error(f"MQTT batch encode error: {e}")
+            return
+
+        if self.mqtt_service.publish(MQTT_TOPIC_DATA, message):
+            self.published_batches += 1
+        else:
+            self.publish_errors += 1
+
+    def _send_image(self, image_item, backlog):
+        """Encode và publish ảnh, giảm độ phân giải khi queue đang dồn"""
+        timestamp, regions, detections, frame_id = image_item
+        try:
+            if backlog > 0 and self.image_downscale < 1:
+                for region in regions:
+                    region.downscale(self.image_downscale)
+                self.downsampled_images += 1
+        except Exception as e:
+            self.publish_errors += 1
+            system_logger.error(f"MQTT image encode error: {e}")
+            return
+
+        # send_regions encode JPEG (quality thích ứng) và publish từng region
+        if self.mqtt_service.send_regions(regions, detections, frame_id, timestamp):
+            self.published_images += 1
+        else:
+            self.publish_errors += 1
+
+    def get_stats(self):
+        """Queue depth và số message bị drop"""
+        return {
+            "detection_queue_depth": len(self.detection_queue),
+            "image_queue_depth": len(self.image_queue),
+            "published_batches": self.published_batches,
+            "published_images": self.published_images,
+            "dropped_detections": self.dropped_detections,
+            "dropped_images": self.dropped_images,
+            "downsampled_images": self.downsampled_images,
+            "publish_errors": self.publish_errors,
+            "encoder": self.mqtt_service.image_encoder.get_stats()
+        }
@@ -2,28 +2,97 @@
 MQTT Service cho server communication
 """
 
-import paho.mqtt.client as mqtt
 import json
 import base64
 import cv2
 import threading
 import time
-from configs.settings import MQTT_BROKER, MQTT_PORT, MQTT_TOPIC_IMAGE, MQTT_TOPIC_DATA, MQTT_CLIENT_ID
+from configs.settings import (MQTT_BROKER, MQTT_PORT, MQTT_TOPIC_IMAGE, MQTT_TOPIC_DATA, MQTT_CLIENT_ID,
+                              MQTT_PROTOCOL, MQTT_IMAGE_FORMAT)
+from services.mqtt_codec import encode_image_message, CONTENT_TYPE
+from services.image_encoder import ImageEncoder, ImageRegion
 from utils.logger import system_logger
+from utils.startup import startup_profile
+
+# paho.mqtt.client.MQTT_ERR_SUCCESS (paho chỉ import khi tạo client)
+MQTT_ERR_SUCCESS = 0
+
+def build_detection_message(detections, timestamp=None, events=None):
+    """Tạo payload JSON cho topic detection data (kèm events nếu có)"""
+    data = {
+        "timestamp": timestamp or time.time(),
+        "detections": detections.to_dicts(),
+        "device": "raspberry_pi_5"
+    }
+    if events is not None:
+        data["events"] = [event.to_dict() for event in events]
+    return json.dumps(data)
+
+def build_image_message(jpeg_bytes, region, detections, timestamp=None, frame_id=-1,
+                        image_format=MQTT_IMAGE_FORMAT):
+    """Tạo payload cho topic image từ JPEG đã encode của region
+    
+    image_format "binary": header + detections packed + JPEG (xem services/mqtt_codec.py),
+    "json": format cũ, JPEG base64 trong JSON.
+    region là crop/thumbnail thì kèm vị trí + scale (bbox vẫn theo toạ độ frame gốc).
+    """
+    timestamp = timestamp or time.time()
+    height, width = region.image.shape[:2]
+    
+    if image_format == "binary":
+        return encode_image_message(jpeg_bytes, detections.data, timestamp, frame_id, width, height,
+                                    region.scale, region.x, region.y, region.index, region.count)
+    
+    image_base64 = base64.b64encode(jpeg_bytes).decode('utf-8')
+    data = {
+        "timestamp": timestamp,
+        "image": image_base64,
+        "detections": detections.to_dicts(),
+        "device": "raspberry_pi_5"
+    }
+    if region.scale != 1.0:
+        data["image_scale"] = region.scale
+    if region.count > 1 or region.x or region.y:
+        data["roi"] = [region.x, region.y, width, height]
+        data["part"] = [region.index, region.count]
+    return json.dumps(data)
+
+def image_user_properties(timestamp, frame_id, num_detections, region):
+    """User properties MQTT v5 đi kèm payload ảnh nhị phân"""
+    return [
+        ("format", "yrpi"),
+        ("timestamp", f"{timestamp:.6f}"),
+        ("frame_id", str(frame_id)),
+        ("detections", str(num_detections)),
+        ("part", f"{region.index}/{region.count}"),
+        ("device", "raspberry_pi_5")
+    ]
 
 class MQTTService:
-    def __init__(self):
-        self.client = mqtt.Client(MQTT_CLIENT_ID)
+    def __init__(self, client=None, image_encoder=None):
+        # client có thể thay bằng broker stand-in khi test
+        self.use_v5 = MQTT_PROTOCOL == "5"
+        if client is None:
+            mqtt = startup_profile.timed_import("paho.mqtt.client")
+            protocol = mqtt.MQTTv5 if self.use_v5 else mqtt.MQTTv311
+            client = mqtt.Client(MQTT_CLIENT_ID, protocol=protocol)
+        self.client = client
+        self.image_encoder = image_encoder or ImageEncoder()
         self.is_connected = False
         self.lock = threading.Lock()
         
+        # Thống kê publish (đọc bởi metrics exporter)
+        self.published_messages = 0
+        self.published_bytes = 0
+        self.publish_errors = 0
+        
         # Setup callbacks
         self.client.on_connect = self.on_connect
         self.client.on_disconnect = self.on_disconnect
         self.client.on_publish = self.on_publish
         self.client.on_message = self.on_message
         
-    def on_connect(self, client, userdata, flags, rc):
+    def on_connect(self, client, userdata, flags, rc, properties=None):
         """Callback khi kết nối MQTT"""
         if rc == 0:
             self.is_connected = True
@@ -31,7 +100,7 @@ class MQTTService:
         else:
             system_logger.error(f"MQTT connection failed with code {rc}")
     
-    def on_disconnect(self, client, userdata, rc):
+    def on_disconnect(self, client, userdata, rc, properties=None):
         """Callback khi ngắt kết nối MQTT"""
         self.is_connected = False
         system_logger.info("MQTT disconnected")
@@ -72,50 +141,83 @@ class MQTTService:
             self.client.disconnect()
             system_logger.info("MQTT disconnected")
     
-    def send_detection_data(self, detections):
-        """Gửi dữ liệu detection đến server"""
+    def publish(self, topic, message, user_properties=None, content_type=None):
+        """Publish payload đã encode sẵn (user properties chỉ gửi khi dùng MQTT v5)"""
         if not self.is_connected:
             return False
         
         try:
+            properties = None
+            if self.use_v5 and (user_properties or content_type):
+                from paho.mqtt.packettypes import PacketTypes
+                from paho.mqtt.properties import Properties
+                properties = Properties(PacketTypes.PUBLISH)
+                if content_type:
+                    properties.ContentType = content_type
+                if user_properties:
+                    properties.UserProperty = user_properties
+            
             with self.lock:
-                data = {
-                    "timestamp": time.time(),
-                    "detections": detections,
-                    "device": "raspberry_pi_5"
-                }
-                
-                message = json.dumps(data)
-                result = self.client.publish(MQTT_TOPIC_DATA, message)
-                return result.rc == mqtt.MQTT_ERR_SUCCESS
+                result = self.client.publish(topic, message, properties=properties)
+                if result.rc != MQTT_ERR_SUCCESS:
+                    self.publish_errors += 1
+                    return False
+                self.published_messages += 1
+                # JSON/base64 là ASCII nên len(str) = số byte
+                self.published_bytes += len(message)
+                return True
+        except Exception as e:
+            self.publish_errors += 1
+            system_logger.error(f"MQTT publish error on {topic}: {e}")
+            return False
+    
+    def send_detection_data(self, detections, events=None):
+        """Gửi dữ liệu detection đến server"""
+        if not self.is_connected:
+            return False
+        
+        try:
+            message = build_detection_message(detections, events=events)
         except Exception as e:
             system_logger.error(f"MQTT send data error: {e}")
             return False
+        return self.publish(MQTT_TOPIC_DATA, message)
     
-    def send_image(self, frame, detections):
-        """Gửi ảnh detection đến server"""
+    def send_image(self, frame, detections, frame_id=-1, timestamp=None):
+        """Gửi ảnh detection đến server (full frame, crop hoặc thumbnail theo MQTT_IMAGE_MODE)"""
         if not self.is_connected:
             return False
         
         try:
-            with self.lock:
-                # Encode ảnh thành base64
-                _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
-                image_base64 = base64.b64encode(buffer).decode('utf-8')
-                
-                data = {
-                    "timestamp": time.time(),
-                    "image": image_base64,
-                    "detections": detections,
-                    "device": "raspberry_pi_5"
-                }
-                
-                message = json.dumps(data)
-                result = self.client.publish(MQTT_TOPIC_IMAGE, message)
-                return result.rc == mqtt.MQTT_ERR_SUCCESS
+            regions = self.image_encoder.prepare(frame, detections)
         except Exception as e:
             system_logger.error(f"MQTT send image error: {e}")
             return False
+        return self.send_regions(regions, detections, frame_id, timestamp)
+    
+    def send_regions(self, regions, detections, frame_id=-1, timestamp=None):
+        """Encode và publish từng region, mỗi region một message"""
+        if not self.is_connected:
+            return False
+        
+        timestamp = timestamp or time.time()
+        success = True
+        for region in regions:
+            try:
+                # Encode ngoài lock để không chặn các publish khác
+                jpeg_bytes = self.image_encoder.encode(region)
+                message = build_image_message(jpeg_bytes, region, detections, timestamp, frame_id)
+            except Exception as e:
+                system_logger.error(f"MQTT send image error: {e}")
+                return False
+            
+            if MQTT_IMAGE_FORMAT == "binary":
+                success &= self.publish(MQTT_TOPIC_IMAGE, message,
+                                        image_user_properties(timestamp, frame_id, len(detections), region),
+                                        CONTENT_TYPE)
+            else:
+                success &= self.publish(MQTT_TOPIC_IMAGE, message)
+        return success
     
     def send_custom_data(self, topic, data):
         """Gửi dữ liệu tùy chỉnh"""
@@ -123,13 +225,11 @@ class MQTTService:
             return False
         
         try:
-            with self.lock:
-                message = json.dumps(data)
-                result = self.client.publish(topic, message)
-                return result.rc == mqtt.MQTT_ERR_SUCCESS
+            message = json.dumps(data)
         except Exception as e:
             system_logger.error(f"MQTT send custom data error: {e}")
             return False
+        return self.publish(topic, message)
     
     def subscribe_topic(self, topic):
         """Subscribe topic"""
@@ -143,5 +243,8 @@ class MQTTService:
             "connected": self.is_connected,
             "broker": MQTT_BROKER,
             "port": MQTT_PORT,
-            "client_id": MQTT_CLIENT_ID
+            "client_id": MQTT_CLIENT_ID,
+            "published_messages": self.published_messages,
+            "published_bytes": self.published_bytes,
+            "publish_errors": self.publish_errors
         } 
\ No newline at end of file
@@ -2,11 +2,11 @@
 UART Service cho ESP32 communication
 """
 
-import serial
 import time
 import threading
 from configs.settings import UART_PORT, UART_BAUDRATE, UART_TIMEOUT, ESP32_COMMANDS
 from utils.logger import system_logger
+from utils.startup import startup_profile
 
 class UARTService:
     def __init__(self):
@@ -16,9 +16,18 @@ class UARTService:
         self.is_running = False
         self.response_thread = None
         
+        # Thống kê gửi/nhận (đọc bởi metrics exporter)
+        self.sent_commands = 0
+        self.sent_bytes = 0
+        self.send_errors = 0
+        self.received_messages = 0
+        self.read_errors = 0
+        
     def connect(self):
         """Kết nối UART với ESP32"""
         try:
+            # pyserial chỉ import khi thật sự kết nối (giảm thời gian khởi động)
+            serial = startup_profile.timed_import("serial")
             self.serial = serial.Serial(
                 port=UART_PORT,
                 baudrate=UART_BAUDRATE,
@@ -66,9 +75,11 @@ class UARTService:
                 if self.serial.in_waiting > 0:
                     response = self.serial.readline().decode().strip()
                     if response:
+                        self.received_messages += 1
                         system_logger.info(f"UART received: {response}")
                         self.handle_response(response)
             except Exception as e:
+                self.read_errors += 1
                 system_logger.error(f"UART read error: {e}")
                 time.sleep(0.1)
     
@@ -85,12 +96,15 @@ class UARTService:
         try:
             with self.lock:
                 # Thêm ký tự xuống dòng để ESP32 nhận biết
-                message = f"{command}\n"
-                self.serial.write(message.encode())
+                message = f"{command}\n".encode()
+                self.serial.write(message)
                 self.serial.flush()
+                self.sent_commands += 1
+                self.sent_bytes += len(message)
                 system_logger.info(f"UART sent: {command}")
                 return True
         except Exception as e:
+            self.send_errors += 1
             system_logger.error(f"UART send error: {e}")
             return False
     
@@ -110,5 +124,10 @@ class UARTService:
         return {
             "connected": self.is_connected,
             "port": UART_PORT,
-            "baudrate": UART_BAUDRATE
+            "baudrate": UART_BAUDRATE,
+            "sent_commands": self.sent_commands,
+            "sent_bytes": self.sent_bytes,
+            "send_errors": self.send_errors,
+            "received_messages": self.received_messages,
+            "read_errors": self.read_errors
         } 
\ No newline at end of file
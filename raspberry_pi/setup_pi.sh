@@ -16,7 +16,9 @@ sudo apt install -y libqtgui4 libqtwebkit4 libqt4-test python3-pyqt5
 
 # Tạo môi trường ảo
 echo "🔧 Tạo môi trường ảo..."
-python3 -m venv venv_pi
+# picamera2 cài qua apt, venv cần thấy system site-packages
+sudo apt install -y python3-picamera2
+python3 -m venv --system-site-packages venv_pi
 source venv_pi/bin/activate
 
 # Cập nhật pip
@@ -0,0 +1,123 @@
+"""
+Box utilities - chỉ cần NumPy (không torch)
+Chuyển đổi toạ độ, IoU, NMS (greedy, theo class, soft) và đưa box letterbox về frame gốc
+Mọi hàm nhận mảng (N, 4), xyxy = x1, y1, x2, y2 pixels
+"""
+
+import numpy as np
+
+def xyxy_to_xywh(xyxy):
+    """x1, y1, x2, y2 -> x1, y1, w, h"""
+    return np.concatenate([xyxy[:, :2], xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+
+def xywh_to_xyxy(xywh):
+    """x1, y1, w, h -> x1, y1, x2, y2"""
+    return np.concatenate([xywh[:, :2], xywh[:, :2] + xywh[:, 2:4]], axis=1)
+
+def xyxy_to_cxcywh(xyxy):
+    """x1, y1, x2, y2 -> cx, cy, w, h"""
+    return np.concatenate([(xyxy[:, :2] + xyxy[:, 2:]) / 2, xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+
+def cxcywh_to_xyxy(cxcywh):
+    """cx, cy, w, h -> x1, y1, x2, y2"""
+    half = cxcywh[:, 2:4] / 2
+    return np.concatenate([cxcywh[:, :2] - half, cxcywh[:, :2] + half], axis=1)
+
+def xyxy_to_yolo(xyxy, width, height):
+    """x1, y1, x2, y2 pixels -> cx, cy, w, h chuẩn hoá 0-1 (format nhãn YOLO)"""
+    return xyxy_to_cxcywh(xyxy) / (width, height, width, height)
+
+def yolo_to_xyxy(yolo, width, height):
+    """cx, cy, w, h chuẩn hoá 0-1 -> x1, y1, x2, y2 pixels"""
+    return cxcywh_to_xyxy(yolo * (width, height, width, height))
+
+def box_area(xyxy):
+    """Diện tích từng box"""
+    return np.prod(np.clip(xyxy[:, 2:] - xyxy[:, :2], 0, None), axis=1)
+
+def box_centers(xyxy):
+    """Tâm từng box: (N, 2)"""
+    return (xyxy[:, :2] + xyxy[:, 2:]) / 2
+
+def clip_boxes(xyxy, width, height):
+    """Giới hạn box trong frame (sửa trực tiếp trên mảng)"""
+    xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, width)
+    xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, height)
+    return xyxy
+
+def iou_matrix(boxes_a, boxes_b):
+    """IoU giữa từng cặp box xyxy: (N, 4) x (M, 4) -> (N, M)"""
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+def _overlap(box, boxes, area, areas, metric):
+    """Overlap của một box với các box khác: "iou" hoặc "ios" (intersection / box nhỏ hơn)"""
+    w = np.clip(np.minimum(box[2], boxes[:, 2]) - np.maximum(box[0], boxes[:, 0]), 0, None)
+    h = np.clip(np.minimum(box[3], boxes[:, 3]) - np.maximum(box[1], boxes[:, 1]), 0, None)
+    inter = w * h
+    if metric == "ios":
+        return inter / (np.minimum(area, areas) + 1e-7)
+    return inter / (area + areas - inter + 1e-7)
+
+def nms(boxes, scores, iou_threshold, metric="iou"):
+    """Greedy NMS vectorized, trả về index các box được giữ lại (score giảm dần)
+
+    metric "ios": intersection / diện tích box nhỏ hơn, bỏ được box bị cắt ở biên tile
+    nằm gọn trong box đầy đủ (IoU của hai box này thấp).
+    """
+    areas = box_area(boxes)
+    order = scores.argsort()[::-1]
+
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        overlap = _overlap(boxes[i], boxes[rest], areas[i], areas[rest], metric)
+        order = rest[overlap <= iou_threshold]
+
+    return np.array(keep, dtype=np.intp)
+
+def batched_nms(boxes, scores, classes, iou_threshold, metric="iou"):
+    """NMS riêng từng class trong một lần: dịch box mỗi class ra vùng không giao nhau"""
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.intp)
+    offsets = classes.astype(boxes.dtype) * (boxes.max() - boxes.min() + 1)
+    return nms(boxes + offsets[:, None], scores, iou_threshold, metric)
+
+def soft_nms(boxes, scores, iou_threshold=0.3, sigma=0.5, score_threshold=0.001, method="gaussian"):
+    """Soft-NMS: giảm score box chồng lấn thay vì bỏ hẳn, trả về (index, score mới) theo thứ tự chọn
+
+    method "gaussian": score *= exp(-iou^2 / sigma); "linear": score *= 1 - iou khi iou > iou_threshold
+    """
+    scores = scores.astype(np.float32, copy=True)
+    areas = box_area(boxes)
+    remaining = np.flatnonzero(scores > score_threshold)
+
+    keep = []
+    while remaining.size > 0:
+        top = remaining[scores[remaining].argmax()]
+        keep.append(top)
+        remaining = remaining[remaining != top]
+        if remaining.size == 0:
+            break
+        iou = _overlap(boxes[top], boxes[remaining], areas[top], areas[remaining], "iou")
+        if method == "linear":
+            decay = np.where(iou > iou_threshold, 1 - iou, 1)
+        else:
+            decay = np.exp(-(iou * iou) / sigma)
+        scores[remaining] *= decay
+        remaining = remaining[scores[remaining] > score_threshold]
+
+    keep = np.array(keep, dtype=np.intp)
+    return keep, scores[keep]
+
+def unletterbox(xyxy, meta):
+    """Đưa box trên ảnh letterbox về toạ độ frame gốc, meta = (scale, left, top, width, height)"""
+    scale, left, top, width, height = meta
+    xyxy = (xyxy - (left, top, left, top)) / scale
+    return clip_boxes(xyxy, width, height)
@@ -1,25 +1,144 @@
 """
 Performance monitoring utility
+Latency từng stage lưu trong ring buffer NumPy cấp phát sẵn (ghi O(1), không cấp phát),
+FPS và percentile tính trên cửa sổ các mẫu gần nhất, histogram log-linear kiểu HDR
 """
 
+import math
 import time
-import psutil
 import threading
+import numpy as np
+from configs.settings import (PERF_WINDOW_SIZE, PERF_HISTOGRAM_SUB_BUCKETS, PERF_HISTOGRAM_MIN_MS,
+                              PERF_HISTOGRAM_MAX_MS, PERF_LOG_INTERVAL)
 from utils.logger import system_logger
+from utils.startup import startup_profile
+
+# Các stage của pipeline (chế độ tuần tự cũng ghi theo cùng tên)
+STAGES = ("capture", "preprocess", "infer", "postprocess", "publish")
+PERCENTILES = (50, 90, 99)
+
+class LatencyWindow:
+    """Ring buffer latency (ms) của N mẫu gần nhất + histogram tích luỹ từ đầu
+    
+    Mỗi window chỉ có một thread ghi (stage của nó), thread khác đọc thống kê
+    không cần lock (có thể lệch một mẫu).
+    """
+    def __init__(self, size=PERF_WINDOW_SIZE, sub_buckets=PERF_HISTOGRAM_SUB_BUCKETS,
+                 min_value=PERF_HISTOGRAM_MIN_MS, max_value=PERF_HISTOGRAM_MAX_MS):
+        self.size = max(1, size)
+        self.values = np.zeros(self.size, dtype=np.float64)
+        self.index = 0
+        self.count = 0  # số mẫu đang trong cửa sổ (<= size)
+        self.total = 0  # tổng số mẫu từ đầu
+        self.window_sum = 0.0
+        self.sum = 0.0
+        self.max_value = 0.0
+        
+        # Bucket thứ (k - min_exponent) * sub_buckets + j: [2^(k-1) * (1 + j/sub), 2^(k-1) * (1 + (j+1)/sub))
+        self.sub_buckets = sub_buckets
+        self.min_value = min_value
+        self.min_exponent = math.frexp(min_value)[1]
+        max_exponent = math.frexp(max_value)[1]
+        num_buckets = (max_exponent - self.min_exponent + 1) * sub_buckets
+        self.counts = np.zeros(num_buckets, dtype=np.int64)
+        exponents = np.arange(num_buckets) // sub_buckets + self.min_exponent
+        steps = np.arange(num_buckets) % sub_buckets + 1
+        self.bucket_upper = np.ldexp(0.5 * (1 + steps / sub_buckets), exponents)
+    
+    def _bucket(self, value):
+        """Index bucket của value (frexp: value = m * 2^e, m trong [0.5, 1))"""
+        if value < self.min_value:
+            return 0
+        mantissa, exponent = math.frexp(value)
+        index = (exponent - self.min_exponent) * self.sub_buckets + int((2 * mantissa - 1) * self.sub_buckets)
+        return min(index, len(self.counts) - 1)
+    
+    def record(self, value):
+        """Thêm một mẫu (ms): ghi đè mẫu cũ nhất, cộng vào histogram"""
+        index = self.index
+        if self.count == self.size:
+            self.window_sum -= self.values[index]
+        else:
+            self.count += 1
+        self.values[index] = value
+        self.window_sum += value
+        self.index = index + 1 if index + 1 < self.size else 0
+        
+        self.total += 1
+        self.sum += value
+        if value > self.max_value:
+            self.max_value = value
+        self.counts[self._bucket(value)] += 1
+    
+    def mean(self):
+        """Trung bình trên cửa sổ"""
+        return self.window_sum / self.count if self.count else 0
+    
+    def percentiles(self, percentiles=PERCENTILES):
+        """Percentile chính xác trên cửa sổ (chỉ gọi khi lấy thống kê, không phải mỗi frame)"""
+        if not self.count:
+            return [0.0] * len(percentiles)
+        return np.percentile(self.values[:self.count], percentiles).tolist()
+    
+    def histogram_percentiles(self, percentiles=PERCENTILES):
+        """Percentile từ histogram (toàn bộ mẫu từ đầu), sai số tương đối <= 1/sub_buckets"""
+        if not self.total:
+            return [0.0] * len(percentiles)
+        cumulative = np.cumsum(self.counts)
+        ranks = np.ceil(np.asarray(percentiles) / 100 * self.total)
+        indices = np.searchsorted(cumulative, np.maximum(ranks, 1))
+        return np.minimum(self.bucket_upper[indices], self.max_value).tolist()
+    
+    def histogram(self):
+        """Các bucket khác 0: [(upper bound ms, số mẫu)]"""
+        nonzero = np.flatnonzero(self.counts)
+        return list(zip(self.bucket_upper[nonzero].tolist(), self.counts[nonzero].tolist()))
+    
+    def cumulative_counts(self, bounds):
+        """Số mẫu <= từng bound (ms) theo histogram (bucket vắt qua bound được tính vào bound sau)"""
+        cumulative = np.cumsum(self.counts)
+        indices = np.searchsorted(self.bucket_upper, bounds, side="right") - 1
+        return np.where(indices >= 0, cumulative[np.maximum(indices, 0)], 0).tolist()
+    
+    def get_stats(self):
+        """Thống kê cửa sổ + tổng từ đầu"""
+        p50, p90, p99 = self.percentiles()
+        return {
+            "count": self.total,
+            "window": self.count,
+            "mean_ms": self.mean(),
+            "p50_ms": p50,
+            "p90_ms": p90,
+            "p99_ms": p99,
+            "max_ms": self.max_value,
+        }
 
 class PerformanceMonitor:
-    def __init__(self):
+    def __init__(self, window_size=PERF_WINDOW_SIZE):
         self.fps = 0
         self.frame_count = 0
         self.start_time = time.time()
-        self.inference_times = []
+        self.last_frame_time = None
+        self.window_size = window_size
+        # Khoảng cách giữa hai frame (ms): FPS cửa sổ = số mẫu / tổng khoảng cách
+        self.frame_intervals = LatencyWindow(window_size)
+        self.inference_times = LatencyWindow(window_size)
+        self.stages = {name: LatencyWindow(window_size) for name in STAGES}
+        self.gate_checks = 0
+        self.gate_passed = 0
+        self.gate_time = 0  # ms, tổng thời gian chạy motion gate
+        self.warmup_time = 0  # ms, warmup model trước khi ready (không tính vào FPS/inference time)
         self.cpu_usage = 0
         self.memory_usage = 0
         self.is_monitoring = False
         self.monitor_thread = None
     
     def start_monitoring(self):
-        """Bắt đầu monitoring"""
+        """Bắt đầu monitoring (sau khi model đã load + warmup)"""
+        # FPS tính từ lúc hệ thống ready, không tính thời gian load model/warmup
+        self.start_time = time.time()
+        self.frame_count = 0
+        self.last_frame_time = None
         self.is_monitoring = True
         self.monitor_thread = threading.Thread(target=self._monitor_loop)
         self.monitor_thread.daemon = True
@@ -35,50 +154,130 @@ class PerformanceMonitor:
     
     def _monitor_loop(self):
         """Loop monitoring performance"""
+        # psutil import trên thread monitor, không nằm trên đường khởi động
+        try:
+            psutil = startup_profile.timed_import("psutil")
+        except ImportError as e:
+            system_logger.warning(f"psutil not available, CPU/memory monitoring disabled: {e}")
+            psutil = None
+        last_log_time = time.time()
         while self.is_monitoring:
             try:
-                # CPU usage
-                self.cpu_usage = psutil.cpu_percent(interval=1)
+                if psutil:
+                    # CPU usage
+                    self.cpu_usage = psutil.cpu_percent(interval=1)
+                    
+                    # Memory usage
+                    memory = psutil.virtual_memory()
+                    self.memory_usage = memory.percent
+                else:
+                    time.sleep(1)
                 
-                # Memory usage
-                memory = psutil.virtual_memory()
-                self.memory_usage = memory.percent
-                
-                # Log performance mỗi 10 giây
-                if int(time.time()) % 10 == 0:
-                    system_logger.info(f"Performance - CPU: {self.cpu_usage}%, Memory: {self.memory_usage}%, FPS: {self.fps:.1f}")
+                # Log performance mỗi PERF_LOG_INTERVAL giây (cpu_percent chặn 1s nên không so giây chẵn)
+                if time.time() - last_log_time >= PERF_LOG_INTERVAL:
+                    last_log_time = time.time()
+                    message = f"Performance - CPU: {self.cpu_usage}%, Memory: {self.memory_usage}%, FPS: {self.fps:.1f}"
+                    if self.gate_checks:
+                        gate = self.get_gate_stats()
+                        message += (f", Gate hit rate: {gate['gate_hit_rate'] * 100:.1f}%, "
+                                    f"saved: {gate['gate_saved_cpu_ms'] / 1000:.1f}s CPU, "
+                                    f"gate cost: {gate['gate_cost_ms'] / 1000:.1f}s CPU")
+                    system_logger.info(message)
+                    system_logger.info(f"Latency - {self.format_latency_stats()}")
                 
                 time.sleep(1)
             except Exception as e:
                 system_logger.error(f"Performance monitoring error: {e}")
     
     def update_fps(self):
-        """Cập nhật FPS"""
+        """Cập nhật FPS trên cửa sổ window_size frame gần nhất"""
+        now = time.time()
         self.frame_count += 1
+        if self.last_frame_time is not None:
+            self.frame_intervals.record((now - self.last_frame_time) * 1000)
+        self.last_frame_time = now
+        if self.frame_intervals.window_sum > 0:
+            self.fps = self.frame_intervals.count * 1000 / self.frame_intervals.window_sum
+    
+    def get_avg_fps(self):
+        """FPS trung bình từ lúc ready (che mất các đợt chậm, chỉ để so sánh)"""
         elapsed_time = time.time() - self.start_time
-        if elapsed_time > 0:
-            self.fps = self.frame_count / elapsed_time
+        return self.frame_count / elapsed_time if elapsed_time > 0 else 0
     
     def add_inference_time(self, inference_time):
-        """Thêm thời gian inference"""
-        self.inference_times.append(inference_time)
+        """Thêm thời gian inference (ms)"""
+        self.inference_times.record(inference_time)
+    
+    def record_stage(self, stage, latency):
+        """Ghi latency (ms) của một stage, mỗi stage chỉ được ghi từ một thread"""
+        window = self.stages.get(stage)
+        if window is None:
+            # Stage ngoài STAGES (submit/collect của inference pool): tạo một lần
+            window = self.stages[stage] = LatencyWindow(self.window_size)
+        window.record(latency)
+    
+    def add_gate_result(self, passed, gate_time):
+        """Ghi kết quả motion gate của một frame (gate_time tính bằng ms)"""
+        self.gate_checks += 1
+        self.gate_passed += int(passed)
+        self.gate_time += gate_time
+    
+    def set_warmup_time(self, warmup_time):
+        """Ghi thời gian warmup (ms), báo cáo riêng với thống kê steady-state"""
+        self.warmup_time = warmup_time
+    
+    def get_gate_stats(self):
+        """Tỉ lệ frame qua gate, CPU inference ước tính tiết kiệm được và CPU chạy gate (ms)
         
-        # Giữ chỉ 100 giá trị gần nhất
-        if len(self.inference_times) > 100:
-            self.inference_times.pop(0)
+        Hai con số để riêng: chi phí gate tính trên mọi frame còn phần tiết kiệm chỉ có ở frame
+        bị chặn, trừ nhau sẽ âm khi cảnh luôn có chuyển động.
+        """
+        skipped = self.gate_checks - self.gate_passed
+        return {
+            "gate_hit_rate": self.gate_passed / self.gate_checks if self.gate_checks else 1.0,
+            "gate_skipped_frames": skipped,
+            "gate_saved_cpu_ms": skipped * self.get_avg_inference_time(),
+            "gate_cost_ms": self.gate_time
+        }
     
     def get_avg_inference_time(self):
-        """Lấy thời gian inference trung bình"""
-        if self.inference_times:
-            return sum(self.inference_times) / len(self.inference_times)
-        return 0
+        """Thời gian inference trung bình trên cửa sổ"""
+        return self.inference_times.mean()
     
     def get_performance_stats(self):
-        """Lấy thống kê hiệu suất"""
-        return {
+        """Lấy thống kê hiệu suất (rẻ, gọi được mỗi frame)"""
+        stats = {
             "fps": self.fps,
+            "avg_fps": self.get_avg_fps(),
             "avg_inference_time": self.get_avg_inference_time(),
             "cpu_usage": self.cpu_usage,
             "memory_usage": self.memory_usage,
-            "frame_count": self.frame_count
-        } 
\ No newline at end of file
+            "frame_count": self.frame_count,
+            "warmup_time": self.warmup_time
+        }
+        stats.update(self.get_gate_stats())
+        return stats
+    
+    def get_latency_stats(self):
+        """Percentile trên cửa sổ của frame interval, inference và từng stage có dữ liệu"""
+        stats = {"frame_interval": self.frame_intervals.get_stats(),
+                 "inference": self.inference_times.get_stats()}
+        for name, window in list(self.stages.items()):
+            if window.total:
+                stats[name] = window.get_stats()
+        return stats
+    
+    def get_histograms(self):
+        """Histogram tích luỹ của inference và từng stage: {tên: [(upper bound ms, số mẫu)]}"""
+        histograms = {"inference": self.inference_times.histogram()}
+        for name, window in list(self.stages.items()):
+            if window.total:
+                histograms[name] = window.histogram()
+        return histograms
+    
+    def format_latency_stats(self):
+        """Một dòng log: p50/p90/p99 của từng stage"""
+        return " | ".join(
+            f"{name}: p50 {s['p50_ms']:.1f} p90 {s['p90_ms']:.1f} p99 {s['p99_ms']:.1f}ms"
+            for name, s in self.get_latency_stats().items() if s["window"]
+        ) 
\ No newline at end of file
@@ -0,0 +1,128 @@
+"""
+Post-processing dùng chung cho kết quả detection
+Gom toàn bộ box vào một structured array NumPy, chỉ tạo dict khi cần JSON
+"""
+
+import numpy as np
+from utils.boxes import box_centers
+
+DETECTION_DTYPE = np.dtype([
+    ("xyxy", np.float32, (4,)),
+    ("conf", np.float32),
+    ("cls", np.int32),
+    ("center", np.float32, (2,)),
+])
+
+# Kết quả của tracker: thêm track id và vận tốc tâm bbox (pixels/s)
+TRACK_DTYPE = np.dtype(DETECTION_DTYPE.descr + [
+    ("track_id", np.int32),
+    ("velocity", np.float32, (2,)),
+])
+
+def empty_detections():
+    """Structured array rỗng"""
+    return np.empty(0, dtype=DETECTION_DTYPE)
+
+def from_arrays(xyxy, conf, cls):
+    """Tạo structured array từ xyxy (N, 4), conf (N,) và cls (N,)"""
+    xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+    dets = np.empty(len(xyxy), dtype=DETECTION_DTYPE)
+    dets["xyxy"] = xyxy
+    dets["conf"] = conf
+    dets["cls"] = cls
+    dets["center"] = box_centers(xyxy)
+    return dets
+
+def from_boxes(boxes):
+    """Chuyển cả Boxes của Ultralytics sang structured array với một lần .cpu().numpy()"""
+    if boxes is None or len(boxes) == 0:
+        return empty_detections()
+
+    # data: (N, 6) = x1, y1, x2, y2, conf, cls (khi tracking có thêm cột id trước conf)
+    data = boxes.data.cpu().numpy()
+    return from_arrays(data[:, :4], data[:, -2], data[:, -1])
+
+def from_results(results):
+    """Gộp Boxes của list Results thành một structured array"""
+    arrays = [from_boxes(result.boxes) for result in results]
+    if not arrays:
+        return empty_detections()
+    if len(arrays) == 1:
+        return arrays[0]
+    return np.concatenate(arrays)
+
+def to_dicts(dets, class_names=None):
+    """Chuyển structured array thành list dict (dùng cho JSON/MQTT)"""
+    class_names = class_names or {}
+    bboxes = dets["xyxy"].astype(np.int32).tolist()
+    centers = dets["center"].astype(np.int32).tolist()
+    confs = dets["conf"].tolist()
+    class_ids = dets["cls"].tolist()
+
+    dicts = [
+        {
+            "class": class_names.get(cls, f"class_{cls}"),
+            "class_id": cls,
+            "confidence": conf,
+            "bbox": bbox,
+            "center": center
+        }
+        for bbox, conf, cls, center in zip(bboxes, confs, class_ids, centers)
+    ]
+    if "track_id" in dets.dtype.names:
+        for item, track_id, velocity in zip(dicts, dets["track_id"].tolist(),
+                                            dets["velocity"].round(1).tolist()):
+            item["track_id"] = track_id
+            item["velocity"] = velocity
+    return dicts
+
+class Detections:
+    """Kết quả detection của một frame, list dict chỉ được tạo lazy khi cần"""
+    __slots__ = ("data", "class_names", "_dicts")
+
+    def __init__(self, data=None, class_names=None):
+        self.data = empty_detections() if data is None else data
+        self.class_names = class_names or {}
+        self._dicts = None
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.to_dicts())
+
+    def __getitem__(self, index):
+        return self.to_dicts()[index]
+
+    @property
+    def xyxy(self):
+        return self.data["xyxy"]
+
+    @property
+    def conf(self):
+        return self.data["conf"]
+
+    @property
+    def cls(self):
+        return self.data["cls"]
+
+    @property
+    def center(self):
+        return self.data["center"]
+
+    @property
+    def track_ids(self):
+        """Track id của từng detection (None nếu chưa qua tracker)"""
+        if "track_id" not in self.data.dtype.names:
+            return None
+        return self.data["track_id"]
+
+    def names(self):
+        """Tên class của từng detection"""
+        return [self.class_names.get(cls, f"class_{cls}") for cls in self.data["cls"].tolist()]
+
+    def to_dicts(self):
+        """List dict (cache lại sau lần gọi đầu tiên)"""
+        if self._dicts is None:
+            self._dicts = to_dicts(self.data, self.class_names)
+        return self._dicts
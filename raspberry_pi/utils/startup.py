@@ -0,0 +1,64 @@
+"""
+Startup profiling
+Đo thời gian import các module nặng (import lazy qua timed_import), các mốc khởi động
+và time-to-first-inference tính từ lúc process bắt đầu import
+Chi tiết toàn bộ cây import: python -X importtime main.py 2> importtime.log
+"""
+
+import importlib
+import sys
+import time
+from utils.logger import system_logger
+
+class StartupProfile:
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.imports = {}  # module -> ms
+        self.marks = []  # [(tên mốc, ms tính từ start_time)]
+        self.first_inference_ms = None
+
+    def elapsed(self):
+        """ms tính từ lúc bắt đầu khởi động"""
+        return (time.perf_counter() - self.start_time) * 1000
+
+    def timed_import(self, name):
+        """Import module và ghi lại thời gian của lần import đầu tiên"""
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        start_import = time.perf_counter()
+        module = importlib.import_module(name)
+        self.imports[name] = (time.perf_counter() - start_import) * 1000
+        system_logger.debug(f"Imported {name} in {self.imports[name]:.0f}ms")
+        return module
+
+    def mark(self, name):
+        """Ghi một mốc khởi động (imports, model_loaded, camera_started, ready...)"""
+        self.marks.append((name, self.elapsed()))
+
+    def mark_first_inference(self):
+        """Gọi sau mỗi lần detect, chỉ lần đầu được ghi và log toàn bộ profile"""
+        if self.first_inference_ms is not None:
+            return
+        self.first_inference_ms = self.elapsed()
+        self.mark("first_inference")
+        system_logger.info(f"Startup - {self.format_stats()}")
+
+    def get_stats(self):
+        """Profile khởi động: mốc, thời gian import và time-to-first-inference (ms)"""
+        return {
+            "marks": dict(self.marks),
+            "imports": dict(self.imports),
+            "time_to_first_inference": self.first_inference_ms,
+        }
+
+    def format_stats(self):
+        """Một dòng log: các mốc theo thứ tự rồi các import chậm nhất"""
+        parts = [f"{name}: {ms:.0f}ms" for name, ms in self.marks]
+        if self.imports:
+            slowest = sorted(self.imports.items(), key=lambda item: item[1], reverse=True)
+            parts.append("imports " + ", ".join(f"{name} {ms:.0f}ms" for name, ms in slowest))
+        return ", ".join(parts)
+
+# Dùng chung trong process (main import module này sớm nhất có thể)
+startup_profile = StartupProfile()
@@ -0,0 +1,63 @@
+"""
+System stats - đọc nhiệt độ CPU, trạng thái throttle, tần số CPU và RSS từ sysfs/procfs
+Không cần psutil; giá trị không đọc được (không phải Pi, thiếu quyền) trả về None
+"""
+
+import os
+import subprocess
+
+THERMAL_PATH = "/sys/class/thermal/thermal_zone0/temp"
+THROTTLED_PATH = "/sys/devices/platform/soc/soc:firmware/get_throttled"
+CPU_FREQ_PATH = "/sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq"
+
+# Bit của get_throttled (0-3: hiện tại, 16-19: đã xảy ra từ lúc boot)
+THROTTLE_FLAGS = {
+    "under_voltage": 0,
+    "freq_capped": 1,
+    "throttled": 2,
+    "soft_temp_limit": 3,
+}
+THROTTLE_OCCURRED_SHIFT = 16
+
+def _read_int(path):
+    """Đọc một số nguyên từ file sysfs"""
+    try:
+        with open(path) as f:
+            return int(f.read().strip(), 0)
+    except (OSError, ValueError):
+        return None
+
+def read_cpu_temperature():
+    """Nhiệt độ CPU (°C)"""
+    millidegrees = _read_int(THERMAL_PATH)
+    return millidegrees / 1000 if millidegrees is not None else None
+
+def read_cpu_frequency():
+    """Tần số hiện tại của cpu0 (Hz)"""
+    khz = _read_int(CPU_FREQ_PATH)
+    return khz * 1000 if khz is not None else None
+
+def read_throttled():
+    """Bitmask get_throttled của firmware Pi (sysfs, không có thì hỏi vcgencmd)"""
+    value = _read_int(THROTTLED_PATH)
+    if value is not None:
+        return value
+    try:
+        output = subprocess.run(["vcgencmd", "get_throttled"], capture_output=True, text=True,
+                                timeout=1, check=True).stdout
+        return int(output.strip().split("=")[1], 16)
+    except Exception:
+        return None
+
+def decode_throttled(value):
+    """Bitmask -> {tên cờ: (đang xảy ra, đã xảy ra từ lúc boot)}"""
+    return {name: (bool(value >> bit & 1), bool(value >> (bit + THROTTLE_OCCURRED_SHIFT) & 1))
+            for name, bit in THROTTLE_FLAGS.items()}
+
+def read_rss_bytes():
+    """RSS hiện tại của process (bytes) từ /proc/self/statm"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
@@ -7,11 +7,17 @@ Thu thập ảnh và nhãn khi detect được object
 import cv2
 import numpy as np
 import os
+import sys
 import time
 import json
 from datetime import datetime
 from ultralytics import YOLO
 
+# Dùng module post-processing chung của raspberry_pi
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "raspberry_pi"))
+from utils.postprocess import Detections, from_results
+from utils.boxes import xyxy_to_yolo
+
 class RealtimeDataCollector:
     def __init__(self):
         # Cấu hình
@@ -86,21 +92,12 @@ class RealtimeDataCollector:
         # Tạo file nhãn YOLO format
         label_path = os.path.join(self.labels_dir, f"detection_{timestamp}.txt")
         
+        # Chuyển đổi sang YOLO format (center_x, center_y, width, height) cho tất cả box
+        img_height, img_width = frame.shape[:2]
+        labels = xyxy_to_yolo(detections.xyxy, img_width, img_height)
+        
         with open(label_path, 'w') as f:
-            for detection in detections:
-                # Lấy thông tin detection
-                bbox = detection["bbox"]  # [x1, y1, x2, y2]
-                class_id = detection["class_id"]
-                conf = detection["confidence"]
-                
-                # Chuyển đổi sang YOLO format (center_x, center_y, width, height)
-                img_height, img_width = frame.shape[:2]
-                
-                center_x = (bbox[0] + bbox[2]) / 2 / img_width
-                center_y = (bbox[1] + bbox[3]) / 2 / img_height
-                width = (bbox[2] - bbox[0]) / img_width
-                height = (bbox[3] - bbox[1]) / img_height
-                
+            for class_id, (center_x, center_y, width, height) in zip(detections.cls.tolist(), labels.tolist()):
                 # Ghi nhãn theo format YOLO: class_id center_x center_y width height
                 f.write(f"{class_id} {center_x:.6f} {center_y:.6f} {width:.6f} {height:.6f}\n")
         
@@ -113,11 +110,8 @@ class RealtimeDataCollector:
     
     def draw_detections(self, frame, detections):
         """Vẽ detections lên frame"""
-        for detection in detections:
-            bbox = detection["bbox"]
-            class_name = detection["class_name"]
-            conf = detection["confidence"]
-            
+        bboxes = detections.xyxy.astype(np.int32).tolist()
+        for bbox, class_name, conf in zip(bboxes, detections.names(), detections.conf.tolist()):
             # Vẽ bounding box
             cv2.rectangle(frame, (bbox[0], bbox[1]), (bbox[2], bbox[3]), (0, 255, 0), 2)
             
@@ -145,26 +139,7 @@ class RealtimeDataCollector:
             # Thực hiện detection
             results = self.model(frame, conf=self.confidence_threshold, verbose=False)
             
-            detections = []
-            for result in results:
-                if result.boxes is not None:
-                    boxes = result.boxes
-                    for box in boxes:
-                        # Lấy thông tin detection
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                        conf = box.conf[0].cpu().numpy()
-                        cls = int(box.cls[0].cpu().numpy())
-                        
-                        # Lấy tên class
-                        class_name = self.class_names.get(cls, f"class_{cls}")
-                        
-                        detection = {
-                            "bbox": [int(x1), int(y1), int(x2), int(y2)],
-                            "class_id": cls,
-                            "class_name": class_name,
-                            "confidence": float(conf)
-                        }
-                        detections.append(detection)
+            detections = Detections(from_results(results), self.class_names)
             
             # Lưu dữ liệu nếu có detection
             if detections:
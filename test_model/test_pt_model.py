@@ -4,9 +4,15 @@ Test mô hình PyTorch (.pt) realtime với camera
 """
 
 import cv2
+import os
+import sys
 import time
 from ultralytics import YOLO
 
+# Dùng module post-processing chung của raspberry_pi
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "raspberry_pi"))
+from utils.postprocess import from_results
+
 def main():
     # Load model PyTorch (.pt)
     print("🔄 Đang load model PyTorch...")
@@ -43,25 +49,19 @@ def main():
         inference_time = (time.time() - start_inference) * 1000
         
         # Vẽ kết quả
-        for result in results:
-            if result.boxes is not None:
-                boxes = result.boxes
-                for box in boxes:
-                    # Lấy tọa độ
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    conf = box.conf[0].cpu().numpy()
-                    cls = int(box.cls[0].cpu().numpy())
-                    
-                    # Lấy tên class
-                    class_name = model.names[cls]
-                    
-                    # Vẽ bounding box
-                    cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
-                    
-                    # Vẽ label
-                    label = f"{class_name}: {conf:.2f}"
-                    cv2.putText(frame, label, (int(x1), int(y1)-10), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        dets = from_results(results)
+        bboxes = dets["xyxy"].astype(int).tolist()
+        for (x1, y1, x2, y2), conf, cls in zip(bboxes, dets["conf"].tolist(), dets["cls"].tolist()):
+            # Lấy tên class
+            class_name = model.names[cls]
+            
+            # Vẽ bounding box
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            
+            # Vẽ label
+            label = f"{class_name}: {conf:.2f}"
+            cv2.putText(frame, label, (x1, y1-10), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
         
         # Tính FPS
         frame_count += 1
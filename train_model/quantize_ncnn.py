@@ -0,0 +1,135 @@
+"""
+Script tạo model NCNN FP16 và INT8 từ model FP32 đã export (train_yolo.py)
+Calibration INT8 dùng ảnh thu thập được trong raspberry_pi_test/data/images
+
+Cần các tool của ncnn trong PATH (hoặc --tools-dir): ncnnoptimize, ncnn2table, ncnn2int8
+Chạy: python quantize_ncnn.py --model-dirs ../weights/best_ncnn_model ../weights/best_ncnn_model_320
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import subprocess
+import tempfile
+
+import cv2
+import yaml
+
+DEFAULT_MODEL_DIR = os.path.join("..", "weights", "best_ncnn_model")
+DEFAULT_CALIBRATION_DIR = os.path.join("..", "raspberry_pi_test", "data", "images")
+PAD_COLOR = (114, 114, 114)
+
+def run_tool(tools_dir, name, *args):
+    """Chạy một tool của ncnn, báo lỗi nếu thất bại"""
+    tool = os.path.join(tools_dir, name) if tools_dir else name
+    command = [tool] + [str(arg) for arg in args]
+    print(f"🔧 {' '.join(command)}")
+    subprocess.run(command, check=True)
+
+def read_imgsz(model_dir):
+    """Đọc imgsz từ metadata.yaml (mặc định 640)"""
+    metadata_path = os.path.join(model_dir, "metadata.yaml")
+    if os.path.exists(metadata_path):
+        with open(metadata_path) as f:
+            imgsz = yaml.safe_load(f).get("imgsz", [640])
+        return int(imgsz[0])
+    return 640
+
+def letterbox(image, size):
+    """Letterbox giống lúc chạy trên Pi (ncnn2table chỉ resize thẳng)"""
+    height, width = image.shape[:2]
+    scale = min(size / height, size / width)
+    new_w, new_h = int(round(width * scale)), int(round(height * scale))
+    image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    pad_w, pad_h = (size - new_w) / 2, (size - new_h) / 2
+    top, bottom = int(round(pad_h - 0.1)), int(round(pad_h + 0.1))
+    left, right = int(round(pad_w - 0.1)), int(round(pad_w + 0.1))
+    return cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=PAD_COLOR)
+
+def prepare_calibration(images_dir, size, max_images, work_dir):
+    """Letterbox ảnh calibration về size x size, trả về file danh sách ảnh cho ncnn2table"""
+    paths = sorted(glob.glob(os.path.join(images_dir, "*.jpg")) + glob.glob(os.path.join(images_dir, "*.png")))
+    if not paths:
+        raise RuntimeError(f"Không có ảnh calibration trong {images_dir}")
+    # Lấy đều trên toàn bộ tập ảnh thay vì chỉ các ảnh đầu
+    step = max(1, len(paths) // max_images)
+    paths = paths[::step][:max_images]
+
+    image_dir = os.path.join(work_dir, f"calibration_{size}")
+    os.makedirs(image_dir, exist_ok=True)
+    list_path = os.path.join(work_dir, f"imagelist_{size}.txt")
+    with open(list_path, "w") as f:
+        for index, path in enumerate(paths):
+            image = cv2.imread(path)
+            if image is None:
+                continue
+            output_path = os.path.join(image_dir, f"{index:05d}.png")
+            cv2.imwrite(output_path, letterbox(image, size))
+            f.write(output_path + "\n")
+    print(f"📷 {len(paths)} ảnh calibration ({size}x{size}) từ {images_dir}")
+    return list_path
+
+def write_output(model_dir, output_dir, param_path, bin_path):
+    """Ghi model vào thư mục mới với tên file NCNNBackend đang đọc"""
+    os.makedirs(output_dir, exist_ok=True)
+    shutil.copy(param_path, os.path.join(output_dir, "model.ncnn.param"))
+    shutil.copy(bin_path, os.path.join(output_dir, "model.ncnn.bin"))
+    metadata_path = os.path.join(model_dir, "metadata.yaml")
+    if os.path.exists(metadata_path):
+        shutil.copy(metadata_path, os.path.join(output_dir, "metadata.yaml"))
+
+def quantize(model_dir, images_dir, tools_dir, max_images, method, threads):
+    """Tạo <model_dir>_fp16 và <model_dir>_int8 cho một thư mục model"""
+    model_dir = model_dir.rstrip("/\\")
+    param_path = os.path.join(model_dir, "model.ncnn.param")
+    bin_path = os.path.join(model_dir, "model.ncnn.bin")
+    size = read_imgsz(model_dir)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # ncnnoptimize: fuse layer (flag 0 = fp32, 1 = lưu weights fp16)
+        opt_param = os.path.join(work_dir, "opt.param")
+        opt_bin = os.path.join(work_dir, "opt.bin")
+        run_tool(tools_dir, "ncnnoptimize", param_path, bin_path, opt_param, opt_bin, 0)
+
+        fp16_param = os.path.join(work_dir, "fp16.param")
+        fp16_bin = os.path.join(work_dir, "fp16.bin")
+        run_tool(tools_dir, "ncnnoptimize", param_path, bin_path, fp16_param, fp16_bin, 1)
+        write_output(model_dir, model_dir + "_fp16", fp16_param, fp16_bin)
+        print(f"✅ FP16: {model_dir}_fp16")
+
+        # INT8: bảng scale từ ảnh calibration rồi lượng tử hoá weights
+        list_path = prepare_calibration(images_dir, size, max_images, work_dir)
+        table_path = os.path.join(work_dir, "model.table")
+        run_tool(tools_dir, "ncnn2table", opt_param, opt_bin, list_path, table_path,
+                 "mean=[0,0,0]", "norm=[0.003921569,0.003921569,0.003921569]",
+                 f"shape=[{size},{size},3]", "pixel=RGB", f"thread={threads}", f"method={method}")
+
+        int8_param = os.path.join(work_dir, "int8.param")
+        int8_bin = os.path.join(work_dir, "int8.bin")
+        run_tool(tools_dir, "ncnn2int8", opt_param, opt_bin, int8_param, int8_bin, table_path)
+        write_output(model_dir, model_dir + "_int8", int8_param, int8_bin)
+        shutil.copy(table_path, os.path.join(model_dir + "_int8", "model.table"))
+        print(f"✅ INT8: {model_dir}_int8")
+
+def main():
+    parser = argparse.ArgumentParser(description="Tạo model NCNN FP16/INT8 từ model FP32")
+    parser.add_argument("--model-dirs", nargs="+", default=[DEFAULT_MODEL_DIR])
+    parser.add_argument("--images", default=DEFAULT_CALIBRATION_DIR, help="Thư mục ảnh calibration")
+    parser.add_argument("--tools-dir", default="", help="Thư mục chứa ncnnoptimize/ncnn2table/ncnn2int8")
+    parser.add_argument("--max-images", type=int, default=200)
+    parser.add_argument("--method", default="kl", choices=["kl", "aciq", "eq"])
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    print("\n=== 📦 LƯỢNG TỬ HOÁ MODEL NCNN ===")
+    for model_dir in args.model_dirs:
+        try:
+            quantize(model_dir, args.images, args.tools_dir, args.max_images, args.method, args.threads)
+        except Exception as e:
+            print(f"❌ {model_dir}: {e}")
+
+    print("\n💡 Chọn precision trên Pi: MODEL_PRECISION = \"fp16\" hoặc \"int8\" trong configs/settings.py")
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,14 @@ import yaml
 from ultralytics import YOLO
 import torch
 import os
+import shutil
+
+# Các kích thước input export sang NCNN (model NCNN cố định kích thước, mỗi size một thư mục)
+# raspberry_pi chọn size theo latency/kích thước object (MODEL_VARIANTS trong configs/settings.py)
+EXPORT_SIZES = [320, 416, 512, 640]
+DEFAULT_SIZE = 640
+# Tạo thêm bản FP16/INT8 cho từng size (cần tool ncnn, xem quantize_ncnn.py)
+QUANTIZE = True
 
 print("\n💻 KIỂM TRA PHẦN CỨNG TRAINING")
 print("=" * 50)
@@ -57,12 +65,30 @@ print("\n=== 🔧 BẮT ĐẦU TRAINING ===")
 results = model.train(**train_params)
 
 print("\n=== 📤 BẮT ĐẦU EXPORT ===")
-try:
-    export_path = model.export(format='ncnn')
-    print(f"✅ Export thành công: {export_path}")
-except Exception as e:
-    export_path = None
-    print(f"❌ Export thất bại: {e}")
+variant_paths = {}
+for imgsz in EXPORT_SIZES:
+    try:
+        path = model.export(format='ncnn', imgsz=imgsz)
+        # Export luôn ghi vào best_ncnn_model -> đổi tên các size khác mặc định
+        if imgsz != DEFAULT_SIZE:
+            variant_path = f"{path.rstrip(os.sep)}_{imgsz}"
+            shutil.rmtree(variant_path, ignore_errors=True)
+            shutil.move(path, variant_path)
+            path = variant_path
+        variant_paths[imgsz] = path
+        print(f"✅ Export {imgsz}x{imgsz} thành công: {path}")
+    except Exception as e:
+        print(f"❌ Export {imgsz}x{imgsz} thất bại: {e}")
+export_path = variant_paths.get(DEFAULT_SIZE)
+
+if QUANTIZE and variant_paths:
+    print("\n=== 📦 LƯỢNG TỬ HOÁ FP16/INT8 ===")
+    from quantize_ncnn import quantize, DEFAULT_CALIBRATION_DIR
+    for imgsz, path in sorted(variant_paths.items()):
+        try:
+            quantize(path, DEFAULT_CALIBRATION_DIR, "", 200, "kl", 4)
+        except Exception as e:
+            print(f"❌ Lượng tử hoá {imgsz}x{imgsz} thất bại: {e}")
 
 # Lấy đường dẫn đến best model
 best_model_path = os.path.join('runs', 'detect', 'fpt_hackathon', 'weights', 'best.pt')
@@ -87,5 +113,9 @@ if export_path and os.path.exists(best_model_path):
         print(f"📊 Tổng kích thước NCNN: {total_ncnn_size:.2f} MB")
     else:
         print("⚠️ Không tìm thấy file NCNN model")
+    
+    print(f"📱 Các size đã export: {sorted(variant_paths)}")
+    for imgsz, path in sorted(variant_paths.items()):
+        print(f"   {imgsz}: {path}")
 else:
     print("⚠️ Không export được model sang NCNN hoặc không tìm thấy best model.")
\ No newline at end of file